@@ -29,16 +29,12 @@ rule vcf_anno_cn_true:
   log: "log/{sample}.vcf_anno_cn_true.log"
   shell:
     """
-    module load bcftools
     time (
     set -x
-    bcftools annotate \
-      -a {input.bed} \
-      -c CHROM,FROM,TO,FMT/CN1,FMT/CN2 \
-      -h {input.hdr} \
-      -Oz {input.vcf} \
-    > {output.vcf}
-    bcftools index {output.vcf}
+    python3 {config[scripts]}/vcf_anno_cn.py {input.vcf} {input.bed} \
+      --columns CHROM,FROM,TO,FMT/CN1,FMT/CN2 \
+      --header {input.hdr} \
+      --out {output.vcf}
     ) >{log} 2>&1
     """
 
@@ -65,14 +61,14 @@ rule vcf_calc_baf_lrr:
   input:  "sim/bam/{sample}.paired.vcf.gz"
   output: "sim/bam/{sample}.baf.vcf.gz"
   log: "log/{sample}.vcf_calc_baf_lrr.log"
+  threads: 4
   shell:
     """
     module load bcftools
     time(
     set -x
-    $CONDA_PREFIX/bin/python {config[scripts]}/vcf_calc_baf_lrr.py {input} RN \
-    | bgzip -c > {output} &&\
-    bcftools index {output}
+    $CONDA_PREFIX/bin/python {config[scripts]}/vcf_calc_baf_lrr.py {input} RN --threads {threads} \
+      --out {output}
     ) >{log} 2>&1
     """
 
@@ -113,11 +109,11 @@ rule vcf_anno_cn_inf:
   log: "log/{sample}.vcf_anno_cn_inf.log"
   shell:
     """
-    module load bcftools
     time(
     set -x
-    bcftools annotate -a {input.tab} -c CHROM,POS,FMT/CNI -Oz {input.vcf} > {output.vcf} &&\
-    bcftools index {output.vcf}
+    python3 {config[scripts]}/vcf_anno_cn.py {input.vcf} {input.tab} \
+      --columns CHROM,POS,FMT/CNI \
+      --out {output.vcf}
     ) >{log} 2>&1
     """
 
@@ -151,8 +147,7 @@ rule bcftools_filt_cn2:
     csv = "bcftools_cnv/snv.cn2.csv"
   shell:
     """
-    module load bcftools
-    bcftools view -e 'FMT/CNI!=2 & FMT/CNI!="."' {input} > {output.vcf}
+    python3 {config[scripts]}/vcf_filter.py {input} --include 'FMT/CNI=2' > {output.vcf}
 
-    python3 {config[scripts]}/vcf2csv.py {output.vcf} > {output.csv}
+    python3 {config[scripts]}/vcf2csv.py {input} --include 'FMT/CNI=2' > {output.csv}
     """
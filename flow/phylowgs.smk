@@ -120,3 +120,29 @@ rule phylowgs_metrics:
       {input.inf_snvs} \
     | tee {output.prev}
     """
+
+rule phylowgs_metrics_posterior:
+  input:
+    done = "%s/inf.done" % OUTPFX,
+    true_tree = "sim/true.tree.csv",
+    true_snvs = "sim/true.snvs.csv",
+    true_prev = "sim/true.clusters.csv"
+  output:
+    trees   = "%s/posterior.trees.csv" % OUTPFX,
+    metrics = "%s/metrics_posterior.yml" % OUTPFX
+  params:
+    in_snv = "%s/input.snvs.tsv" % OUTPFX,
+    in_sum = "%s/result.summ.json.gz" % OUTPFX,
+    in_ass = "%s/result.mutass.zip" % OUTPFX,
+    # evaluate all sampled trees unless "phylowgs_top_k" is set
+    top_k = config.get('phylowgs_top_k', 0)
+  threads: 4
+  shell:
+    """
+    python3 {config[scripts]}/phylowgs_posterior.py \
+      --top-k {params.top_k} --collapse --threads {threads} \
+      --out {output.trees} \
+      {params.in_snv} {params.in_sum} {params.in_ass} \
+      {input.true_tree} {input.true_snvs} {input.true_prev} \
+    | tee {output.metrics}
+    """
@@ -30,22 +30,22 @@ rule pyclone_cn_prep:
     """
 
 rule pyclone_cn_yaml:
-  input:  "%s/{sample}.tsv" % OUTPFX
-  output: "%s/{sample}.yaml" % OUTPFX
-  log:    "log/%s_yaml.{sample}.log" % OUTPFX
+  input:  ["%s/%s.tsv" % (OUTPFX, x) for x in SAMPLES]
+  output: ["%s/%s.yaml" % (OUTPFX, x) for x in SAMPLES]
+  params:
+    dir = OUTPFX
+  log:    "log/%s_yaml.log" % OUTPFX
+  threads: 4
   group: "pyclone"
   shell:
     """
     time (
     module load miniconda3/4.7.10
-    # to fix https://github.com/conda/conda/issues/8186
-    set +eu
-    source activate {config[tools][pyclone_env]}
-    set -eu
-    PyClone build_mutations_file \
-      --in_file {input} \
-      --out_file {output} \
-      --prior total_copy_number
+    python {config[scripts]}/pyclone_yaml.py \
+      --prior total_copy_number \
+      --outdir {params.dir} \
+      --threads {threads} \
+      {input}
     ) >{log} 2>&1
     """
 
@@ -34,22 +34,22 @@ rule pyclone_conn_prep:
     """
 
 rule pyclone_conn_yaml:
-  input:  "%s/{sample}.tsv" % OUTDIR
-  output: "%s/{sample}.yaml" % OUTDIR
-  log:    "log/%s_yaml.{sample}.log" % OUTDIR
+  input:  ["%s/%s.tsv" % (OUTDIR, x) for x in SAMPLES]
+  output: ["%s/%s.yaml" % (OUTDIR, x) for x in SAMPLES]
+  params:
+    dir = OUTDIR
+  log:    "log/%s_yaml.log" % OUTDIR
+  threads: 4
   group: "pyclone"
   shell:
     """
     time (
     module load miniconda3/4.7.10
-    # to fix https://github.com/conda/conda/issues/8186
-    set +eu
-    source activate pyclone
-    set -eu
-    PyClone build_mutations_file \
-      --in_file {input} \
-      --out_file {output} \
-      --prior total_copy_number
+    python {config[scripts]}/pyclone_yaml.py \
+      --prior total_copy_number \
+      --outdir {params.dir} \
+      --threads {threads} \
+      {input}
     ) >{log} 2>&1
     """
 
@@ -33,22 +33,22 @@ rule pyclone_prep:
     """
 
 rule pyclone_yaml:
-  input:  "pyclone_tail/{sample}.tsv"
-  output: "pyclone_tail/{sample}.yaml"
-  log:    "log/pyclone_tail_yaml.{sample}.log"
+  input:  ["pyclone_tail/%s.tsv" % x for x in SAMPLES]
+  output: ["pyclone_tail/%s.yaml" % x for x in SAMPLES]
+  params:
+    dir = "pyclone_tail"
+  log:    "log/pyclone_tail_yaml.log"
+  threads: 4
   group: "pyclone"
   shell:
     """
     time (
     module load miniconda3/4.7.10
-    # to fix https://github.com/conda/conda/issues/8186
-    set +eu
-    source activate pyclone
-    set -eu
-    PyClone build_mutations_file \
-      --in_file {input} \
-      --out_file {output} \
-      --prior total_copy_number
+    python {config[scripts]}/pyclone_yaml.py \
+      --prior total_copy_number \
+      --outdir {params.dir} \
+      --threads {threads} \
+      {input}
     ) >{log} 2>&1
     """
 
@@ -1,5 +1,6 @@
 # vim: syntax=python tabstop=2 expandtab
 # coding: utf-8
+import os
 
 rule sequenza_vcf_hdr:
   input:  "sim/bam/RN.rc.vcf.gz"
@@ -19,18 +20,20 @@ EOF
 rule sequenza_gc:
   input:  "sim/ref.fa.gz"
   output: "sequenza/ref_gc50.wig.gz"
+  params:
+    # GC wiggle is shared by replicates with the same reference
+    cache = config.get('gc_cache', os.path.join(os.path.expanduser('~'), '.cache', 'gc_wiggle'))
   log:    "log/sequenza_gc.log"
-  threads: 1
+  threads: 4
   shell:
     """
     time (
-
-    # to fix https://github.com/conda/conda/issues/8186
-    set +eu
-    source activate {config[tools][sequenza_env]}
-    set -eu
-
-    sequenza-utils gc_wiggle --fasta {input} -w 50 | gzip > {output}
+    python3 {config[scripts]}/gc_wiggle.py \
+      --fasta {input} \
+      -w 50 \
+      --cache-dir {params.cache} \
+      --threads {threads} \
+      --out {output}
     ) >{log} 2>&1
     """
 
@@ -89,23 +92,17 @@ rule sequenza_post:
     vcf="sim/bam/{sample}.filt.cn.vcf.gz",
     seg="sequenza/{sample}_segments.txt"
   output:
-    tsv="sequenza/{sample}.anno.tsv.gz",
-    vcf="sequenza/{sample}.cn.inf.vcf.gz"
+    vcf="sequenza/{sample}.cn.inf.vcf.gz",
+    idx="sequenza/{sample}.cn.inf.vcf.gz.csi"
   log:  "log/{sample}.sequenza_post.log"
   shell:
     """
-    module load bedtools bcftools
-
     time(
-    
-    bedtools intersect -a {input.vcf} -b <(tail -n+2 {input.seg}) -wb \
-    | cut -f 1,2,21,22 \
-    | bgzip > {output.tsv}
-    tabix -s1 -b2 -e2 -c"#" {output.tsv}
 
-    bcftools annotate -a {output.tsv} -c CHROM,POS,FMT/CNIA,FMT/CNIB -h {input.hdr} -Oz {input.vcf} \
-    > {output.vcf}
-    bcftools index {output.vcf}
+    python3 {config[scripts]}/vcf_anno_cn.py {input.vcf} {input.seg} \
+      --seqz \
+      --header {input.hdr} \
+      --out {output.vcf}
 
     ) >{log} 2>&1
     """
@@ -34,6 +34,7 @@ rule combine_cn_vcfs:
     "sim/snvs.cn.vcf.gz"
   log:
     "log/combine_cn_vcfs.log"
+  threads: 4
   shell:
     """
     module load bcftools
@@ -43,7 +44,8 @@ rule combine_cn_vcfs:
       for f in ${{{input.nrm}//RN/R*}}; do
         fn=$(basename $f);
         printf " --vcf %s:%s" ${fn%.cn.inf.vcf.gz} $f;
-      done)
+      done) \
+      --threads {threads} \
       --out {output}
     ) 1>{log} 2>&1
     """
@@ -161,7 +163,7 @@ rule vcf_filt_cn2_relaxed:
   output: "sim/snv.cn2.relaxed.vcf"
   shell:
     """
-    awk -f {config[scripts]}/vcf_filt_cn2_relaxed.awk {input} > {output}
+    python3 {config[scripts]}/vcf_filter.py {input} --mask 'FMT/CNI=2' --require 'FMT/DP>0' > {output}
     """ 
 
 # create pileup from bam
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Major ALT allele read counts for chunks of multi-sample VCF sites.
+#
+# For each site the ALT allele with the highest AD summed over all samples
+# is selected (ties go to the first allele, or are broken randomly if a
+# random generator is given). Read counts of the major allele are gathered
+# for all samples at once.
+#
+# Input: chunks as produced by vcf_columnar.iter_chunks() (FORMAT: AD, DP)
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import numpy as np
+from vcf_columnar import MISSING
+
+def select_major_allele(ad, n_alt, rng=None):
+  '''
+  Determine major ALT allele for each site.
+
+  Parameters:
+    ad    : allelic depths (sites x samples x alleles; REF first)
+    n_alt : number of ALT alleles per site
+    rng   : numpy.random.Generator to break ties (default: first allele wins)
+
+  Output:
+    index of major ALT allele for each site (0-based, ALT alleles only)
+  '''
+  n_sites = ad.shape[0]
+  if ad.shape[2] < 2: # no ALT allele in chunk
+    return np.zeros(n_sites, dtype=np.int64)
+  sum_ad = ad[:, :, 1:].clip(min=0).sum(axis=1) # sites x ALT alleles
+  # exclude padding of sites with fewer ALT alleles
+  is_alt = np.arange(sum_ad.shape[1]) < np.asarray(n_alt)[:, None]
+  sum_ad = np.where(is_alt, sum_ad, -1)
+  if rng is None:
+    return sum_ad.argmax(axis=1)
+  # pick random allele among those with max AD
+  is_max = sum_ad == sum_ad.max(axis=1, keepdims=True)
+  key = np.where(is_max, rng.random(sum_ad.shape), -1.0)
+
+  return key.argmax(axis=1)
+
+def count_major_allele(chunk, rng=None):
+  '''
+  Calculate read counts of major ALT allele for a chunk of sites.
+
+  Output:
+    dict with entries
+      idx    : index of major ALT allele (sites)
+      allele : major ALT allele (list of str)
+      alt    : major allele read count, missing AD as 0 (sites x samples)
+      depth  : read depth, MISSING if DP is missing (sites x samples)
+      ref    : depth - alt, 0 if depth is missing (sites x samples)
+      vaf    : alt / depth, 0.0 if either is missing or 0 (sites x samples)
+  '''
+  ad = chunk['AD']
+  depth = chunk['DP']
+  n_alt = np.array([len(x) for x in chunk['ALT']], dtype=np.int64)
+  idx = select_major_allele(ad, n_alt, rng)
+  allele = [alts[i] if i < len(alts) else '.' for alts, i in zip(chunk['ALT'], idx.tolist())]
+
+  if ad.shape[2] > 1:
+    alt = np.take_along_axis(ad, (idx + 1)[:, None, None], axis=2)[:, :, 0]
+    alt = alt.clip(min=0)
+  else:
+    alt = np.zeros(depth.shape, dtype=np.int64)
+  ref = np.where(depth > 0, depth - alt, 0)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    vaf = np.where((alt > 0) & (depth > 0), alt / depth.astype(np.float64), 0.0)
+
+  return {'idx': idx, 'allele': allele, 'alt': alt, 'depth': depth, 'ref': ref, 'vaf': vaf}
+
+def variant_chunk(chunk, cn=False):
+  '''
+  Site columns and major ALT allele read counts for a chunk of sites (input
+  of the per-tool formatting functions in vcf2*.py).
+
+  Output:
+    dict with entries
+      CHROM, ID, REF : list of str (sites)
+      POS            : list of int (sites)
+      allele, alt, ref, depth, vaf : see count_major_allele()
+      cn             : inferred total copy number, 2 if missing (only if cn=True;
+                       requires FORMAT field CNI)
+  '''
+  mc = count_major_allele(chunk)
+  var = {
+    'CHROM' : chunk['CHROM'],
+    'POS'   : chunk['POS'].tolist(),
+    'ID'    : chunk['ID'],
+    'REF'   : chunk['REF'],
+    'allele': mc['allele'],
+    'alt'   : mc['alt'],
+    'ref'   : mc['ref'],
+    'depth' : mc['depth'],
+    'vaf'   : mc['vaf'],
+  }
+  if cn:
+    var['cn'] = np.where(chunk['CNI'] > 0, chunk['CNI'], 2)
+
+  return var
+
+def variant_ids(var):
+  '''Variant ids (CHROM_POS) for a chunk.'''
+  return ['{}_{}'.format(c, p) for c, p in zip(var['CHROM'], var['POS'])]
+
+def depth_sums(variants, min_depth=0):
+  '''
+  Per-sample sums of read depth and numbers of sites over chunks of variants
+  (see variant_chunk()). Sites with missing DP or DP < min_depth are ignored.
+  '''
+  sum_dp = None
+  num_loc = None
+  for var in variants:
+    dp = var['depth']
+    is_loc = (dp != MISSING) & (dp >= min_depth)
+    s = np.where(is_loc, dp, 0).sum(axis=0)
+    n = is_loc.sum(axis=0)
+    sum_dp = s if sum_dp is None else sum_dp + s
+    num_loc = n if num_loc is None else num_loc + n
+
+  return sum_dp, num_loc
+
+def mean_depth(variants, n_samples, min_depth=0):
+  '''Rounded mean read depth per sample (0 for samples without any counted site).'''
+  sum_dp, num_loc = depth_sums(variants, min_depth)
+  if sum_dp is None:
+    return [0] * n_samples
+
+  return [round(d / n) if n > 0 else 0 for d, n in zip(sum_dp.tolist(), num_loc.tolist())]
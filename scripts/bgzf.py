@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# BGZF (blocked gzip) reading and writing with virtual file offsets.
+#
+# A BGZF file is a series of gzip members ("blocks") of at most 64kb of
+# uncompressed data. A virtual offset addresses a position in the
+# uncompressed data: (offset of block in file) << 16 | (offset in block).
+#
+# Blocks are independent, so they are (de)compressed in a thread pool (zlib
+# releases the GIL) while the main thread reads/writes the file in order.
+# The writer can build a CSI or tabix index of the VCF records it writes,
+# which makes running "bgzip" and "bcftools index"/"tabix" unnecessary.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import io
+import struct
+import zlib
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# gzip header with extra field (BGZF blocks)
+BLOCK_MAGIC = b'\x1f\x8b\x08\x04'
+# max. uncompressed data per block (as bgzip)
+BLOCK_DATA_SIZE = 0xff00
+# number of blocks in flight per thread
+BLOCKS_PER_THREAD = 4
+# empty block marking end of file
+EOF_BLOCK = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+# index binning scheme (tabix; also used for CSI)
+MIN_SHIFT = 14
+DEPTH = 5
+# tabix format code for VCF
+TBX_VCF = 2
+
+def is_bgzf(fn):
+  '''Check if file starts with a BGZF block.'''
+  with open(fn, 'rb') as f:
+    hdr = f.read(16)
+  return hdr[:4] == BLOCK_MAGIC and hdr[12:14] == b'BC'
+
+def read_raw_block(f):
+  '''
+  Read next BGZF block from binary file handle without decompressing it.
+
+  Output:
+    (block size in file, compressed data, uncompressed size) or None at end of file
+  '''
+  hdr = f.read(12)
+  if len(hdr) < 12:
+    return None
+  if hdr[:4] != BLOCK_MAGIC:
+    raise ValueError('Not a BGZF block at offset {}'.format(f.tell() - len(hdr)))
+  xlen = struct.unpack('<H', hdr[10:12])[0]
+  extra = f.read(xlen)
+  # find BC subfield with block size
+  bsize = None
+  i = 0
+  while i < xlen:
+    si, slen = extra[i:i+2], struct.unpack('<H', extra[i+2:i+4])[0]
+    if si == b'BC':
+      bsize = struct.unpack('<H', extra[i+4:i+6])[0] + 1
+    i += 4 + slen
+  if bsize is None:
+    raise ValueError('BGZF block without size field')
+  cdata = f.read(bsize - 12 - xlen - 8)
+  crc, isize = struct.unpack('<II', f.read(8))
+
+  return bsize, cdata, isize
+
+def inflate(raw):
+  '''Decompress block read by read_raw_block().'''
+  bsize, cdata, isize = raw
+  return zlib.decompress(cdata, -15) if isize > 0 else b''
+
+def deflate(data, level=6):
+  '''Compress data (at most BLOCK_DATA_SIZE bytes) into a BGZF block.'''
+  c = zlib.compressobj(level, zlib.DEFLATED, -15)
+  cdata = c.compress(data) + c.flush()
+  bsize = 18 + len(cdata) + 8
+  hdr = struct.pack('<4sIBBH2sHH', BLOCK_MAGIC, 0, 0, 0xff, 6, b'BC', 2, bsize - 1)
+
+  return hdr + cdata + struct.pack('<II', zlib.crc32(data), len(data))
+
+def read_block(f):
+  '''
+  Read next BGZF block from binary file handle.
+
+  Output:
+    (block size in file, uncompressed data) or None at end of file
+  '''
+  raw = read_raw_block(f)
+  if raw is None:
+    return None
+
+  return raw[0], inflate(raw)
+
+def iter_blocks(f, threads=1):
+  '''
+  Iterate over BGZF blocks from current position of binary file handle.
+  Blocks are decompressed in a thread pool (ahead of the consumer).
+
+  Yields:
+    (block offset, block size in file, uncompressed data)
+  '''
+  if threads <= 1:
+    while True:
+      coffset = f.tell()
+      raw = read_raw_block(f)
+      if raw is None:
+        return
+      yield coffset, raw[0], inflate(raw)
+  with ThreadPoolExecutor(threads) as pool:
+    pending = deque()
+    eof = False
+    while True:
+      while not eof and len(pending) < threads * BLOCKS_PER_THREAD:
+        coffset = f.tell()
+        raw = read_raw_block(f)
+        if raw is None:
+          eof = True
+        else:
+          pending.append((coffset, raw[0], pool.submit(inflate, raw)))
+      if len(pending) == 0:
+        return
+      coffset, bsize, fut = pending.popleft()
+      yield coffset, bsize, fut.result()
+
+def iter_lines(fn, voffset=0, voffset_end=None, threads=1):
+  '''
+  Iterate over text lines of BGZF file starting at virtual offset.
+
+  Yields:
+    (virtual offset of line start, line)
+  Stops before the first line starting at or after voffset_end (if given).
+  '''
+  with open(fn, 'rb') as f:
+    f.seek(voffset >> 16)
+    skip = voffset & 0xFFFF
+    rest = b''
+    rest_voff = None
+    for coffset, bsize, data in iter_blocks(f, threads):
+      if skip:
+        data = data[skip:]
+      start = skip
+      skip = 0
+      pos = 0
+      while True:
+        idx = data.find(b'\n', pos)
+        if idx < 0:
+          break
+        voff = rest_voff if rest_voff is not None else (coffset << 16) | (start + pos)
+        if voffset_end is not None and voff >= voffset_end:
+          return
+        yield voff, (rest + data[pos:idx+1]).decode()
+        rest = b''
+        rest_voff = None
+        pos = idx + 1
+      if pos < len(data):
+        if rest_voff is None:
+          rest_voff = (coffset << 16) | (start + pos)
+        rest += data[pos:]
+    if rest:
+      if voffset_end is None or rest_voff < voffset_end:
+        yield rest_voff, rest.decode()
+
+def iter_text(fn, threads=1):
+  '''Iterate over text lines of whole BGZF file (no offset bookkeeping).'''
+  with open(fn, 'rb') as f:
+    rest = b''
+    for coffset, bsize, data in iter_blocks(f, threads):
+      data = rest + data
+      idx = data.rfind(b'\n') + 1
+      rest = data[idx:]
+      for line in io.StringIO(data[:idx].decode()):
+        yield line
+    if rest:
+      yield rest.decode()
+
+class Reader(object):
+  '''Text file handle for reading BGZF file with threaded decompression.'''
+  def __init__(self, fn, threads=1):
+    self.lines = iter_text(fn, threads)
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    return next(self.lines)
+
+  def close(self):
+    self.lines.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+def reg2bin(beg, end, min_shift=MIN_SHIFT, depth=DEPTH):
+  '''Smallest bin containing 0-based half-open interval [beg, end).'''
+  end -= 1
+  s = min_shift
+  t = ((1 << depth * 3) - 1) // 7
+  for l in range(depth, 0, -1):
+    if beg >> s == end >> s:
+      return t + (beg >> s)
+    s += 3
+    t -= 1 << (l * 3)
+
+  return 0
+
+def bin_first_window(b, min_shift=MIN_SHIFT, depth=DEPTH):
+  '''Index of first linear index window covered by bin.'''
+  l = 0
+  t = 0
+  while b >= t + (1 << (l * 3)):
+    t += 1 << (l * 3)
+    l += 1
+
+  return (b - t) << ((depth - l) * 3)
+
+class Indexer(object):
+  '''
+  Collect index bins of VCF records (in uncompressed file offsets) and write
+  a CSI or tabix index once the virtual offsets of the blocks are known.
+  Records must be sorted (contigs contiguous, POS ascending).
+  '''
+  def __init__(self, fmt='csi', min_shift=MIN_SHIFT, depth=DEPTH):
+    if fmt not in ('csi', 'tbi'):
+      raise ValueError('Unknown index format: {}'.format(fmt))
+    self.fmt = fmt
+    self.min_shift = min_shift if fmt == 'csi' else MIN_SHIFT
+    self.depth = depth if fmt == 'csi' else DEPTH
+    self.names = []
+    self.contigs = [] # per contig: dict (see add())
+    self.cur = None
+    self.last_beg = 0
+
+  def add(self, contig, beg, end, ustart, uend):
+    '''Add record on contig covering [beg, end) at uncompressed offsets [ustart, uend).'''
+    if self.cur is None or contig != self.names[-1]:
+      if contig in self.names:
+        raise ValueError('Records not sorted: contig "{}" is not contiguous'.format(contig))
+      self.names.append(contig)
+      self.cur = {'bins': {}, 'linear': [], 'beg': ustart, 'end': uend, 'n': 0}
+      self.contigs.append(self.cur)
+      self.last_beg = 0
+    if beg < self.last_beg:
+      raise ValueError('Records not sorted: {}:{}'.format(contig, beg + 1))
+    if end >> (self.min_shift + self.depth * 3) > 0:
+      raise ValueError('Position too large for index: {}:{}'.format(contig, end))
+    self.last_beg = beg
+    end = max(end, beg + 1)
+    cur = self.cur
+    chunks = cur['bins'].setdefault(reg2bin(beg, end, self.min_shift, self.depth), [])
+    if chunks and chunks[-1][1] == ustart:
+      chunks[-1][1] = uend
+    else:
+      chunks.append([ustart, uend])
+    linear = cur['linear']
+    w_end = (end - 1) >> self.min_shift
+    if len(linear) <= w_end:
+      linear.extend([None] * (w_end + 1 - len(linear)))
+    for w in range(beg >> self.min_shift, w_end + 1):
+      if linear[w] is None:
+        linear[w] = ustart
+    cur['end'] = uend
+    cur['n'] += 1
+
+  def add_lines(self, data, ustart):
+    '''Add VCF data lines (bytes, complete lines) starting at uncompressed offset.'''
+    pos = 0
+    while pos < len(data):
+      idx = data.find(b'\n', pos)
+      idx = len(data) if idx < 0 else idx + 1
+      line = data[pos:idx]
+      if not line.startswith(b'#'):
+        cols = line.split(b'\t', 8)
+        beg = int(cols[1]) - 1
+        end = beg + len(cols[3])
+        info = cols[7].rstrip(b'\n') if len(cols) > 7 else b'.'
+        if info.startswith(b'END=') or b';END=' in info:
+          i = 4 if info.startswith(b'END=') else info.index(b';END=') + 5
+          j = info.find(b';', i)
+          end = int(info[i:j] if j >= 0 else info[i:])
+        self.add(cols[0].decode(), beg, end, ustart + pos, ustart + idx)
+      pos = idx
+
+  def header(self):
+    '''Tabix-style header (VCF format, names).'''
+    names = b''.join(x.encode() + b'\0' for x in self.names)
+    return struct.pack('<7i', TBX_VCF, 1, 2, 0, ord('#'), 0, len(names)) + names
+
+  def serialize(self, to_voffset):
+    '''Binary index (uncompressed); to_voffset maps uncompressed offsets.'''
+    out = []
+    if self.fmt == 'csi':
+      hdr = self.header()
+      out.append(b'CSI\x01' + struct.pack('<3i', self.min_shift, self.depth, len(hdr)) + hdr)
+      out.append(struct.pack('<i', len(self.contigs)))
+    else:
+      out.append(b'TBI\x01' + struct.pack('<i', len(self.contigs)) + self.header())
+    pseudo_bin = ((1 << ((self.depth + 1) * 3)) - 1) // 7 + 1
+    for c in self.contigs:
+      # linear index: windows without records point to the next record
+      linear = list(c['linear'])
+      for w in range(len(linear) - 2, -1, -1):
+        if linear[w] is None:
+          linear[w] = linear[w+1]
+      linear = [to_voffset(x) for x in linear]
+      out.append(struct.pack('<i', len(c['bins']) + 1))
+      for b in sorted(c['bins']):
+        chunks = [x for ch in c['bins'][b] for x in (to_voffset(ch[0]), to_voffset(ch[1]))]
+        if self.fmt == 'csi':
+          w = bin_first_window(b, self.min_shift, self.depth)
+          loff = linear[w] if w < len(linear) else chunks[0]
+          out.append(struct.pack('<IQi', b, loff, len(chunks) // 2))
+        else:
+          out.append(struct.pack('<Ii', b, len(chunks) // 2))
+        out.append(struct.pack('<{}Q'.format(len(chunks)), *chunks))
+      # pseudo-bin: contig span and number of records
+      span = [to_voffset(c['beg']), to_voffset(c['end']), c['n'], 0]
+      if self.fmt == 'csi':
+        out.append(struct.pack('<IQi4Q', pseudo_bin, 0, 2, *span))
+      else:
+        out.append(struct.pack('<Ii4Q', pseudo_bin, 2, *span))
+        out.append(struct.pack('<i', len(linear)) + struct.pack('<{}Q'.format(len(linear)), *linear))
+    out.append(struct.pack('<Q', 0)) # no unplaced records
+
+    return b''.join(out)
+
+class Writer(object):
+  '''
+  Text file handle for writing BGZF file. Blocks are compressed in a thread
+  pool and written in order. If index is set ("csi" or "tbi"), written VCF
+  records are indexed and the index is written to <fn>.<index> on close().
+  '''
+  def __init__(self, fn, threads=1, index=None, level=6):
+    self.fn = fn
+    self.f = open(fn, 'wb')
+    self.level = level
+    self.threads = threads
+    self.pool = ThreadPoolExecutor(threads) if threads > 1 else None
+    self.pending = deque()
+    self.buf = bytearray()
+    self.upos = 0     # uncompressed offset of start of buffer
+    self.coffset = 0  # file offset of next block
+    self.indexer = Indexer(index) if index else None
+    self.blocks = ([], []) # uncompressed and file offsets of blocks (indexing)
+    self.line_rest = b''   # incomplete line (indexing)
+
+  def write(self, text):
+    data = text.encode() if isinstance(text, str) else text
+    if self.indexer is not None:
+      ustart = self.upos + len(self.buf) - len(self.line_rest)
+      lines = self.line_rest + data
+      idx = lines.rfind(b'\n') + 1
+      self.indexer.add_lines(lines[:idx], ustart)
+      self.line_rest = lines[idx:]
+    self.buf += data
+    if len(self.buf) >= BLOCK_DATA_SIZE:
+      n = len(self.buf) - len(self.buf) % BLOCK_DATA_SIZE
+      for i in range(0, n, BLOCK_DATA_SIZE):
+        self.submit(bytes(self.buf[i:i+BLOCK_DATA_SIZE]))
+      del self.buf[:n]
+
+  def submit(self, data):
+    '''Queue block for compression (write finished blocks in order).'''
+    if self.pool is None:
+      self.write_block(self.upos, deflate(data, self.level))
+    else:
+      self.pending.append((self.upos, self.pool.submit(deflate, data, self.level)))
+      while len(self.pending) > self.threads * BLOCKS_PER_THREAD:
+        upos, fut = self.pending.popleft()
+        self.write_block(upos, fut.result())
+    self.upos += len(data)
+
+  def write_block(self, upos, block):
+    if self.indexer is not None:
+      self.blocks[0].append(upos)
+      self.blocks[1].append(self.coffset)
+    self.f.write(block)
+    self.coffset += len(block)
+
+  def to_voffset(self, upos):
+    '''Virtual offset of uncompressed offset (after all blocks are written).'''
+    i = bisect_right(self.blocks[0], upos) - 1
+    return (self.blocks[1][i] << 16) | (upos - self.blocks[0][i])
+
+  def close(self):
+    if self.f is None:
+      return
+    if len(self.buf) > 0:
+      self.submit(bytes(self.buf))
+      self.buf = bytearray()
+    while self.pending:
+      upos, fut = self.pending.popleft()
+      self.write_block(upos, fut.result())
+    self.f.write(EOF_BLOCK)
+    self.f.close()
+    self.f = None
+    if self.indexer is not None:
+      if self.line_rest:
+        self.indexer.add_lines(self.line_rest, self.upos - len(self.line_rest))
+      idx = Writer('{}.{}'.format(self.fn, self.indexer.fmt), self.threads)
+      idx.write(self.indexer.serialize(self.to_voffset))
+      idx.close()
+    if self.pool is not None:
+      self.pool.shutdown()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+def open_out(fn, threads=1, index=None):
+  '''Open output file for writing text (BGZF with index if ending in ".gz").'''
+  if fn.endswith('.gz'):
+    return Writer(fn, threads, index)
+
+  return open(fn, 'wt')
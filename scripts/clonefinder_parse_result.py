@@ -11,13 +11,13 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-11-12
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 import os, sys
 import argparse
 #import re
-from bitarray import bitarray
+import numpy as np
 from ete3 import Tree
 
 def parse_args():
@@ -58,40 +58,18 @@ def parse_tree(fh):
 
   return t
 
-def get_genotype(node, node_gt):
-  if node.name in node_gt:
-    gt = node_gt[node.name]
-  else: # reconstruct GT as intersection of children's GTs
-    lst_child_gt = []
-    for child in node.children:
-      lst_child_gt.append(get_genotype(child, node_gt))
-    gt = lst_child_gt[0] # if this fails, we arrived at a tip without GT -> baaad!
-    if len(lst_child_gt) > 1: # if there is just one child, parent is assumed to share same GT
-      for child_gt in lst_child_gt[1:]:
-        gt = gt & child_gt
-    # subtract parent muts from child GT (record only first occurrence of muts)
-    for child in node.children:
-      child_gt = node_gt[child.name]
-      node_gt[child.name] = child_gt &~ gt
-    node_gt[node.name] = gt
-
-  return gt
-
-def reduce_genotype(node, node_gt):
-  '''Recursively remove mutations of parent from child nodes.'''
-  gt_parent = node_gt[node.name]
-  for child in node.children:
-    gt_child = node_gt[child.name]
-    # update child genotype (gt_child AND (NOT gt_parent))
-    node_gt[child.name] = gt_child &~ gt_parent
-    reduce_genotype(child, node_gt)
-
 def parse_genotypes(fh, tree):
   '''
   Parse CloneFinder genotypes file.
   
   Genotypes are converted, so that mutations are assigned to the tree node
-  in which they first ocurred.
+  in which they first ocurred: the genotype of an internal node (without
+  genotype record) is the intersection of its children's genotypes, which
+  are then reduced to mutations not present in the parent.
+
+  Output:
+    node ids, bit-packed genotype matrix (nodes x mutations), number of
+    mutations
   '''
   # number of lines to discard from top of file
   skip = 4
@@ -99,7 +77,7 @@ def parse_genotypes(fh, tree):
   for i in range(skip):
     line = fh.readline()
 
-  node_gt = {} # store genotype (bitarray) for each node
+  node_seq = {} # store genotype string for each node
   header = ''
   # parse header/genotype records
   for line in fh:
@@ -111,20 +89,53 @@ def parse_genotypes(fh, tree):
       header = '#Normal'
     # extract node id from header
     id_node = header[1:]
-    # parse genotype
-    gt_str = line.strip() # expected: string of 'A's (absent) and 'T's (present)
-    gt = bitarray([1 if c == 'T' else 0 for c in gt_str])
-    node_gt[id_node] = gt
-  
-  # reconstruct genotypes of internal tree nodes
-  root_gt = get_genotype(tree, node_gt)
-  assert sum(root_gt) == 0, 'Root genotype should be all REF...'
+    # expected: string of 'A's (absent) and 'T's (present)
+    node_seq[id_node] = line.strip().encode()
+
+  known = set(node_seq.keys())
+  lens = set(len(x) for x in node_seq.values())
+  if len(lens) > 1:
+    raise ValueError('Genotypes differ in length: {}'.format(sorted(lens)))
+  n_mut = lens.pop() if lens else 0
+  # nodes with genotype record are not descended into
+  nodes = list(tree.traverse('postorder', is_leaf_fn=lambda n: n.name in known))
+  ids = list(node_seq.keys()) + [n.name for n in nodes if n.name not in known]
+  row = {x: i for i, x in enumerate(ids)}
+
+  # convert genotype strings to bit-packed matrix
+  gt = np.zeros((len(ids), (n_mut + 7) // 8), dtype=np.uint8)
+  if len(node_seq) > 0:
+    seqs = np.frombuffer(b''.join(node_seq.values()), dtype=np.uint8).reshape(len(node_seq), n_mut)
+    gt[:len(node_seq)] = np.packbits(seqs == ord('T'), axis=1)
+
+  # reconstruct genotypes of internal tree nodes (children before parents)
+  for node in nodes:
+    if node.name in known:
+      continue
+    if node.is_leaf():
+      raise ValueError('No genotype for tip: {}'.format(node.name))
+    idx = [row[child.name] for child in node.children]
+    # if there is just one child, parent is assumed to share same GT
+    gt_node = np.bitwise_and.reduce(gt[idx], axis=0)
+    # subtract parent muts from child GT (record only first occurrence of muts)
+    gt[idx] &= ~gt_node
+    gt[row[node.name]] = gt_node
+  assert not gt[row[tree.name]].any(), 'Root genotype should be all REF...'
+
+  return ids, gt, n_mut
 
-  # convert genotypes into mutation clusters (only first occurrence of mut noted)
-  #import pdb; pdb.set_trace()
-  #reduce_genotype(tree, node_gt)
+def snv_clusters(ids, gt, n_mut, lst_var):
+  '''
+  Convert genotypes into mutation clusters.
+
+  Output:
+    list of (id_mut, id_cluster), sorted by cluster and mutation order
+  '''
+  order = sorted(range(len(ids)), key=lambda i: ids[i])
+  present = np.unpackbits(gt[order], axis=1, count=n_mut)[:, :len(lst_var)]
+  idx_node, idx_mut = np.nonzero(present)
 
-  return node_gt
+  return [(lst_var[j], ids[order[i]]) for i, j in zip(idx_node.tolist(), idx_mut.tolist())]
 
 def parse_prevalence(fh):
   '''Read prevalence matrix and convert to dict.'''
@@ -150,7 +161,7 @@ def main(args):
   # read clone tree
   tree = parse_tree(args['tree'])
   # reconstruct genotypes
-  node_gt = parse_genotypes(args['genotypes'], tree)
+  ids, gt, n_mut = parse_genotypes(args['genotypes'], tree)
   # read cluster prevalences
   clust_smp_prev = parse_prevalence(args['prevalences'])
   
@@ -182,10 +193,7 @@ def main(args):
   fn_snvs = os.path.join(args['outdir'], 'inf.snvs.csv')
   with open(fn_snvs, 'wt') as f:
     f.write('chrom_pos,id_cluster\n')
-    for id_cluster in sorted(node_gt.keys()):
-      for id_mut, present in zip(lst_var, node_gt[id_cluster]):
-        if present:
-          f.write('{},{}\n'.format(id_mut, id_cluster))
+    f.write(''.join('{},{}\n'.format(id_mut, id_cluster) for id_mut, id_cluster in snv_clusters(ids, gt, n_mut, lst_var)))
 
 if __name__ == '__main__':
   args = parse_args()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Optimal one-to-one matching of TRUE clones and INFERRED clusters.
+#
+# Cluster labels are integer-coded, the TRUE x INFERRED overlap matrix is
+# built with a single bincount and the matching maximizing the number of
+# shared variants is found by solving the linear assignment problem.
+#
+# The matching is cached per (replicate, tool), i.e. next to the INFERRED
+# assignments, so that metrics_clustering.py and metrics_prevalence.py reuse
+# one matching instead of each recomputing the overlaps.
+#
+# Input:
+#   - TRUE variant-to-cluster assignments (CSV: chrom_pos,id_cluster,...)
+#   - INFERRED variant-to-cluster assignment (CSV: chrom_pos,id_cluster,...)
+# Output (cache):
+#   CSV: id_cluster_true,id_cluster_inf,n_snvs,matched
+#   (clusters without shared variants: empty partner id; written atomically)
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import argparse
+import tempfile
+from collections import namedtuple
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# default file name of cached matching (in directory of INFERRED assignments)
+FN_CACHE = 'inf.matching.csv'
+
+# clusters_true/clusters_inf : cluster labels (row/column order of overlap)
+# overlap                    : TRUE x INFERRED matrix of shared variants
+# pairs                      : matched (idx_true, idx_inf) index pairs
+Matching = namedtuple('Matching', 'clusters_true clusters_inf overlap pairs')
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Match TRUE clones to INFERRED clusters.')
+  parser.add_argument('true_snvs', type=argparse.FileType('r'), help='TRUE variant-to-cluster mapping (CSV: chrom_pos,id_cluster,...).')
+  parser.add_argument('inf_snvs', type=argparse.FileType('r'), help='INFERRED variant-to-cluster mapping (CSV: chrom_pos,id_cluster,...).')
+  parser.add_argument('--cache', help='Cached matching (default: "{}" next to INFERRED mapping).'.format(FN_CACHE))
+
+  args = parser.parse_args()
+  return args
+
+def read_assignments(fn):
+  '''
+  Read variant-to-cluster assignments.
+
+  Output:
+    dict {chrom_pos: id_cluster}
+  '''
+  snv_clust = {}
+  with open(fn) as fh:
+    hdr = fh.readline()
+    for line in fh:
+      cols = line.strip().split(',', 2)
+      snv_clust[cols[0]] = cols[1]
+
+  return snv_clust
+
+def encode_labels(tru_snv, inf_snv):
+  '''
+  Integer-code cluster labels of variants present in TRUE and INFERRED.
+
+  All clusters are kept as labels (also those not sharing any variant), so
+  that they show up as empty rows/columns of the overlap matrix.
+
+  Output:
+    (clusters_true, codes_true, clusters_inf, codes_inf)
+  '''
+  joint_snv = sorted(set(tru_snv.keys()) & set(inf_snv.keys()))
+  clusters_true = np.array(sorted(set(tru_snv.values())))
+  clusters_inf  = np.array(sorted(set(inf_snv.values())))
+  codes_true = np.searchsorted(clusters_true, [tru_snv[x] for x in joint_snv])
+  codes_inf  = np.searchsorted(clusters_inf,  [inf_snv[x] for x in joint_snv])
+
+  return clusters_true, codes_true, clusters_inf, codes_inf
+
+def overlap_matrix(codes_true, codes_inf, n_true, n_inf):
+  '''Count shared variants for each pair of TRUE and INFERRED clusters.'''
+  cells = np.asarray(codes_true, dtype=np.int64) * n_inf + np.asarray(codes_inf, dtype=np.int64)
+  overlap = np.bincount(cells, minlength=n_true*n_inf)
+
+  return overlap.reshape(n_true, n_inf)
+
+def match_clusters(overlap):
+  '''Match clusters one-to-one maximizing the total number of shared variants.'''
+  idx_true, idx_inf = linear_sum_assignment(-overlap)
+
+  return list(zip(idx_true.tolist(), idx_inf.tolist()))
+
+def compute_matching(tru_snv, inf_snv):
+  '''Build overlap matrix from variant-to-cluster assignments and match clusters.'''
+  clusters_true, codes_true, clusters_inf, codes_inf = encode_labels(tru_snv, inf_snv)
+  overlap = overlap_matrix(codes_true, codes_inf, len(clusters_true), len(clusters_inf))
+  pairs = match_clusters(overlap)
+
+  return Matching(clusters_true, clusters_inf, overlap, pairs)
+
+def write_matching(m, fn):
+  '''
+  Write non-empty cells of overlap matrix and matched pairs to CSV.
+  Clusters without any such cell are listed with an empty partner id, so that
+  all cluster labels are restored by read_matching().
+  '''
+  matched = set(m.pairs)
+  # write to temporary file first (concurrent jobs may share the cache)
+  fd, fn_tmp = tempfile.mkstemp(suffix='.csv', dir=os.path.dirname(fn) or '.')
+  try:
+    with os.fdopen(fd, 'wt') as f:
+      f.write('id_cluster_true,id_cluster_inf,n_snvs,matched\n')
+      listed_true = np.zeros(len(m.clusters_true), dtype=bool)
+      listed_inf = np.zeros(len(m.clusters_inf), dtype=bool)
+      for i, id_true in enumerate(m.clusters_true):
+        for j, id_inf in enumerate(m.clusters_inf):
+          is_matched = (i, j) in matched
+          if m.overlap[i, j] > 0 or is_matched:
+            f.write('{},{},{},{}\n'.format(id_true, id_inf, m.overlap[i, j], int(is_matched)))
+            listed_true[i] = listed_inf[j] = True
+      for id_true in m.clusters_true[~listed_true]:
+        f.write('{},,0,0\n'.format(id_true))
+      for id_inf in m.clusters_inf[~listed_inf]:
+        f.write(',{},0,0\n'.format(id_inf))
+    os.replace(fn_tmp, fn)
+  finally:
+    if os.path.exists(fn_tmp):
+      os.remove(fn_tmp)
+
+def read_matching(fn):
+  '''Read matching written by write_matching().'''
+  cells = []
+  with open(fn) as fh:
+    hdr = fh.readline()
+    for line in fh:
+      id_true, id_inf, n, matched = line.strip().split(',')
+      cells.append((id_true, id_inf, int(n), matched == '1'))
+  # empty ids: cluster without shared variants
+  clusters_true = np.array(sorted(set(c[0] for c in cells if c[0] != '')))
+  clusters_inf  = np.array(sorted(set(c[1] for c in cells if c[1] != '')))
+  overlap = np.zeros((len(clusters_true), len(clusters_inf)), dtype=np.int64)
+  pairs = []
+  for id_true, id_inf, n, matched in cells:
+    if id_true == '' or id_inf == '':
+      continue
+    i = np.searchsorted(clusters_true, id_true)
+    j = np.searchsorted(clusters_inf, id_inf)
+    overlap[i, j] = n
+    if matched:
+      pairs.append((int(i), int(j)))
+
+  return Matching(clusters_true, clusters_inf, overlap, sorted(pairs))
+
+def get_matching(fn_true, fn_inf, fn_cache=None, tru_snv=None, inf_snv=None):
+  '''
+  Load matching from cache if it is newer than both inputs, else compute it
+  and update the cache.
+
+  Variant-to-cluster assignments which were already read by the caller may be
+  passed in to avoid parsing the inputs twice.
+  '''
+  if fn_cache is None:
+    fn_cache = os.path.join(os.path.dirname(fn_inf), FN_CACHE)
+  if os.path.exists(fn_cache):
+    mtime = os.path.getmtime(fn_cache)
+    if mtime >= os.path.getmtime(fn_true) and mtime >= os.path.getmtime(fn_inf):
+      return read_matching(fn_cache)
+
+  if tru_snv is None:
+    tru_snv = read_assignments(fn_true)
+  if inf_snv is None:
+    inf_snv = read_assignments(fn_inf)
+  m = compute_matching(tru_snv, inf_snv)
+  try:
+    write_matching(m, fn_cache)
+  except OSError as e:
+    print('[WARN] could not write matching cache: {}'.format(e), file=sys.stderr)
+
+  return m
+
+def matched_accuracy(m):
+  '''Fraction of joint variants assigned to matched cluster pairs.'''
+  n = m.overlap.sum()
+  if n == 0:
+    return 0.0
+  n_matched = sum(m.overlap[i, j] for i, j in m.pairs)
+
+  return float(n_matched) / n
+
+def main(args):
+  m = get_matching(args.true_snvs.name, args.inf_snvs.name, args.cache)
+  print('id_cluster_true,id_cluster_inf,n_snvs')
+  for i, j in m.pairs:
+    print('{},{},{}'.format(m.clusters_true[i], m.clusters_inf[j], m.overlap[i, j]))
+
+if __name__ == '__main__':
+  args = parse_args()
+  main(args)
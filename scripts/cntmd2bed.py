@@ -1,104 +1,212 @@
-# vim: syntax=python tabstop=2 expandtab
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
 # coding: utf-8
 #------------------------------------------------------------------------------
-# author : Harald Detering (harald.detering@gmail.com)
-# date   : 21.01.2019
+# Convert CNT-MD output file to BED-formatted copy-number files.
+#
+# CNT-MD input file (bp coordinates of segments on "#SAMPLES" line):
+#   #PARAMS
+#   <n_chrom> #number of chromosomes
+#   <n_samples> #number of samples
+#   <n_seg_1> <n_seg_2> ... #number of segments for each chromosome
+#   #SAMPLES <chrom> : <beg>,<end> <beg>,<end> ... | <chrom> : ...
+#   <sample> : <cn> <cn> ... | ...
+#
+# CNT-MD output file:
+#   #PARAMS      : n_chrom, n_leaves, segments per chromosome
+#   #PROFILES    : <profile> : <cn> ... | ...
+#   #EDGES       : <profile> -> <profile>
+#   #EVENTS, #MIX-PARAMS
+#   #PROPORTIONS : proportions of leaves for each sample
+#   #SAMPLES     : <sample> : <cn> ... | ...
+#
+# Copy numbers are either total ("<cn>") or allele-specific ("<cn_a>,<cn_b>").
+# Both files are read line by line; a BED file is written for each profile
+# (clone) and each sample as soon as its line is read:
+#   chrom  start  end  cn_total  cn_a  cn_b   ("." if not allele-specific)
+# Records are sorted by chromosome (in input order) and start, ready for
+# bgzip/tabix (files are bgzipped with --bgzip).
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import division, print_function
 import os, sys, argparse
-import re
+import bgzf
+
+SECTIONS = ['#PARAMS', '#PROFILES', '#EDGES', '#EVENTS', '#MIX-PARAMS', '#PROPORTIONS', '#SAMPLES']
+BED_HEADER = '#chrom\tstart\tend\tcn_total\tcn_a\tcn_b\n'
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Convert CNT-MD output file to BED-formatted file.')
-  parser.add_argument('cntmd_input', 
-                      metavar='CNTMD-input', 
-                      type=argparse.FileType('r'), 
+  parser.add_argument('cntmd_input',
+                      metavar='CNTMD-input',
+                      type=argparse.FileType('r'),
                       help='Input file used with CNT-MD (contains bp coordinates).')
-  parser.add_argument('cntmd_output', 
-                      metavar='CNTMD-output', 
-                      type=argparse.FileType('r'), 
+  parser.add_argument('cntmd_output',
+                      metavar='CNTMD-output',
+                      type=argparse.FileType('r'),
                       help='Output text file from CNT-MD (contains CN states).')
+  parser.add_argument('--outdir', default='.', help='Output directory for BED files (default: current directory).')
+  parser.add_argument('--prefix', default='', help='Prefix for output file names ("<prefix>clone_<id>.bed", "<prefix>sample_<id>.bed").')
+  parser.add_argument('--bgzip', action='store_true', help='Write bgzipped BED files (".bed.gz").')
   args = parser.parse_args()
 
   return args
 
-def parse_cntmd_input(file_handle):
-  # extract CN profiles, CN profile tree and profile mixture from
-  regex = r'''#PARAMS
-(?P<nchrom>\d+)( #.*)?
-(?P<nsamples>\d+) (#.*)?
-(?P<nsegs>(?:\d+ )+)(#.*)?
-#SAMPLES (?P<segments>[^\n]+)
-(?P<samples>.+)'''
-  m = re.match(regex, file_handle.read(), flags=re.MULTILINE | re.DOTALL)
-  if not m:
+def strip_comment(line):
+  return line.split('#', 1)[0].strip()
+
+def parse_params(fh):
+  '''Read 3 parameter lines following "#PARAMS" (n_chrom, n_samples/n_leaves, n_segs).'''
+  n_chrom = int(strip_comment(next(fh)))
+  n = int(strip_comment(next(fh)))
+  n_segs = [int(x) for x in strip_comment(next(fh)).split()]
+  if len(n_segs) != n_chrom:
+    raise ValueError('Expected segment counts for {} chromosomes: {}'.format(n_chrom, n_segs))
+
+  return n_chrom, n, n_segs
+
+def parse_coords(text, n_segs):
+  '''
+  Parse segment coordinates ("<chrom> : <beg>,<end> ... | ...").
+
+  Output:
+    list of (chrom, beg, end) in input order
+  '''
+  segs = []
+  parts = text.split('|')
+  if len(parts) != len(n_segs):
+    raise ValueError('Expected coordinates for {} chromosomes, found {}'.format(len(n_segs), len(parts)))
+  for part, n in zip(parts, n_segs):
+    chrom, sep, str_segs = part.partition(':')
+    coords = str_segs.split()
+    if len(coords) != n:
+      raise ValueError('Expected {} segments for chromosome {}, found {}'.format(n, chrom.strip(), len(coords)))
+    for x in coords:
+      beg, end = x.split(',')
+      segs.append((chrom.strip(), int(beg), int(end)))
+
+  return segs
+
+def parse_cntmd_input(fh):
+  '''Read segment coordinates from CNT-MD input file (sample lines are not read).'''
+  segs = None
+  n_segs = None
+  for line in fh:
+    if line.startswith('#PARAMS'):
+      n_chrom, n_samples, n_segs = parse_params(fh)
+    elif line.startswith('#SAMPLES'):
+      # segment counts are needed to parse coordinates (#PARAMS comes first)
+      if n_segs is not None:
+        segs = parse_coords(line[len('#SAMPLES'):].strip(), n_segs)
+      break
+  if segs is None:
     print('[ERROR] CNT-MD input file does not match expected format.', file=sys.stderr)
     sys.exit(1)
-  
-  nchrom = int(m.group('nchrom'))
-  nsamples = int(m.group('nsamples'))
-  nsegs = [int(x) for x in m.group('nsegs').strip().split(' ')]
-  segments = []
-  for x in  m.group('segments').strip().split(' | '):
-    chrom, str_segs = x.strip().split(' : ')
-    segments.append([chrom, [x.split(',') for x in str_segs.strip().split(' ')]])
-  print("chromosomes: %s" % segments)
-
-def parse_cntmd_output(file_handle):
-  # extract CN profiles, CN profile tree and profile mixture from
-  regex = r'''#PARAMS
-(?P<nchrom>\d+)( #.*)?
-(?P<nleaves>\d+)( #.*)?
-(?P<nsegs>(?:\d+ )+)(#.*)?
-#PROFILES
-(?P<profiles>.+)
-#EDGES
-(?P<edges>.+)
-#EVENTS
-(?P<events>.+)
-#MIX\-PARAMS
-(?P<mix_params>.+)
-#PROPORTIONS
-(?P<proportions>.+)
-#SAMPLES
-(?P<samples>.+)'''
-  m = re.match(regex, file_handle.read(), flags=re.MULTILINE | re.DOTALL)
-  if not m:
-    print('[ERROR] CNT-MD output file does not match expected format.', file=sys.stderr)
-    sys.exit(1)
-  
-  nchrom = int(m.group('nchrom'))
-  nleaves = int(m.group('nleaves'))
-  nsegs = [int(x) for x in m.group('nsegs').strip().split(' ')]
-  # PROFILES
-  profiles = {}
-  for x in m.group('profiles').strip().split('\n'):
-    y, z = x.strip().split(' : ')
-    profiles[int(y)] = z
-  nprofiles = len(profiles.keys())
-  # EDGES
-  v1 = set()
-  v2 = set()
-  for x in m.group('edges').strip().split('\n'):
-    a, b = x.strip().split(' -> ')
-    v1.add(a)
-    v2.add(b)
-  vertices = v1 | v2
-  leaves = vertices - v1
-  assert( len(vertices) == nprofiles )
-  assert( len(leaves) == nleaves )
 
+  return segs
+
+def sort_order(segs):
+  '''Order of segments sorted by chromosome (first appearance) and start.'''
+  rank = {}
+  for chrom, beg, end in segs:
+    rank.setdefault(chrom, len(rank))
+
+  return sorted(range(len(segs)), key=lambda i: (rank[segs[i][0]], segs[i][1]))
+
+def fmt_cn(x):
+  '''Format CN value ("<cn>" or "<cn_a>,<cn_b>") as BED columns.'''
+  if ',' not in x:
+    return x + '\t.\t.'
+  a, b = x.split(',')
+  tot = float(a) + float(b)
+
+  return '{}\t{}\t{}'.format(int(tot) if tot.is_integer() else tot, a, b)
+
+def write_bed(fn, segs, order, values):
+  '''Write BED file for one profile/sample (values in input order).'''
+  if len(values) != len(segs):
+    raise ValueError('{}: expected {} segments, found {}'.format(fn, len(segs), len(values)))
+  lines = ['{}\t{}\t{}\t{}\n'.format(segs[i][0], segs[i][1], segs[i][2], fmt_cn(values[i])) for i in order]
+  with bgzf.open_out(fn) as fh:
+    fh.write(BED_HEADER)
+    fh.write(''.join(lines))
+
+def parse_cn_line(line):
+  '''Parse "<id> : <cn> ... | ..." into id and list of CN values.'''
+  id_row, sep, vals = line.partition(':')
+  if not sep:
+    raise ValueError('Invalid CN line: {}'.format(line[:80]))
+
+  return id_row.strip(), vals.replace('|', ' ').split()
+
+def parse_cntmd_output(fh, segs, fn_bed):
+  '''
+  Read CNT-MD output file section by section, write BED for each profile
+  and sample.
+
+  Parameters:
+    fh     : CNT-MD output file handle
+    segs   : segment coordinates (from input file)
+    fn_bed : function returning output file name for ("clone"|"sample", id)
+  '''
+  order = sort_order(segs)
+  section = None
+  n_leaves = None
+  profiles = []
+  v1, v2 = set(), set()
   proportions = []
-  for x in m.group('proportions').strip().split('\n'):
-    proportions.append(x.strip().split(' '))
+  samples = []
+  for line in fh:
+    if line.startswith('#'):
+      name = line.split()[0]
+      if name not in SECTIONS:
+        continue
+      section = name
+      if section == '#PARAMS':
+        n_chrom, n_leaves, n_segs = parse_params(fh)
+        if sum(n_segs) != len(segs):
+          raise ValueError('Number of segments differs between input ({}) and output ({})'.format(len(segs), sum(n_segs)))
+      continue
+    line = line.strip()
+    if len(line) == 0:
+      continue
+    if section == '#PROFILES':
+      id_prof, vals = parse_cn_line(line)
+      write_bed(fn_bed('clone', id_prof), segs, order, vals)
+      profiles.append(id_prof)
+    elif section == '#EDGES':
+      a, b = line.split('->')
+      v1.add(a.strip())
+      v2.add(b.strip())
+    elif section == '#PROPORTIONS':
+      proportions.append(line.split())
+    elif section == '#SAMPLES':
+      id_smp, vals = parse_cn_line(line)
+      write_bed(fn_bed('sample', id_smp), segs, order, vals)
+      samples.append(id_smp)
+
+  vertices = v1 | v2
+  leaves = vertices - v1
+  if vertices and len(vertices) != len(profiles):
+    print('[WARN] Number of tree vertices ({}) differs from number of profiles ({}).'.format(len(vertices), len(profiles)), file=sys.stderr)
+  if n_leaves is not None and vertices and len(leaves) != n_leaves:
+    print('[WARN] Number of tree leaves ({}) differs from #PARAMS ({}).'.format(len(leaves), n_leaves), file=sys.stderr)
+  print('[INFO] Profiles: {}'.format(len(profiles)), file=sys.stderr)
+  print('[INFO] Leaves: {}'.format(' '.join(sorted(leaves))), file=sys.stderr)
+  print('[INFO] Samples: {} (proportions: {})'.format(len(samples), len(proportions)), file=sys.stderr)
 
-def main(fh_input, fh_output):
+def main(args):
+  ext = '.bed.gz' if args.bgzip else '.bed'
+  fn_bed = lambda kind, id_row: os.path.join(args.outdir, '{}{}_{}{}'.format(args.prefix, kind, id_row, ext))
   print("Parsing Input file...")
-  parse_cntmd_input(fh_input)
+  segs = parse_cntmd_input(args.cntmd_input)
   print("Parsing Output file...")
-  parse_cntmd_output(fh_output)
+  parse_cntmd_output(args.cntmd_output, segs, fn_bed)
 
 if __name__ == '__main__':
   args = parse_args()
-  main(args.cntmd_input, args.cntmd_output)
+  main(args)
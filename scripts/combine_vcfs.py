@@ -6,33 +6,47 @@
 #
 # Requirements:
 # - input VCFs have the same normal sample id
+# - input VCFs are sorted in the same way
 #
 # Outputs:
 # - VCF header of first infput VCF
+#
+# Inputs are merged in a single streaming pass (k-way merge over the sorted
+# inputs, constant memory); output is written in buffered blocks. Output to
+# ".gz" files is bgzipped and indexed in-process.
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-04-28
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
 import os, sys
 import argparse
-from collections import OrderedDict
-#import csv
-import vcf, vcf.utils
+import heapq
+import re
+import bgzf
+import vcf_columnar
+import vcf_writer
+
+regex_info = re.compile(r'^##INFO=<ID=([^,>]+)')
+regex_contig = re.compile(r'^##contig=<ID=([^,>]+)')
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Create PyClone YAML input file from VCF and copy-number BED.')
-  parser.add_argument('--vcf', required=True, action='append', 
+  parser.add_argument('--vcf', required=True, action='append',
     help='Input tumor-normal VCF file with somatic mutations and read counts.')
-  parser.add_argument('--out', required=True, type=argparse.FileType('wt'), 
-    help='Output multi-sample VCF file.')
-  parser.add_argument('--bed', type=argparse.FileType(), 
+  parser.add_argument('--out', required=True,
+    help='Output multi-sample VCF file (bgzipped and indexed if ending in ".gz").')
+  parser.add_argument('--index', choices=['csi', 'tbi'], default='csi',
+    help='Index format for bgzipped output (default: csi).')
+  parser.add_argument('--threads', type=int, default=1,
+    help='Number of threads for (de)compressing bgzipped VCFs (default: 1).')
+  parser.add_argument('--bed', type=argparse.FileType(),
     help='BED file with allele-specific copy number.')
-  parser.add_argument('--info-to-format', action='append', 
+  parser.add_argument('--info-to-format', action='append',
     help='Map INFO fields to FORMAT fields (id_INFO:id_FORMAT,[...])')
-  parser.add_argument('--nofilt', action='store_true', 
+  parser.add_argument('--nofilt', action='store_true',
     help='Disable filtering; otherwise only "PASS" variants are output (default: off).')
 
   args = parser.parse_args()
@@ -43,19 +57,19 @@ def parse_args():
   # 2. sample_id:filename
   args_dict['samples'] = []
   args_dict['fn_vcf'] = []
-  for vcf in args_dict['vcf']:
-    if ':' in vcf:
-      sid, fn = vcf.split(':')
+  for x in args_dict['vcf']:
+    if ':' in x:
+      sid, fn = x.split(':')
       args_dict['samples'].append(sid)
     else:
-      fn = vcf
+      fn = x
     args_dict['fn_vcf'].append(fn)
   # make sure files exist
   for fn in args_dict['fn_vcf']:
     if not os.path.exists(fn):
       print('[ERROR] file does not exist: {}'.format(fn), file=sys.stderr)
       sys.exit(1)
-  
+
   # parse INFO-to-FORMAT mapping
   args_dict['info-to-format'] = {}
   if args.info_to_format:
@@ -65,44 +79,92 @@ def parse_args():
 
   return args_dict
 
-def get_format_fields(rec, fields_info, fields_format=[], info_to_format={}, idx_sample=0):
-  '''Extract relevant fields from a vcf.Record object.'''
-  fields = {'INFO': {}, 'FORMAT': {}}
-  # sanity checks
-  assert type(rec) == vcf.Record
-
-  for f in fields_format:
-    if idx_sample < len(rec.samples) and f in rec.samples[idx_sample]:
-      fields['FORMAT'][f] = rec.FORMAT[f]
-  for f in fields_info:
-    if f in rec.INFO:
-      fields['INFO'][f] = rec.INFO[f]
-  for fi, fo in info_to_format.items():
-    if fi in rec.INFO:
-      fields['FORMAT'][fo] = rec.INFO[fi]
+def parse_info(info):
+  '''Parse INFO column into dict {id: raw value} (flags map to None).'''
+  fields = {}
+  if info == '.':
+    return fields
+  for x in info.split(';'):
+    k, sep, v = x.partition('=')
+    fields[k] = v if sep else None
 
   return fields
 
-def get_out_header(rdr, info_to_format={}):
-  hdr = rdr
+def read_records(fn, idx_file, contig_rank, threads=1):
+  '''
+  Iterate over records of a (gzipped) VCF file.
+
+  Yields heap entries (rank, pos, idx_file, cols), where rank is the index of
+  the contig in contig_rank (unknown contigs are appended in order of
+  appearance) and cols are the split VCF columns.
+  '''
+  with vcf_columnar.open_vcf(fn, threads) as fh:
+    for line in fh:
+      if line.startswith('#'):
+        continue
+      cols = line.rstrip('\n').split('\t')
+      chrom = cols[0]
+      if chrom not in contig_rank:
+        contig_rank[chrom] = len(contig_rank)
+      yield (contig_rank[chrom], int(cols[1]), idx_file, cols)
+
+def walk_together(fn_vcf, contigs=[], threads=1):
+  '''
+  Simultaneously iterate over sorted VCF files (k-way merge using a heap,
+  one record per file in memory). Records are ordered by contig (order of
+  "contigs", unknown contigs in order of appearance) and position.
+
+  Yields:
+    list with split record for each file (None if position is absent)
+  '''
+  contig_rank = {c: i for i, c in enumerate(contigs)}
+  readers = [read_records(fn, i, contig_rank, threads) for i, fn in enumerate(fn_vcf)]
+  heap = [e for e in (next(r, None) for r in readers) if e is not None]
+  heapq.heapify(heap)
+  while heap:
+    # pop records of all files at next position
+    recs = [None] * len(readers)
+    entry = heapq.heappop(heap)
+    key = entry[:2]
+    recs[entry[2]] = entry[3]
+    while heap and heap[0][:2] == key:
+      entry = heapq.heappop(heap)
+      recs[entry[2]] = entry[3]
+    yield recs
+    # advance files which had a record at this position
+    for i, rec in enumerate(recs):
+      if rec is not None:
+        entry = next(readers[i], None)
+        if entry is not None:
+          heapq.heappush(heap, entry)
+
+def get_out_header(hdr, samples, info_to_format={}):
+  '''
+  Create header lines for output VCF from header of first input VCF.
+  INFO fields mapped to FORMAT fields are turned into FORMAT definitions.
+  '''
+  meta = []
   fmt = []
-  for fi, fo in info_to_format.items():
-    info = hdr.infos.pop(fi)
-    hdr.formats[fo] = vcf.parser._Format(id=info.id, num=info.num, type=info.type, desc=info.desc)
-    fmt.append(fo)
-  if len(hdr._column_headers) == 8:
-    hdr._column_headers.append('FORMAT')
+  for line in hdr['meta']:
+    m = regex_info.match(line)
+    if m and m.group(1) in info_to_format:
+      fmt.append('##FORMAT=<ID={}{}'.format(info_to_format[m.group(1)], line[m.end():]))
+    else:
+      meta.append(line)
+  # insert FORMAT definitions after last existing one
+  idx = max([i+1 for i, line in enumerate(meta) if line.startswith('##FORMAT=')] or [len(meta)])
+  meta[idx:idx] = fmt
 
-  return hdr
+  return meta + ['#' + '\t'.join(vcf_columnar.COLS + samples)]
 
 def merge_field_allele_wise(merged_alleles, sample_alleles, sample_values):
   '''
   Update sample fields to apply to a merged set of alleles.
-  
+
   Parameters:
-    merged_alleles : joint list of alleles ([vcf.model._Substitution])
-    sample_alleles : list of lists of alleles per sample ([[vcf.model._Substitution], ...])
-    sample_values  : list of lists of value for each allele ()
+    merged_alleles : joint alleles {allele: index}
+    sample_alleles : list of lists of alleles per sample ([[str], ...])
+    sample_values  : list of lists of value for each allele ([[str], ...])
   '''
   assert len(sample_alleles) == len(sample_values)
   new_vals = []
@@ -113,104 +175,91 @@ def merge_field_allele_wise(merged_alleles, sample_alleles, sample_values):
       new_vals.append(None)
       continue
     assert len(alleles) == len(values)
-    v = [values[alleles.index(a)] if a in alleles else 0 for a in merged_alleles]
+    v = ['0'] * len(merged_alleles)
+    for a, x in zip(alleles, values):
+      v[merged_alleles[a]] = x
     new_vals.append(v)
 
   return new_vals
 
-def merge_records(records, lbl_samples, infos, formats, info2format):
-  '''Merge a list of vcf.Record objects into a single record.'''
-  chrom = ""; pos = 0; id = ""; ref = ""; alt = []; info = {}; fmt = {}
-
-  lst_chrom = []
-  lst_pos = []
-  lst_id = []
-  lst_ref = []
-  lst_alt = []
-  #base_count = {lbl: {nuc: 0 for nuc in 'ACGT'} for lbl in lbl_samples}
-  for i in range(len(records)):
-    rec = records[i]
+def merge_records(records, info2format, num_info):
+  '''
+  Merge records (split VCF lines, None if absent) into a single record.
+
+  Output:
+    (site columns, FORMAT values (fields x samples))
+  '''
+  chrom = None; pos = None; ref = None
+  ids = {}
+  alleles = {} # {allele: index}, in order of appearance
+  for rec in records:
     if rec:
-      lst_chrom.append(rec.CHROM)
-      lst_pos.append(rec.POS)
-      if rec.ID:
-        lst_id.append(rec.ID)
-      lst_ref.append(rec.REF)
-      lst_alt += [str(sub) for sub in rec.ALT]
-
-  # sanity checks
-  assert len(set(lst_chrom)) == 1 # if this fails, coordinates don't match
-  assert len(set(lst_pos)) == 1 # if this fails, coordinates don't match
-  assert len(set(lst_ref)) == 1 # this can fail for non-SNVs, not clear how to proceed
-
-  chrom = set(lst_chrom).pop()
-  pos   = set(lst_pos).pop()
-  id    = ','.join(list(set(lst_id)))
-  ref   = set(lst_ref).pop()
-  alt   = [vcf.model._Substitution(x) for x in set(lst_alt)]
-  qual  = '.' # NOTE: try to calculate mean?
-  filt  = 'PASS'
-
-  merged_formats = OrderedDict()
+      # sanity checks
+      assert chrom is None or (rec[0] == chrom and rec[1] == pos) # if this fails, coordinates don't match
+      assert ref is None or rec[3] == ref # this can fail for non-SNVs, not clear how to proceed
+      chrom, pos, ref = rec[0], rec[1], rec[3]
+      if rec[2] != '.':
+        ids.setdefault(rec[2], len(ids))
+      if rec[4] != '.':
+        for a in rec[4].split(','):
+          alleles.setdefault(a, len(alleles))
+
+  id   = ','.join(ids) or '.'
+  alt  = ','.join(alleles) or '.'
+  qual = '.' # NOTE: try to calculate mean?
+  filt = 'PASS'
+  info = '.'
+
   # parse info fields
+  infos = [parse_info(rec[7]) if rec else None for rec in records]
+  merged_formats = []
   for fi, fo in info2format.items():
-    field_vals = []
-    if formats[fo].num == -1: # allele-wise field
-      field_vals = merge_field_allele_wise(
-        alt, [rec.ALT if rec else None for rec in records], [rec.INFO[fi] if rec else None for rec in records]
-      )
-    else: # sample-wise field
-      field_vals = [rec.INFO[fi] if rec else None for rec in records]
-    merged_formats[fo] = field_vals
-
-  # contruct FORMAT field:
-  fmt = ':'.join(merged_formats.keys())
-
-  # construct merged Record
-  idx_smp = {lbl_samples[i]: i for i in range(len(lbl_samples))}
-  rec = vcf.model._Record(chrom, pos, id, ref, alt, qual, filt, info, fmt, idx_smp)
-  CallDataType = vcf.model.make_calldata_tuple(merged_formats.keys())
-  calldata_vals = list(zip(*merged_formats.values()))
-  rec.samples = [
-    vcf.model._Call(
-      rec, 
-      lbl_samples[i], 
-      CallDataType(*calldata_vals[i]))
-    for i in range(len(idx_smp))
-  ]
-
-  return rec
+    field_vals = [x.get(fi) if x is not None else None for x in infos]
+    num = num_info.get(fi)
+    if num in ('A', 'R'): # allele-wise field
+      rec_alleles = [rec[4].split(',') if rec else None for rec in records]
+      merged = alleles
+      if num == 'R': # first value is for REF allele
+        rec_alleles = [[ref] + x if x is not None else None for x in rec_alleles]
+        merged = {a: i for i, a in enumerate([ref] + list(alleles))}
+      field_vals = [v.split(',') if v is not None else None for v in field_vals]
+      field_vals = [','.join(v) if v is not None else None for v in merge_field_allele_wise(merged, rec_alleles, field_vals)]
+    merged_formats.append(['.' if v is None else v for v in field_vals])
+
+  return [chrom, pos, id, ref, alt, qual, filt, info], merged_formats
 
 def main(args):
-  vcf_in  = [vcf.Reader(filename=fn) for fn in args['fn_vcf']]
+  hdr_in = [vcf_columnar.read_header(fn) for fn in args['fn_vcf']]
+  # if sample ids were provided by user, use those (otherwise sample id of input)
+  use_custom_sids = ( len(args['samples']) == len(args['fn_vcf']) )
+  if use_custom_sids:
+    samples = args['samples']
+  else:
+    samples = [h['samples'][0] if h['samples'] else os.path.basename(fn) for h, fn in zip(hdr_in, args['fn_vcf'])]
+
   # create header for output VCF
-  hdr_out = get_out_header(vcf_in[0], args['info-to-format'])
-  hdr_out.samples = args['samples']
-  idx_smp = {args['samples'][i]: i for i in range(len(args['samples']))}
-  hdr_out._sample_indexes = idx_smp
-  vcf_out = vcf.Writer(args['out'], hdr_out)
+  fh_out = vcf_writer.Writer(bgzf.open_out(args['out'], args['threads'], args['index']))
+  hdr_out = get_out_header(hdr_in[0], samples, args['info-to-format'])
+  fh_out.write_header(hdr_out)
 
-  # if sample ids were provided by user, use those
-  use_custom_sids = ( len(args['samples']) == len(args['fn_vcf']) )
-  
-  vars_comb = {} # {CHROM: {POS: {SAMPLE: var}}
-  recs_out = []
-  for recs in vcf.utils.walk_together(*(r for r in vcf_in)):
-    r = merge_records(recs, args['samples'], hdr_out.infos, hdr_out.formats, args['info-to-format'])
-    recs_out.append(r)
-    #for i in range(len(recs)):
-    #  sid = args['samples'][i] if use_custom_sids else ''
-    #for var in rdr:
-    #  if var.CHROM not in vars_comb:
-    #    vars_comb[var.CHROM] = {}
-    #  if var.POS not in vars_comb[var.CHROM]:
-    #    vars_comb[var.CHROM][var.POS] = {}
-    #  if use_custom_sids:
-    #    # NOTE: maybe add sample index to "--vcf" param if multiple samples?
-    #    vars_comb[var.CHROM][var.POS][sid] = ""
-    vcf_out.write_record(r)
+  # contig order and INFO field definitions from first input VCF
+  contigs = [m.group(1) for m in map(regex_contig.match, hdr_in[0]['meta']) if m]
+  num_info = {k: v[0] for k, v in hdr_in[0]['infos'].items()}
+
+  keys = list(args['info-to-format'].values())
+  sites = []
+  values = []
+  for recs in walk_together(args['fn_vcf'], contigs, args['threads']):
+    site, vals = merge_records(recs, args['info-to-format'], num_info)
+    sites.append(site)
+    values.append(vals)
+    if len(sites) >= vcf_columnar.CHUNK_SIZE:
+      fh_out.write_records(sites, keys, values)
+      sites = []
+      values = []
+  fh_out.write_records(sites, keys, values)
+  fh_out.close()
 
 if __name__ == '__main__':
   args = parse_args()
   main(args)
-
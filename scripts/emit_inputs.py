@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Create input files for several tools from a multi-sample VCF in one go.
+#
+# The VCF is read once and the major ALT allele read counts are computed once
+# (see allele_counts.py). The results are kept as compact per-chunk arrays and
+# handed to one writer per requested tool. Writers are independent of each
+# other and are run on a thread pool.
+#
+# Output formats are those of the single-tool converters: writers call the
+# formatting functions of vcf2pyclone.py, vcf2spruce.py, vcf2clonefinder.py,
+# vcf2lichee.py, vcf2phylowgs.py, vcf2sciclone.py and vcf2cloe.py.
+#
+# This script is not used by the Snakemake workflow (flow/*.smk), where each
+# tool's rule runs its own converter so that rules stay independent. It is
+# meant for running several tools on the same VCF by hand.
+#
+# Writers are plain functions with signature writer(variants, samples, out):
+#   variants : list of chunks as returned by read_variants()
+#   samples  : sample ids (Normal sample first)
+#   out      : output file or directory name
+# New output formats are added by registering a writer in WRITERS.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+from __future__ import division, print_function
+import os, sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import vcf_columnar
+import allele_counts
+import vcf2pyclone, vcf2clonefinder, vcf2lichee, vcf2phylowgs, vcf2sciclone, vcf2cloe
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Create input files for multiple tools from VCF (single pass).')
+  parser.add_argument('--vcf', required=True, type=argparse.FileType(), help='Multi-sample VCF file with somatic mutations and read counts. (required FORMAT fields: "AD", "DP"; "CNI" for PyClone)')
+  parser.add_argument('--normal', required=True, help='Normal sample id.')
+  for name, (writer, kind, desc) in WRITERS.items():
+    parser.add_argument('--{}'.format(name), metavar=kind.upper(), help='Output {} for {} input.'.format(kind, desc))
+  parser.add_argument('--region', help='Only convert records in region (CHROM[:BEG[-END]]).')
+  parser.add_argument('--threads', type=int, default=4, help='Number of writer threads and VCF parsing processes (parsing in parallel requires bgzipped and indexed VCF; default: 4).')
+
+  args = parser.parse_args()
+  return args
+
+def read_variants(fn, samples, cn=False, region=None, threads=1):
+  '''
+  Parse VCF and calculate major ALT allele read counts for all samples.
+
+  Output:
+    list of dicts (one per chunk; see allele_counts.variant_chunk())
+  '''
+  fields = ['AD', 'DP', 'CNI'] if cn else ['AD', 'DP']
+  func = partial(allele_counts.variant_chunk, cn=cn)
+
+  return list(vcf_columnar.map_chunks(fn, func, fields, samples, region=region, threads=threads))
+
+def write_pyclone(variants, samples, outdir):
+  '''PyClone: one TSV file per tumor sample (<outdir>/<sample>.tsv).'''
+  # output files for tumor samples
+  fhs = [open(os.path.join(outdir, id_smp + '.tsv'), 'wt') for id_smp in samples[1:]]
+  for fh in fhs:
+    fh.write('\t'.join(vcf2pyclone.hdr) + '\n')
+  for var in variants:
+    lines = vcf2pyclone.format_lines(var)
+    for fh, smp_lines in zip(fhs, lines[1:]):
+      fh.write(''.join(smp_lines))
+  for fh in fhs:
+    fh.close()
+
+def write_spruce(variants, samples, fn_out):
+  '''SPRUCE: single TSV file (variants with ALT reads in any tumor sample).'''
+  import vcf2spruce # requires scipy
+  # make sure that mutation is present in at least one sample
+  is_mut = [vcf2spruce.is_mutated(var) for var in variants]
+  n_mut = sum(int(x.sum()) for x in is_mut)
+  with open(fn_out, 'wt') as fh_out:
+    fh_out.write(vcf2spruce.format_header(samples, n_mut))
+    i = 0
+    for var, mut in zip(variants, is_mut):
+      ids = [x for x, m in zip(allele_counts.variant_ids(var), mut.tolist()) if m]
+      alt = var['alt'][mut, 1:]
+      hpd = vcf2spruce.hpd_intervals(alt, alt + var['ref'][mut, 1:])
+      fh_out.write(''.join(vcf2spruce.format_lines(ids, samples, hpd, i)))
+      i += len(ids)
+
+def write_clonefinder(variants, samples, fn_out):
+  '''CloneFinder: single TSV file (absent loci get mean sample depth as REF count).'''
+  smp_mean_dp = allele_counts.mean_depth(variants, len(samples), min_depth=1)
+  with open(fn_out, 'wt') as fh_out:
+    fh_out.write(vcf2clonefinder.format_header(samples))
+    for var in variants:
+      fh_out.write(''.join(vcf2clonefinder.format_lines(var, smp_mean_dp)))
+
+def write_lichee(variants, samples, fn_out):
+  '''LICHeE: single TSV file with VAFs (Normal sample first).'''
+  with open(fn_out, 'wt') as fh_out:
+    fh_out.write(vcf2lichee.format_header(samples, False))
+    for var in variants:
+      fh_out.write(''.join(vcf2lichee.format_lines(var, False)))
+
+def write_phylowgs(variants, samples, fn_out):
+  '''PhyloWGS: single TSV file (absent loci get mean sample depth as total count).'''
+  smp_mean_dp = allele_counts.mean_depth(variants, len(samples))
+  with open(fn_out, 'wt') as fh_out:
+    fh_out.write(vcf2phylowgs.format_header())
+    idx_var = 0
+    for var in variants:
+      fh_out.write(''.join(vcf2phylowgs.format_lines(var, smp_mean_dp, idx_var)))
+      idx_var += len(var['POS'])
+
+def write_sciclone(variants, samples, outdir):
+  '''SciClone: one CSV file per tumor sample (<outdir>/<sample>.vaf.csv).'''
+  mean_dp = vcf2sciclone.mean_tumor_depth(variants, len(samples))
+  fhs = [open(os.path.join(outdir, '{}.vaf.csv'.format(id_smp)), 'wt') for id_smp in samples[1:]]
+  for fh in fhs:
+    fh.write(vcf2sciclone.format_header())
+  for var in variants:
+    for fh, lines in zip(fhs, vcf2sciclone.format_lines(var, mean_dp, len(samples))):
+      fh.write(''.join(lines))
+  for fh in fhs:
+    fh.close()
+
+def write_cloe(variants, samples, outdir):
+  '''Cloe: ALT and total read count matrices (<outdir>/rc_alt.csv, <outdir>/rc_tot.csv).'''
+  smp_mean_dp = allele_counts.mean_depth(variants, len(samples))
+  hdr = vcf2cloe.format_header(samples)
+  with open(os.path.join(outdir, 'rc_alt.csv'), 'wt') as f_alt, open(os.path.join(outdir, 'rc_tot.csv'), 'wt') as f_tot:
+    f_alt.write(hdr)
+    f_tot.write(hdr)
+    for var in variants:
+      lines_alt, lines_tot = vcf2cloe.format_lines(var, smp_mean_dp)
+      f_alt.write(''.join(lines_alt))
+      f_tot.write(''.join(lines_tot))
+
+# name: (writer, output kind, description)
+WRITERS = {
+  'pyclone'    : (write_pyclone,     'dir',  'PyClone'),
+  'spruce'     : (write_spruce,      'file', 'SPRUCE'),
+  'clonefinder': (write_clonefinder, 'file', 'CloneFinder'),
+  'lichee'     : (write_lichee,      'file', 'LICHeE'),
+  'phylowgs'   : (write_phylowgs,    'file', 'PhyloWGS'),
+  'sciclone'   : (write_sciclone,    'dir',  'SciClone'),
+  'cloe'       : (write_cloe,        'dir',  'Cloe'),
+}
+
+def main(args):
+  # requested outputs
+  outputs = [(name, getattr(args, name)) for name in WRITERS if getattr(args, name)]
+  if len(outputs) == 0:
+    print('[WARN] No outputs requested.', file=sys.stderr)
+    return
+
+  # get samples from input VCF
+  samples = vcf_columnar.read_header(args.vcf.name)['samples']
+  assert args.normal in samples
+  # make sure normal sample is first in list
+  samples = [args.normal] + [x for x in samples if x != args.normal]
+
+  # parse variants (copy number is only needed for PyClone)
+  variants = read_variants(args.vcf.name, samples, cn=('pyclone' in dict(outputs)), region=args.region, threads=args.threads)
+
+  # write outputs
+  with ThreadPoolExecutor(max_workers=max(args.threads, 1)) as pool:
+    futures = {}
+    for name, out in outputs:
+      writer, kind, desc = WRITERS[name]
+      if kind == 'dir' and not os.path.isdir(out):
+        os.makedirs(out)
+      futures[name] = pool.submit(writer, variants, samples, out)
+    for name, fut in futures.items():
+      fut.result() # raise errors from writer threads
+
+if __name__ == '__main__':
+  args = parse_args()
+  main(args)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Create GC-content wiggle file from reference FASTA.
+#
+# Replaces "sequenza-utils gc_wiggle -w <window>". Output is in the same
+# (gzipped) variableStep format:
+#   variableStep chrom=<contig> span=<window>
+#   <1-based window start>\t<GC percent>
+# where GC percent is the (integer) percentage of G/C bases in the window.
+#
+# The FASTA (plain, gzipped or bgzipped) is read in large blocks, the GC
+# content of each contig is computed with NumPy window sums over a 1-byte
+# G/C mask in a worker process while the next contig is read. Output is bgzipped (readable as
+# plain gzip).
+#
+# With --cache-dir, results are stored by MD5 checksum of the reference
+# file and window size, so references shared between replicates are only
+# processed once.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import argparse
+import gzip
+import hashlib
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import bgzf
+
+# size of blocks read from FASTA
+BLOCK_SIZE = 1 << 24
+# G/C bases (soft-masked: lower case)
+GC_TABLE = np.zeros(256, dtype=bool)
+GC_TABLE[list(b'GCgc')] = 1
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Create GC-content wiggle file from reference FASTA.')
+  parser.add_argument('--fasta', required=True, help='Reference FASTA file (plain, gzipped or bgzipped).')
+  parser.add_argument('-w', '--window', type=int, default=50, help='Window size (default: 50).')
+  parser.add_argument('--out', required=True, help='Output wiggle file (gzipped).')
+  parser.add_argument('--cache-dir', help='Directory to cache results by reference checksum.')
+  parser.add_argument('--threads', type=int, default=1, help='Number of contigs to process in parallel (default: 1).')
+
+  args = parser.parse_args()
+  return args
+
+def checksum(fn):
+  '''MD5 checksum of file contents.'''
+  md5 = hashlib.md5()
+  with open(fn, 'rb') as f:
+    for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+      md5.update(block)
+
+  return md5.hexdigest()
+
+def open_fasta(fn):
+  with open(fn, 'rb') as f:
+    magic = f.read(2)
+
+  return gzip.open(fn, 'rb') if magic == b'\x1f\x8b' else open(fn, 'rb')
+
+def iter_contigs(fn):
+  '''Read FASTA in blocks, yield (name, sequence bytes) for each contig.'''
+  name = None
+  parts = []
+  rest = b''
+  with open_fasta(fn) as f:
+    for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+      data = rest + block
+      # only process complete lines
+      idx = data.rfind(b'\n') + 1
+      data, rest = data[:idx], data[idx:]
+      pos = 0
+      while pos < len(data):
+        if data[pos:pos+1] == b'>':
+          if name is not None:
+            yield name, b''.join(parts)
+          j = data.find(b'\n', pos)
+          name = data[pos+1:j].split()[0].decode()
+          parts = []
+          pos = j + 1
+          continue
+        # sequence lines up to next header
+        i = data.find(b'\n>', pos)
+        end = len(data) if i < 0 else i + 1
+        parts.append(data[pos:end])
+        pos = end
+  if rest.startswith(b'>'):
+    if name is not None:
+      yield name, b''.join(parts)
+    name, parts = rest[1:].split()[0].decode(), []
+  else:
+    parts.append(rest)
+  if name is not None:
+    yield name, b''.join(parts)
+
+def gc_windows(seq, window):
+  '''
+  GC percent of windows along sequence.
+
+  Output:
+    (1-based window starts, integer GC percent)
+  '''
+  arr = np.frombuffer(seq.translate(None, b'\r\n \t'), dtype=np.uint8)
+  is_gc = GC_TABLE[arr]
+  # full windows, then last partial window
+  n_full = len(arr) // window
+  n_gc = is_gc[:n_full*window].reshape(n_full, window).sum(axis=1, dtype=np.int32)
+  lens = np.full(n_full, window, dtype=np.int64)
+  if len(arr) > n_full * window:
+    n_gc = np.append(n_gc, is_gc[n_full*window:].sum(dtype=np.int32))
+    lens = np.append(lens, len(arr) - n_full * window)
+  starts = np.arange(0, len(arr), window)
+  gc = (100 * n_gc.astype(np.int64)) // lens
+
+  return starts + 1, gc
+
+def contig_wiggle(task):
+  '''Wiggle section for one contig (worker process).'''
+  name, seq, window = task
+  starts, gc = gc_windows(seq, window)
+  lines = ['variableStep chrom={} span={}\n'.format(name, window)]
+  lines += ['{}\t{}\n'.format(s, g) for s, g in zip(starts.tolist(), gc.tolist())]
+
+  return ''.join(lines)
+
+def write_wiggle(fn_fasta, fn_out, window, threads=1):
+  '''Compute GC wiggle for all contigs (output in FASTA order).'''
+  tasks = ((name, seq, window) for name, seq in iter_contigs(fn_fasta))
+  with bgzf.open_out(fn_out, threads) as fh:
+    if threads <= 1:
+      for task in tasks:
+        fh.write(contig_wiggle(task))
+      return
+    # limit number of contigs in flight
+    with ProcessPoolExecutor(threads) as pool:
+      pending = deque()
+      for task in tasks:
+        pending.append(pool.submit(contig_wiggle, task))
+        if len(pending) >= 2 * threads:
+          fh.write(pending.popleft().result())
+      while pending:
+        fh.write(pending.popleft().result())
+
+def main(args):
+  if not args.cache_dir:
+    write_wiggle(args.fasta, args.out, args.window, args.threads)
+    return
+
+  fn_cache = os.path.join(args.cache_dir, '{}.gc{}.wig.gz'.format(checksum(args.fasta), args.window))
+  if os.path.exists(fn_cache):
+    print('[INFO] Using cached GC wiggle: {}'.format(fn_cache))
+  else:
+    os.makedirs(args.cache_dir, exist_ok=True)
+    # write to temporary file first (concurrent jobs may share the cache)
+    fd, fn_tmp = tempfile.mkstemp(suffix='.wig.gz', dir=args.cache_dir)
+    os.close(fd)
+    try:
+      write_wiggle(args.fasta, fn_tmp, args.window, args.threads)
+      os.replace(fn_tmp, fn_cache)
+    finally:
+      if os.path.exists(fn_tmp):
+        os.remove(fn_tmp)
+    print('[INFO] Cached GC wiggle: {}'.format(fn_cache))
+  shutil.copyfile(fn_cache, args.out)
+
+if __name__ == '__main__':
+  args = parse_args()
+  main(args)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Incremental JSON parser.
+#
+# Large JSON files (e.g. PhyloWGS *.summ.json.gz) are tokenized in blocks
+# and turned into a stream of events
+#   (path, event, value)
+# with path the tuple of map keys/array indices leading to the value and
+# event one of start_map, end_map, start_array, end_array, string, number,
+# boolean, null. Only the parts of the document that are needed are built
+# into Python objects (see build()), everything else is discarded as it is
+# read.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import gzip
+import json
+import re
+
+# number of characters read at a time
+BLOCK_SIZE = 1 << 20
+# tokens ending closer to the end of the buffer may be incomplete (numbers)
+LOOKAHEAD = 64
+
+regex_token = re.compile(r'''[ \t\r\n]*(?:
+  ([{}\[\],:])                               # punctuation
+  |"((?:[^"\\]|\\.)*)"                       # string
+  |(-?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?) # number
+  |(true|false|null|NaN|-?Infinity)          # literal
+)''', re.VERBOSE)
+regex_space = re.compile(r'[ \t\r\n]*')
+
+# NaN and (-)Infinity are not valid JSON, but are written by Python's json module
+LITERALS = {'true': ('boolean', True), 'false': ('boolean', False), 'null': ('null', None),
+  'NaN': ('number', float('nan')), 'Infinity': ('number', float('inf')), '-Infinity': ('number', float('-inf'))}
+
+def open_json(fn):
+  '''Open (gzipped) JSON file for reading text.'''
+  with open(fn, 'rb') as f:
+    magic = f.read(2)
+
+  return gzip.open(fn, 'rt') if magic == b'\x1f\x8b' else open(fn, 'rt')
+
+def tokens(fh, block_size=BLOCK_SIZE):
+  '''
+  Tokenize JSON text read from file handle in blocks.
+
+  Output:
+    (kind, value) with kind one of "{", "}", "[", "]", ",", ":", string,
+    number, boolean, null
+  '''
+  buf = ''
+  pos = 0
+  eof = False
+  while True:
+    m = regex_token.match(buf, pos)
+    # token may continue in next block
+    if not eof and (m is None or len(buf) - m.end() < LOOKAHEAD):
+      block = fh.read(block_size)
+      if len(block) == 0:
+        eof = True
+      buf = buf[pos:] + block
+      pos = 0
+      continue
+    if m is None:
+      if regex_space.match(buf, pos).end() == len(buf):
+        return
+      raise ValueError('Invalid JSON at: {}'.format(buf[pos:pos+40]))
+    pos = m.end()
+    punct, string, number, literal = m.groups()
+    if punct is not None:
+      yield punct, None
+    elif string is not None:
+      yield 'string', json.loads('"' + string + '"') if '\\' in string else string
+    elif number is not None:
+      yield 'number', float(number) if ('.' in number or 'e' in number or 'E' in number) else int(number)
+    else:
+      yield LITERALS[literal]
+
+def parse(fh, block_size=BLOCK_SIZE):
+  '''Parse JSON from file handle into events (path, event, value).'''
+  # frames of open containers: [is_map, key/index, expect_key]
+  frames = []
+  path = ()
+  for kind, value in tokens(fh, block_size):
+    if kind == ',':
+      top = frames[-1]
+      if top[0]:
+        top[2] = True
+      else:
+        top[1] += 1
+        path = path[:-1] + (top[1],)
+    elif kind == ':':
+      continue
+    elif kind == '{':
+      yield path, 'start_map', None
+      frames.append([True, None, True])
+      path = path + (None,)
+    elif kind == '[':
+      yield path, 'start_array', None
+      frames.append([False, 0, False])
+      path = path + (0,)
+    elif kind == '}' or kind == ']':
+      frames.pop()
+      path = path[:-1]
+      yield path, 'end_map' if kind == '}' else 'end_array', None
+    elif frames and frames[-1][2]:
+      # map key
+      frames[-1][1] = value
+      frames[-1][2] = False
+      path = path[:-1] + (value,)
+    else:
+      yield path, kind, value
+
+def build(events, path, event, value):
+  '''Build Python object for value starting with given event (consumes its events).'''
+  if event == 'start_map':
+    obj = {}
+    for p, ev, v in events:
+      if len(p) == len(path) and ev == 'end_map':
+        return obj
+      obj[p[-1]] = build(events, p, ev, v)
+  elif event == 'start_array':
+    obj = []
+    for p, ev, v in events:
+      if len(p) == len(path) and ev == 'end_array':
+        return obj
+      obj.append(build(events, p, ev, v))
+  else:
+    return value
+
+def skip(events, path, event):
+  '''Skip events of value starting with given event.'''
+  if event not in ('start_map', 'start_array'):
+    return
+  for p, ev, v in events:
+    if len(p) == len(path) and ev in ('end_map', 'end_array'):
+      return
@@ -8,20 +8,42 @@
 #  - cluster.csv : id_cluster,id_sample,freq
 #  - snv.csv     . chrom_pos,id_cluster,id_snv
 #  - tree.csv    . id_tree,from_cluster,to_cluster
+#
+# The output file is read line by line with a section state machine
+# ("Nodes:", "****Tree <id>****", "Sample decomposition:", "SNV info:").
+# Tree edges and SNVs are written as soon as they are read (in input order);
+# only the (few) cluster lines are kept until the sample names are known.
+# With --top-k, only the first k trees (ranked by LICHeE) are written.
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-07-10
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 import os, sys
 import argparse
 import re
 
+regex_tree   = re.compile(r'Tree (\d+)')
+regex_edge   = re.compile(r'(\d+) -> (\d+)')
+regex_sample = re.compile(r'Sample lineage decomposition: (.+)$')
+regex_snv    = re.compile(r'(snv\d+): (\w+) (\d+) ([a-zA-Z0-9]+)$')
+regex_freq   = re.compile(r'\d\.\d+')
+
+# section headers (line prefix, section)
+SECTIONS = [
+  ('Nodes:', 'clusters'),
+  ('****Tree', 'tree'),
+  ('Sample decomposition:', 'samples'),
+  ('SNV info:', 'snvs'),
+]
+HEADERS = tuple(prefix for prefix, name in SECTIONS)
+
 def parse_args():
   parser = argparse.ArgumentParser(description='Extract clusters and trees from LICHeE output.')
   parser.add_argument('lichee_result', type=argparse.FileType(), help='Path to LICHeE output file.')
   parser.add_argument('--outdir', required=False, help='Path to output directory (default: same as input).')
+  parser.add_argument('--top-k', type=int, default=0, help='Only write the first k trees (default: 0, all trees).')
 
   args = parser.parse_args()
   args_dict = vars(args)
@@ -30,104 +52,109 @@ def parse_args():
 
   return args_dict
 
-def parse_lichee(fh):
-  clusters = {}
-  trees = {}
-  snvs = {}
-  samples = []
+def write_clusters(fh, clusters, samples):
+  '''
+  Write cluster prevalences.
 
-  do_parse_clusters = False
-  do_parse_trees    = False
-  do_parse_samples  = False
-  do_parse_snvs     = False
+  Parameters:
+    clusters : {id_cluster: (presence string, frequency string)}
+    samples  : sample names (in order of presence string; first one: normal)
+  '''
+  # skip normal sample (sample ids do not match)
+  n_smp = max([len(pres) for pres, freq in clusters.values()] or [0])
+  smp = samples[1:n_smp]
+  lines = []
+  for id_clust in sorted(clusters.keys()):
+    pres, freq = clusters[id_clust]
+    it_freq = iter(regex_freq.findall(freq))
+    for p, id_smp in zip(pres[1:], smp):
+      lines.append('{},{},{}\n'.format(id_clust, id_smp, next(it_freq) if p == '1' else '0.0'))
+  fh.write(''.join(lines))
 
-  id_tree = -1
+def parse_lichee(fh, fh_clust, fh_trees, fh_snvs, top_k=0):
+  '''
+  Read LICHeE output section by section, write clusters, tree edges and
+  SNVs to output file handles.
+
+  Output:
+    number of clusters, trees and SNVs written
+  '''
+  section = None
+  clusters = {}
+  snv_clust = {}
+  samples = []
+  done_samples = False
+  done_clusters = False
+  n_trees = 0
+  n_snvs = 0
+  id_tree = None
 
   for line in fh:
-    if line.startswith('Nodes:'):
-      print('Parsing clusters...')
-      do_parse_clusters = True
-    elif line.startswith('****Tree'):
-      print('Parsing trees...')
-      do_parse_clusters = False
-      do_parse_trees = True
-      m = re.search('Tree (\d+)', line)
-      id_tree = int(m.group(1))
-    elif line.startswith('Sample decomposition:'):
-      print('Parsing samples')
-      do_parse_trees = False
-      do_parse_samples = True
-    elif line.startswith('SNV info:'):
-      print('Parsing SNVs...')
-      do_parse_samples = False
-      do_parse_snvs = True
-    elif do_parse_clusters:
+    if line.startswith(HEADERS):
+      name = [name for prefix, name in SECTIONS if line.startswith(prefix)][0]
+      # samples are complete once the first decomposition has been read
+      if section == 'samples':
+        done_samples = True
+      section = name
+      if section == 'clusters':
+        print('Parsing clusters...')
+      elif section == 'tree':
+        if n_trees == 0:
+          print('Parsing trees...')
+        n_trees += 1
+        id_tree = regex_tree.search(line).group(1)
+        if top_k > 0 and n_trees > top_k:
+          section = None
+      elif section == 'samples' and not done_samples:
+        print('Parsing samples...')
+      elif section == 'snvs':
+        print('Parsing SNVs...')
+        write_clusters(fh_clust, clusters, samples)
+        done_clusters = True
+      continue
+
+    if section == 'clusters':
       cols = line.strip().split('\t')
       if len(cols) > 3:
         id_cluster, pres, freq = cols[:3]
-        clusters[id_cluster] = (pres, freq, cols[3:])
-    elif do_parse_trees:
-      if id_tree not in trees:
-        trees[id_tree] = []
-      m = re.search('(\d+) -> (\d+)', line)
-      if m:
-        trees[id_tree].append((m.group(1), m.group(2)))
-    elif do_parse_samples:
-      m = re.search('Sample lineage decomposition: (.+)$', line)
+        clusters[id_cluster] = (pres, freq)
+        for id_snv in cols[3:]:
+          snv_clust[id_snv] = id_cluster
+    elif section == 'tree':
+      m = regex_edge.search(line)
       if m:
-        samples.append(m.group(1))
-    elif do_parse_snvs:
-      m = re.search('(snv\d+): (\w+) (\d+) ([a-zA-Z0-9]+)$', line)
+        fh_trees.write('{},{},{}\n'.format(id_tree, m.group(1), m.group(2)))
+    elif section == 'samples':
+      if not done_samples:
+        m = regex_sample.search(line)
+        if m:
+          samples.append(m.group(1))
+    elif section == 'snvs':
+      m = regex_snv.search(line)
       if m:
-        snvs[m.group(1)] = (m.group(2), m.group(3), m.group(4))
-  
-  return clusters, trees, samples, snvs 
+        id_snv, chrom, pos = m.group(1, 2, 3)
+        fh_snvs.write('chr{}_{},{},{}\n'.format(chrom, pos, snv_clust[id_snv], id_snv))
+        n_snvs += 1
 
-def main(args):
-  print(args)
-  clusters, trees, samples, variants = parse_lichee(args['lichee_result'])
+  if not done_clusters:
+    write_clusters(fh_clust, clusters, samples)
 
-  print("%d clusters" % len(clusters))
-  print("%d trees" % len(trees))
-  print("%d snvs" % len(variants))
-  
-  # remember which cluster variants are assigned to
-  snv_clust = {}
+  return len(clusters), min(n_trees, top_k) if top_k > 0 else n_trees, n_snvs
 
-  # write clusters to file
+def main(args):
+  print(args)
   fn_clust = os.path.join(args['outdir'], 'inf.clusters.csv')
-  with open(fn_clust, 'wt') as f:
-    f.write('id_cluster,id_sample,freq\n')
-    for id_clust in sorted(clusters.keys()):
-      pres, freq, snvs = clusters[id_clust]
-      lst_freq = re.findall('\d\.\d+', freq)
-      h = 0
-      for i, p in enumerate(pres):
-        if i == 0: # skip normal sample (sample ids do not match)
-          continue
-        freq_val = "0.0"
-        if p == '1':
-          freq_val = lst_freq[h]
-          h += 1
-        f.write('{},{},{}\n'.format(id_clust, samples[i], freq_val))
-      for id_snv in snvs:
-        snv_clust[id_snv] = id_clust
-
-  # write trees to file
   fn_trees = os.path.join(args['outdir'], 'inf.trees.csv')
-  with open(fn_trees, 'wt') as f:
-    f.write('id_tree,from,to\n')
-    for id_tree in sorted(trees.keys()):
-      for from_to in trees[id_tree]:
-        f.write('{},{},{}\n'.format(id_tree, from_to[0], from_to[1]))
-
-  # write variants to file
   fn_snvs = os.path.join(args['outdir'], 'inf.snvs.csv')
-  with open(fn_snvs, 'wt') as f:
-    f.write('chrom_pos,id_cluster,id_snv\n')
-    for id_snv in sorted(variants.keys()):
-      chrom, pos, name = variants[id_snv]
-      f.write('chr{}_{},{},{}\n'.format(chrom, pos, snv_clust[id_snv], id_snv))
+  with open(fn_clust, 'wt') as f_clust, open(fn_trees, 'wt') as f_trees, open(fn_snvs, 'wt') as f_snvs:
+    f_clust.write('id_cluster,id_sample,freq\n')
+    f_trees.write('id_tree,from,to\n')
+    f_snvs.write('chrom_pos,id_cluster,id_snv\n')
+    n_clust, n_trees, n_snvs = parse_lichee(args['lichee_result'], f_clust, f_trees, f_snvs, args['top_k'])
+
+  print("%d clusters" % n_clust)
+  print("%d trees" % n_trees)
+  print("%d snvs" % n_snvs)
 
 if __name__ == '__main__':
   args = parse_args()
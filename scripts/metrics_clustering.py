@@ -9,13 +9,22 @@
 #   - INFERRED variant-to-cluster assignment (CSV: chrom_pos,id_cluster,...)
 # Output:
 #   metrics value
+#   (optional) accuracy of optimal one-to-one cluster matching
+#   (optional) bootstrap percentile confidence intervals (*_ci_lo, *_ci_hi)
+#
+# Bootstrap replicates are drawn from the TRUE x INFERRED contingency table
+# (multinomial over cells) instead of resampling variants, so that metrics
+# for all replicates are computed at once from the table counts.
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-08-21
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 import argparse
+import numpy as np
+from scipy.special import xlogy
 from sklearn import metrics
+import cluster_matching
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Calculate tree distance.')
@@ -26,10 +35,79 @@ def parse_args():
   #grp_metric = parser.add_mutually_exclusive_group(required=True)
   parser.add_argument('--ARI', action='store_true', help='Calculate Adjusted Rand Index')
   parser.add_argument('--V-measure', action='store_true', help='Calculate V-measure (reports homogeneity and completeness, too)')
+  parser.add_argument('--matching', action='store_true', help='Calculate assignment-based accuracy (optimal one-to-one matching of TRUE and INFERRED clusters)')
+  parser.add_argument('--matching-cache', help='Cached cluster matching (default: "{}" next to INFERRED mapping)'.format(cluster_matching.FN_CACHE))
+  parser.add_argument('--bootstrap', type=int, default=0, metavar='B', help='Number of bootstrap replicates for confidence intervals (default: 0, off)')
+  parser.add_argument('--ci', type=float, default=0.95, help='Size of bootstrap confidence intervals (default: 0.95)')
+  parser.add_argument('--seed', type=int, help='Random seed for bootstrap replicates')
   
   args = parser.parse_args()
   return args
 
+def bootstrap_tables(table, B, seed=None):
+  '''
+  Draw B bootstrap replicates of a contingency table.
+
+  Resampling variants with replacement is equivalent to a multinomial draw
+  over the table cells with probabilities n_ij/n.
+
+  Output:
+    array of shape (B, n_rows, n_cols)
+  '''
+  n = table.sum()
+  rng = np.random.default_rng(seed)
+  draws = rng.multinomial(n, table.ravel() / n, size=B)
+
+  return draws.reshape((B,) + table.shape)
+
+def ari_from_tables(tables):
+  '''Adjusted Rand Index for a stack of contingency tables (..., n_rows, n_cols).'''
+  tables = tables.astype(np.float64)
+  n = tables.sum(axis=(-2, -1))
+  sum_comb_cells = (tables * (tables - 1) / 2).sum(axis=(-2, -1))
+  a = tables.sum(axis=-1)
+  b = tables.sum(axis=-2)
+  sum_comb_a = (a * (a - 1) / 2).sum(axis=-1)
+  sum_comb_b = (b * (b - 1) / 2).sum(axis=-1)
+  expected = sum_comb_a * sum_comb_b / np.maximum(n * (n - 1) / 2, 1)
+  max_index = (sum_comb_a + sum_comb_b) / 2
+  denom = max_index - expected
+  # degenerate partitions (all in one cluster or all singletons) agree perfectly
+  with np.errstate(divide='ignore', invalid='ignore'):
+    ari = np.where(denom != 0, (sum_comb_cells - expected) / denom, 1.0)
+
+  return ari
+
+def v_measure_from_tables(tables, beta=1.0):
+  '''
+  Homogeneity, completeness and V-measure for a stack of contingency tables
+  (..., n_rows, n_cols); rows are TRUE clusters, columns INFERRED clusters.
+  '''
+  tables = tables.astype(np.float64)
+  n = tables.sum(axis=(-2, -1))
+  a = tables.sum(axis=-1)
+  b = tables.sum(axis=-2)
+  n_log_n = xlogy(n, n)
+  sum_a = xlogy(a, a).sum(axis=-1)
+  sum_b = xlogy(b, b).sum(axis=-1)
+  sum_cells = xlogy(tables, tables).sum(axis=(-2, -1))
+  with np.errstate(divide='ignore', invalid='ignore'):
+    entropy_true = (n_log_n - sum_a) / n
+    entropy_inf  = (n_log_n - sum_b) / n
+    mi = (sum_cells - sum_a - sum_b + n_log_n) / n
+    hom = np.where(entropy_true > 0, mi / entropy_true, 1.0)
+    com = np.where(entropy_inf > 0, mi / entropy_inf, 1.0)
+    v = np.where(hom + com > 0, (1 + beta) * hom * com / (beta * hom + com), 0.0)
+
+  return hom, com, v
+
+def percentile_ci(values, ci):
+  '''Percentile confidence interval of bootstrap values.'''
+  alpha = (1.0 - ci) / 2
+  lo, hi = np.percentile(values, [100 * alpha, 100 * (1 - alpha)])
+
+  return lo, hi
+
 def main(args):
   #print(vars(args))
   tru_snv = {}
@@ -65,6 +143,26 @@ def main(args):
     print('homogeneity: {:.4f}'.format(hom))
     print('completeness: {:.4f}'.format(com))
     print('V_measure: {:.4f}'.format(v))
+  if args.matching:
+    m = cluster_matching.get_matching(args.true_snvs.name, args.inf_snvs.name, args.matching_cache, tru_snv, inf_snv)
+    print('n_clust_matched: {}'.format(len(m.pairs)))
+    print('accuracy: {:.4f}'.format(cluster_matching.matched_accuracy(m)))
+
+  if args.bootstrap > 0 and len(joint_snv) > 0:
+    clusters_true, codes_true, clusters_inf, codes_inf = cluster_matching.encode_labels(tru_snv, inf_snv)
+    table = cluster_matching.overlap_matrix(codes_true, codes_inf, len(clusters_true), len(clusters_inf))
+    tables = bootstrap_tables(table, args.bootstrap, args.seed)
+    boot = []
+    if args.ARI:
+      boot.append(('ARI', ari_from_tables(tables)))
+    if args.V_measure:
+      hom, com, v = v_measure_from_tables(tables)
+      boot += [('homogeneity', hom), ('completeness', com), ('V_measure', v)]
+    print('n_bootstrap: {}'.format(args.bootstrap))
+    for key, values in boot:
+      lo, hi = percentile_ci(values, args.ci)
+      print('{}_ci_lo: {:.4f}'.format(key, lo))
+      print('{}_ci_hi: {:.4f}'.format(key, hi))
 
 if __name__ == '__main__':
   args = parse_args()
@@ -8,7 +8,7 @@ TOOLDIR="$2"
 for rep in $(find "${DATADIR}" -mindepth 1 -maxdepth 1 -type d | sort); do 
   echo $rep
   python3 scripts/metrics_clustering.py \
-    --ARI --V-measure \
+    --ARI --V-measure --matching \
     ${rep}/sim/true.snvs.csv ${rep}/${TOOLDIR}/inf.snvs.csv \
   | tee ${rep}/${TOOLDIR}/metrics_clustering.yml
 done
@@ -14,7 +14,7 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-09-06
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import division
@@ -164,6 +164,14 @@ def DISC(variants, tree1, tree2, clust1, clust2, snv_clust1, snv_clust2):
   n_comp = n_vars * (n_vars-1) # number of comparisons
   return cum_dist / n_comp
 
+# distance measures: (function, variant set)
+DISTANCES = {
+  'CASet_isect': (CASet, 'isect'),
+  'CASet_union': (CASet, 'union'),
+  'DISC_isect' : (DISC, 'isect'),
+  'DISC_union' : (DISC, 'union'),
+}
+
 def parse_tree_csv(fh):
   '''
   Parse a CSV file containing a set of edges.
@@ -223,43 +231,44 @@ def adjacency_list_to_tree(adj_list):
   assert len(roots) == 1, "More than one root found."
   return roots[0]
 
-def main(args):
-  true_tree_edges = []
+def tree_distances(true_tree_edges, true_snvs, inf_tree_edges, inf_snvs, dists, collapse=False, ignore_homoplasy=False, fn_collapsed=None, verbose=True):
+  '''
+  Calculate distance measures between TRUE and INFERRED tree.
+
+  Parameters:
+    true_tree_edges : TRUE tree edges [(from, to), ...]
+    true_snvs       : TRUE variant-to-clone assignments [(id_var, id_clone), ...]
+    inf_tree_edges  : INFERRED tree edges [(from, to), ...]
+    inf_snvs        : INFERRED variant-to-cluster assignments [(id_var, id_cluster), ...]
+    dists           : distance measures to calculate (see DISTANCES)
+    collapse        : collapse co-clustered mutations
+    ignore_homoplasy: remove homoplasious mutations
+    fn_collapsed    : output file for collapsed clusters (optional)
+    verbose         : print progress to stderr
+
+  Output:
+    list of (distance measure, value)
+  '''
+  def info(msg):
+    if verbose:
+      print(msg, file=sys.stderr)
+
   true_snv_clust = {}
   true_clusters = {}
-  inf_tree_edges = []
   inf_snv_clust = {}
   inf_snv_cnt = {} # count occurrences of mutations (for homoplasy handling)
   inf_clusters = {}
 
-  # read input files
-  #-----------------------------------------------------------------------------
-  #for line in args.true_tree:
-  #  row = line.strip().split(',')
-  #  true_tree_edges.append((row[0],row[1]))
-  true_tree_edges = parse_tree_csv(args.true_tree)
-  line = next(args.true_snvs) # skip header row
-  for line in args.true_snvs:
-    row = line.strip().split(',')
-    id_snv = row[0]
-    id_clust = row[1]
+  for id_snv, id_clust in true_snvs:
     v = (id_snv, 1) # store cardinality as property of variant
     true_snv_clust[v] = id_clust # store cluster
     if id_clust in true_clusters:
       true_clusters[id_clust].append(v)
     else:
       true_clusters[id_clust] = [v]
-  #for line in args.inf_tree:
-  #  row = line.strip().split(',')
-  #  inf_tree_edges.append((row[0],row[1]))
-  inf_tree_edges = parse_tree_csv(args.inf_tree)
-  line = next(args.inf_snvs) # skip header row
-  for line in args.inf_snvs:
-    row = line.strip().split(',')
-    id_snv = row[0]
-    id_clust = row[1]
+  for id_snv, id_clust in inf_snvs:
     v = (id_snv, 1) # store cardinality as property of variant
-    if not args.ignore_homoplasy:
+    if not ignore_homoplasy:
       assert v not in inf_snv_clust, "INFERRED tree violates ISA."
     else:
       if v not in inf_snv_cnt:
@@ -273,7 +282,7 @@ def main(args):
       inf_clusters[id_clust] = [v]
 
   # remove homoplasy mutations
-  if args.ignore_homoplasy:
+  if ignore_homoplasy:
     muts_to_remove = [k for k,v in inf_snv_cnt.items() if v>1]
     for var in muts_to_remove:
       del inf_snv_clust[var]
@@ -294,18 +303,18 @@ def main(args):
   inf_vars_set = set(inf_vars_lst)
   #assert len(inf_vars_set) == len(inf_vars_lst), "INFERRED tree violates ISA."
   
-  print('TRUE vars: {}'.format(len(true_vars_lst)), file=sys.stderr)
-  print('INF vars:  {}'.format(len(inf_vars_lst)), file=sys.stderr)
+  info('TRUE vars: {}'.format(len(true_vars_lst)))
+  info('INF vars:  {}'.format(len(inf_vars_lst)))
 
   # collapse co-clustered variants if requested
   #-----------------------------------------------------------------------------
-  if args.collapse:
-    print('Collapsing co-clustered mutations...', file=sys.stderr)
+  if collapse:
+    info('Collapsing co-clustered mutations...')
     # counter to create cluster ids from
     n_collapsed = 0
     # keep track of mutations in collapsed clusters
     collapsed_vars = {}
-    print('1. Collapse mutations unique to each tree...', file=sys.stderr)
+    info('1. Collapse mutations unique to each tree...')
     # collapse unique vars in first tree
     true_vars_uniq = true_vars_set.difference(inf_vars_set)
     for tclust, tvars in true_clusters.items():
@@ -328,10 +337,10 @@ def main(args):
         inf_snv_clust[(id_clust, len(v_uniq))] = iclust
         for v in v_uniq:
           inf_snv_clust.pop(v)
-    print('TRUE vars: {}'.format(len(true_vars_lst)), file=sys.stderr)
-    print('INF vars:  {}'.format(len(inf_vars_lst)), file=sys.stderr)
+    info('TRUE vars: {}'.format(len(true_vars_lst)))
+    info('INF vars:  {}'.format(len(inf_vars_lst)))
     
-    print('2. Collapse joint mutations...', file=sys.stderr)
+    info('2. Collapse joint mutations...')
     for tclust, tvars in true_clusters.items():
       for iclust, ivars in inf_clusters.items():
         isect = set(tvars) & set(ivars)
@@ -359,35 +368,54 @@ def main(args):
       inf_clusters[clust].append(var)
     true_vars_set = set(true_snv_clust.keys())
     inf_vars_set = set(inf_snv_clust.keys())
-    print('TRUE vars: {}'.format(len(true_vars_set)), file=sys.stderr)
-    print('INF vars:  {}'.format(len(inf_vars_set)), file=sys.stderr)
+    info('TRUE vars: {}'.format(len(true_vars_set)))
+    info('INF vars:  {}'.format(len(inf_vars_set)))
     
     # log collapsed clusters to file
-    with open('collapsed_vars.csv', 'wt') as f:
-      for id_clust, variants in collapsed_vars.items():
-        for id_var, n in variants:
-          f.write('{0},{1},{2}\n'.format(id_clust, id_var, n))
+    if fn_collapsed:
+      with open(fn_collapsed, 'wt') as f:
+        for id_clust, variants in collapsed_vars.items():
+          for id_var, n in variants:
+            f.write('{0},{1},{2}\n'.format(id_clust, id_var, n))
 
   # compile variant sets
   #-----------------------------------------------------------------------------
-  snvs = true_vars_set
   snvs_isect = true_vars_set & inf_vars_set
   snvs_union = true_vars_set | inf_vars_set
 
   # calculate distance
   #-----------------------------------------------------------------------------
-  if args.CASet_isect:
-    tree_dist = CASet(snvs_isect, true_tree, inf_tree, true_clusters, inf_clusters, true_snv_clust, inf_snv_clust)
-    print('CASet_isect: {:.4f}'.format(tree_dist))
-  if args.CASet_union:
-    tree_dist = CASet(snvs_union, true_tree, inf_tree, true_clusters, inf_clusters, true_snv_clust, inf_snv_clust)
-    print('CASet_union: {:.4f}'.format(tree_dist))
-  if args.DISC_isect:
-    tree_dist = DISC(snvs_isect, true_tree, inf_tree, true_clusters, inf_clusters, true_snv_clust, inf_snv_clust)
-    print('DISC_isect: {:.4f}'.format(tree_dist))
-  if args.DISC_union:
-    tree_dist = DISC(snvs_union, true_tree, inf_tree, true_clusters, inf_clusters, true_snv_clust, inf_snv_clust)
-    print('DISC_union: {:.4f}'.format(tree_dist))
+  res = []
+  for name in dists:
+    dist_func, sel = DISTANCES[name]
+    snvs = snvs_isect if sel == 'isect' else snvs_union
+    res.append((name, dist_func(snvs, true_tree, inf_tree, true_clusters, inf_clusters, true_snv_clust, inf_snv_clust)))
+
+  return res
+
+def read_snvs(fh):
+  '''Read variant-to-cluster assignments (CSV with header: id_var,id_cluster,...).'''
+  line = next(fh) # skip header row
+  snvs = []
+  for line in fh:
+    row = line.strip().split(',')
+    snvs.append((row[0], row[1]))
+
+  return snvs
+
+def main(args):
+  # read input files
+  #-----------------------------------------------------------------------------
+  true_tree_edges = parse_tree_csv(args.true_tree)
+  true_snvs = read_snvs(args.true_snvs)
+  inf_tree_edges = parse_tree_csv(args.inf_tree)
+  inf_snvs = read_snvs(args.inf_snvs)
+
+  dists = [name for name in DISTANCES if getattr(args, name)]
+  res = tree_distances(true_tree_edges, true_snvs, inf_tree_edges, inf_snvs, dists,
+    args.collapse, args.ignore_homoplasy, 'collapsed_vars.csv')
+  for name, tree_dist in res:
+    print('{}: {:.4f}'.format(name, tree_dist))
 
 
 if __name__ == '__main__':
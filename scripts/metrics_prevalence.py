@@ -11,15 +11,18 @@
 #   - INFERRED variant-to-cluster assignment (CSV: chrom_pos,id_cluster,...)
 # Output:
 #   mean squared error between TRUE and INFERRED mutation CCFs
+#   (optional) mean squared error between prevalences of matched TRUE clones
+#              and INFERRED clusters
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-10-11
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 import argparse
 import numpy as np
 import pandas as pd
 from sklearn import metrics
+import cluster_matching
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Calculate tree distance.')
@@ -28,6 +31,10 @@ def parse_args():
   parser.add_argument('true_snvs', type=argparse.FileType('r'), help='TRUE variant-to-cluster mapping (CSV: chrom_pos,id_cluster,...).')
   parser.add_argument('inf_prev', type=argparse.FileType('r'), help='INFERRED cluster prevalences (CSV: id_cluster,id_sample,freq).')
   parser.add_argument('inf_snvs', type=argparse.FileType('r'), help='INFERRED variant-to-cluster mapping (CSV: chrom_pos,id_cluster,...).')
+  # optional arguments
+  parser.add_argument('--matching', action='store_true', help='Compare prevalences of optimally matched TRUE and INFERRED clusters.')
+  parser.add_argument('--matching-cache', help='Cached cluster matching (default: "{}" next to INFERRED mapping).'.format(cluster_matching.FN_CACHE))
+  parser.add_argument('--matched-prev', type=argparse.FileType('wt'), help='Output file for prevalences of matched clusters (CSV: id_cluster_true,id_cluster_inf,id_sample,freq_true,freq_inf).')
   
   args = parser.parse_args()
   return args
@@ -59,6 +66,22 @@ def main(args):
   print('n_mut_inf: {}'.format(len(df_snv_inf['chrom_pos'].unique())))
   print('prev_msq: {:.4f}'.format(msq))
 
+  if args.matching:
+    m = cluster_matching.get_matching(args.true_snvs.name, args.inf_snvs.name, args.matching_cache)
+    df_pairs = pd.DataFrame({
+      'id_cluster_true': [m.clusters_true[i] for i, j in m.pairs],
+      'id_cluster_inf' : [m.clusters_inf[j] for i, j in m.pairs]
+    })
+    # look up prevalences of matched clusters (samples missing for either one count as 0.0)
+    df_mtru = pd.merge(df_pairs, df_clust_tru.rename(columns={'id_cluster': 'id_cluster_true', 'freq': 'freq_true'}), on='id_cluster_true')
+    df_minf = pd.merge(df_pairs, df_clust_inf.rename(columns={'id_cluster': 'id_cluster_inf', 'freq': 'freq_inf'}), on='id_cluster_inf')
+    df_match = pd.merge(df_mtru, df_minf, on=['id_cluster_true', 'id_cluster_inf', 'id_sample'], how='outer').fillna({'freq_true': 0.0, 'freq_inf': 0.0})
+    msq_match = metrics.mean_squared_error(df_match['freq_inf'], df_match['freq_true']) if len(df_match) > 0 else float('nan')
+    print('n_clust_matched: {}'.format(len(m.pairs)))
+    print('prev_msq_matched: {:.4f}'.format(msq_match))
+    if args.matched_prev:
+      df_match.to_csv(args.matched_prev, index=False, float_format='%.4f', columns=['id_cluster_true', 'id_cluster_inf', 'id_sample', 'freq_true', 'freq_inf'])
+
 if __name__ == '__main__':
   args = parse_args()
   main(args)
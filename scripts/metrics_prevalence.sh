@@ -7,7 +7,7 @@ TOOLDIR="$2"
 
 for rep in $(find "${DATADIR}" -mindepth 1 -maxdepth 1 -type d | sort); do 
   echo $rep
-  python3 scripts/metrics_prevalence.py \
+  python3 scripts/metrics_prevalence.py --matching \
     ${rep}/sim/true.clusters.csv ${rep}/sim/true.snvs.csv \
     ${rep}/${TOOLDIR}/inf.clusters.csv ${rep}/${TOOLDIR}/inf.snvs.csv \
   | tee ${rep}/${TOOLDIR}/metrics_prevalence.yml
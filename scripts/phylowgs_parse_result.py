@@ -8,15 +8,21 @@
 #  - cluster.csv : id_cluster,id_sample,freq
 #  - snv.csv     . chrom_pos,id_cluster,id_snv
 #  - tree.csv    . id_tree,from_cluster,to_cluster
+#
+# The summary file is streamed (see json_stream.py) in 2 passes: the first
+# one reads only the LLH of each tree, the second one builds only the best
+# tree and stops. Mutation assignments are read from the corresponding
+# member of the .mutass.zip file only.
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-08-29
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 import os, sys
 import argparse
-import gzip, json, zipfile
+import json, zipfile
+import json_stream
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Extract clusters and tree from PhyloWGS output.')
@@ -43,33 +49,63 @@ def parse_input(fh):
 
   return snvs
 
+def parse_llh(fn):
+  '''Read LLH of each sampled tree (list of (id_tree, llh) in file order).'''
+  llh = []
+  with json_stream.open_json(fn) as fh:
+    for p, ev, v in json_stream.parse(fh):
+      if len(p) == 3 and p[2] == 'llh' and p[0] == 'trees' and ev == 'number':
+        llh.append((p[1], v))
+
+  return llh
+
+def iter_trees(fn, ids):
+  '''Read trees with given ids (yield (id_tree, tree) in file order; stops after last one).'''
+  ids = set(ids)
+  with json_stream.open_json(fn) as fh:
+    events = json_stream.parse(fh)
+    for p, ev, v in events:
+      if len(p) == 2 and p[0] == 'trees' and ev == 'start_map' and p[1] in ids:
+        yield p[1], json_stream.build(events, p, ev, v)
+        ids.discard(p[1])
+        if len(ids) == 0:
+          break
+
+def best_tree(llh):
+  '''Id of tree with best LLH (choose last if tied).'''
+  max_llh = max(x for t, x in llh)
+
+  return [t for t, x in llh if x == max_llh][-1]
+
 def parse_summ(fh):
-  trees = []
-  d = json.load(gzip.open(fh.name, 'r'))
-  # extract log-likelihoods for trees
-  llh = [d['trees'][t]['llh'] for t in d['trees']]
-  # determine tree with best LLH (choose last if tied)
-  max_llh = max(llh)
-  idx_max_llh = [i for i, j in enumerate(llh) if j == max_llh][-1]
+  llh = parse_llh(fh.name)
+  id_best = best_tree(llh)
+  id_tree, tree = next(iter_trees(fh.name, [id_best]))
   # extract cellular prevalence for clusters
-  clust_prev = {k: v['cellular_prevalence'] for k, v in d['trees'][str(idx_max_llh)]['populations'].items()}
+  clust_prev = {k: v['cellular_prevalence'] for k, v in tree['populations'].items()}
   # extract clone tree branches for clusters
-  clust_children = d['trees'][str(idx_max_llh)]['structure']
+  clust_children = tree['structure']
 
-  return idx_max_llh, clust_prev, clust_children
+  return id_best, clust_prev, clust_children
 
-def parse_mutass(fh, idx):
-  z = zipfile.ZipFile(fh.name)
-  d = json.loads(z.read('{}.json'.format(idx))) 
+def read_mutass(z, idx):
+  '''Read mutation assignments of one tree from open .mutass.zip (zipfile.ZipFile).'''
+  with z.open('{}.json'.format(idx)) as f:
+    d = json.load(f)
   clust_snv = {k: v['ssms'] for k, v in d['mut_assignments'].items()}
-  
+
   return clust_snv
 
+def parse_mutass(fn, idx):
+  '''Read mutation assignments of one tree from .mutass.zip.'''
+  with zipfile.ZipFile(fn) as z:
+    return read_mutass(z, idx)
+
 def main(args):
   print(args)
   variants = parse_input(args['input_snv'])
   idx_best, clust_prev, clust_children = parse_summ(args['result_summ'])
-  clust_var = parse_mutass(args['result_mutass'], idx_best)
+  clust_var = parse_mutass(args['result_mutass'].name, idx_best)
 
   print("%d clusters" % len(clust_var))
   print("%d snvs" % len(variants))
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Evaluate PhyloWGS results across sampled trees.
+#
+# Instead of only the best (max. LLH) tree, all trees in the summary file (or
+# the top k by LLH) are compared to the TRUE clone tree:
+#   - clustering : ARI, homogeneity, completeness, V_measure, accuracy
+#   - prevalence : prev_msq
+#   - phylogeny  : CASet_isect, CASet_union, DISC_isect, DISC_union
+#
+# Trees are streamed from the summary file (see json_stream.py), mutation
+# assignments of each tree are read from its member of the .mutass.zip file
+# in a worker process (the archive is opened once per worker). Only a
+# bounded number of trees is in flight at a time, metrics are written to the
+# per-tree table as soon as they are available.
+#
+# Output:
+#   - per-tree table (CSV: id_tree,llh,weight,n_clust_inf,n_mut_inf,<metrics>)
+#   - LLH-weighted expectation and standard deviation of each metric
+#     ("<metric>", "<metric>_sd"; weights: exp(llh) normalized over evaluated
+#     trees) and unweighted mean ("<metric>_mean")
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import argparse
+import math
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import cluster_matching
+import metrics_clustering
+import metrics_phylogeny
+import phylowgs_parse_result
+
+METRICS = ['ARI', 'homogeneity', 'completeness', 'V_measure', 'accuracy', 'prev_msq'] + list(metrics_phylogeny.DISTANCES)
+
+# TRUE data and options (set in each worker process)
+truth = None
+# mutation assignments (.mutass.zip; opened once in each worker process)
+mutass = None
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Evaluate PhyloWGS results across sampled trees.')
+  parser.add_argument('input_snv', type=argparse.FileType(), help='Path to input file with SNV info.')
+  parser.add_argument('result_summ', help='Path to summary result file (*.summ.json.gz).')
+  parser.add_argument('result_mutass', help='Path to mutation assignments result file (*.mutass.zip).')
+  parser.add_argument('true_tree', type=argparse.FileType('r'), help='TRUE clone tree adjacency list (CSV: from,to).')
+  parser.add_argument('true_snvs', help='TRUE variant-to-clone mapping (CSV: chrom_pos,id_cluster,...).')
+  parser.add_argument('true_prev', help='TRUE clone prevalences (CSV: id_cluster,id_sample,freq).')
+  parser.add_argument('--top-k', type=int, default=0, help='Only evaluate the k trees with highest LLH (default: 0, all trees).')
+  parser.add_argument('--out', help='Output file for per-tree metrics (default: "posterior.trees.csv" next to summary file).')
+  parser.add_argument('--collapse', action='store_true', help='Whether to collapse co-clustered mutations for tree distances (optimization).')
+  parser.add_argument('--ignore-homoplasy', action='store_true', help='Whether to remove homoplasious mutations for tree distances.')
+  parser.add_argument('--threads', type=int, default=1, help='Number of trees to evaluate in parallel (default: 1).')
+
+  args = parser.parse_args()
+  if not args.out:
+    args.out = os.path.join(os.path.dirname(args.result_summ), 'posterior.trees.csv')
+  return args
+
+def read_prevalences(fn):
+  '''
+  Read cluster prevalences.
+
+  Output:
+    dict {id_cluster: {id_sample: freq}}
+  '''
+  prev = {}
+  with open(fn) as fh:
+    hdr = fh.readline()
+    for line in fh:
+      cols = line.strip().split(',')
+      prev.setdefault(cols[0], {})[cols[1]] = float(cols[2])
+
+  return prev
+
+def select_trees(llh, top_k=0):
+  '''
+  Select trees to evaluate and their weights.
+
+  Output:
+    dict {id_tree: (llh, weight)}
+  '''
+  if top_k > 0:
+    llh = sorted(llh, key=lambda x: -x[1])[:top_k]
+  max_llh = max(x for t, x in llh)
+  w = [math.exp(x - max_llh) for t, x in llh]
+  sum_w = sum(w)
+
+  return {t: (x, wi / sum_w) for (t, x), wi in zip(llh, w)}
+
+def prev_msq(m, tru_prev, inf_prev):
+  '''
+  Mean squared error between TRUE and INFERRED mutation CCFs (cf.
+  metrics_prevalence.py), from overlap of TRUE and INFERRED clusters.
+  '''
+  sum_sq = 0.0
+  n = 0
+  for i, tclust in enumerate(m.clusters_true):
+    tprev = tru_prev.get(tclust, {})
+    for j, iclust in enumerate(m.clusters_inf):
+      n_snvs = m.overlap[i, j]
+      if n_snvs == 0:
+        continue
+      iprev = inf_prev.get(iclust, {})
+      smp = [s for s in iprev if s in tprev]
+      sum_sq += n_snvs * sum((iprev[s] - tprev[s])**2 for s in smp)
+      n += n_snvs * len(smp)
+
+  return sum_sq / n if n > 0 else float('nan')
+
+def init_worker(data):
+  global truth, mutass
+  truth = data
+  mutass = zipfile.ZipFile(data['fn_mutass'])
+
+def evaluate_tree(task):
+  '''Calculate metrics for one sampled tree (worker process).'''
+  id_tree, llh, weight, tree = task
+  # INFERRED clusters, prevalences and tree
+  clust_var = phylowgs_parse_result.read_mutass(mutass, id_tree)
+  inf_snv = {truth['variants'][v]: c for c, lst_vars in clust_var.items() for v in lst_vars}
+  inf_prev = {c: {'R{}'.format(i): x for i, x in enumerate(p['cellular_prevalence'])} for c, p in tree['populations'].items()}
+  inf_edges = [(c, str(child)) for c, children in tree['structure'].items() for child in children]
+
+  row = {'id_tree': id_tree, 'llh': llh, 'weight': weight, 'n_clust_inf': len(clust_var), 'n_mut_inf': len(inf_snv)}
+  m = cluster_matching.compute_matching(truth['snvs'], inf_snv)
+  row['ARI'] = float(metrics_clustering.ari_from_tables(m.overlap))
+  hom, com, v = metrics_clustering.v_measure_from_tables(m.overlap)
+  row.update(homogeneity=float(hom), completeness=float(com), V_measure=float(v))
+  row['accuracy'] = cluster_matching.matched_accuracy(m)
+  row['prev_msq'] = prev_msq(m, truth['prev'], inf_prev)
+  dists = metrics_phylogeny.tree_distances(truth['edges'], list(truth['snvs'].items()), inf_edges, list(inf_snv.items()),
+    metrics_phylogeny.DISTANCES, truth['collapse'], truth['ignore_homoplasy'], verbose=False)
+  row.update(dists)
+
+  return row
+
+def evaluate_trees(fn_summ, selected, threads=1):
+  '''Evaluate selected trees (yield metrics of each tree in file order).'''
+  tasks = ((t, selected[t][0], selected[t][1], tree) for t, tree in phylowgs_parse_result.iter_trees(fn_summ, selected))
+  if threads <= 1:
+    for task in tasks:
+      yield evaluate_tree(task)
+    return
+  # limit number of trees in flight
+  with ProcessPoolExecutor(threads, initializer=init_worker, initargs=(truth,)) as pool:
+    pending = deque()
+    for task in tasks:
+      pending.append(pool.submit(evaluate_tree, task))
+      if len(pending) >= 2 * threads:
+        yield pending.popleft().result()
+    while pending:
+      yield pending.popleft().result()
+
+def main(args):
+  init_worker({
+    'variants'        : phylowgs_parse_result.parse_input(args.input_snv),
+    'fn_mutass'       : args.result_mutass,
+    'edges'           : metrics_phylogeny.parse_tree_csv(args.true_tree),
+    'snvs'            : cluster_matching.read_assignments(args.true_snvs),
+    'prev'            : read_prevalences(args.true_prev),
+    'collapse'        : args.collapse,
+    'ignore_homoplasy': args.ignore_homoplasy
+  })
+  llh = phylowgs_parse_result.parse_llh(args.result_summ)
+  selected = select_trees(llh, args.top_k)
+  print('[INFO] Evaluating {} of {} trees'.format(len(selected), len(llh)), file=sys.stderr)
+
+  # running sums for expectations
+  sum_w = 0.0
+  sum_wx = {k: 0.0 for k in METRICS}
+  sum_wxx = {k: 0.0 for k in METRICS}
+  sum_x = {k: 0.0 for k in METRICS}
+  cols = ['id_tree', 'llh', 'weight', 'n_clust_inf', 'n_mut_inf'] + METRICS
+  with open(args.out, 'wt') as f:
+    f.write(','.join(cols) + '\n')
+    for row in evaluate_trees(args.result_summ, selected, args.threads):
+      f.write('{},{},{:.6g},{},{},'.format(*[row[k] for k in cols[:5]]))
+      f.write(','.join('{:.4f}'.format(row[k]) for k in METRICS) + '\n')
+      w = row['weight']
+      sum_w += w
+      for k in METRICS:
+        sum_wx[k] += w * row[k]
+        sum_wxx[k] += w * row[k]**2
+        sum_x[k] += row[k]
+
+  n = len(selected)
+  print('n_trees: {}'.format(n))
+  print('n_trees_total: {}'.format(len(llh)))
+  print('ess: {:.4f}'.format(1.0 / sum(w**2 for x, w in selected.values())))
+  for k in METRICS:
+    mu = sum_wx[k] / sum_w
+    var = max(sum_wxx[k] / sum_w - mu**2, 0.0)
+    print('{}: {:.4f}'.format(k, mu))
+    print('{}_sd: {:.4f}'.format(k, math.sqrt(var)))
+    print('{}_mean: {:.4f}'.format(k, sum_x[k] / n))
+
+if __name__ == '__main__':
+  args = parse_args()
+  main(args)
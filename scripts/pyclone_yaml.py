@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Build PyClone mutations files (YAML) from PyClone input TSV files.
+#
+# Replaces "PyClone build_mutations_file --prior total_copy_number": for
+# each mutation the genotype states
+#   g_n = "A" * normal_cn
+#   g_r in {g_n, "A" * total_cn}
+#   g_v = "A" * (total_cn - k) + "B" * k   (k = 1..total_cn)
+# are enumerated (prior weight 1), with total_cn = minor_cn + major_cn.
+#
+# Output is written as a stream of YAML events (libyaml emitter if
+# available) while the TSV is read, the document is never held in memory.
+# Layout is the same as with yaml.dump() in PyClone (keys sorted, states as
+# flow mappings). Input files are processed in parallel.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import argparse
+from functools import lru_cache
+from multiprocessing import Pool
+import yaml
+
+# use libyaml emitter if available
+Dumper = getattr(yaml, 'CDumper', yaml.Dumper)
+# columns required in input TSV
+COLS = 'mutation_id ref_counts var_counts normal_cn minor_cn major_cn'.split()
+
+resolver = yaml.resolver.Resolver()
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Build PyClone mutations files (YAML) from PyClone input TSV files.')
+  parser.add_argument('tsv', nargs='+', help='PyClone input TSV files (one per sample).')
+  parser.add_argument('--outdir', help='Output directory (default: same as input); output files are named <sample>.yaml.')
+  parser.add_argument('--prior', default='total_copy_number', choices=list(PRIORS), help='Method to set possible genotype states (default: total_copy_number).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of files to process in parallel (default: 1).')
+
+  args = parser.parse_args()
+  return args
+
+@lru_cache(maxsize=None)
+def total_copy_number_states(normal_cn, total_cn):
+  '''Genotype states (g_n, g_r, g_v) for "total_copy_number" prior.'''
+  states = set()
+  g_n = 'A' * normal_cn
+  for k in range(1, total_cn + 1):
+    g_v = 'A' * (total_cn - k) + 'B' * k
+    for g_r in (g_n, 'A' * total_cn):
+      states.add((g_n, g_r, g_v))
+
+  return tuple(sorted(states))
+
+# methods to enumerate states from (normal_cn, total_cn)
+PRIORS = {
+  'total_copy_number': total_copy_number_states,
+}
+
+def scalar(value):
+  '''Scalar event for str or int value (str is quoted if plain style would not resolve to str).'''
+  if isinstance(value, int):
+    return yaml.ScalarEvent(None, None, (True, False), str(value))
+  plain = resolver.resolve(yaml.ScalarNode, value, (True, False)) == 'tag:yaml.org,2002:str'
+
+  return yaml.ScalarEvent(None, None, (plain, True), value)
+
+@lru_cache(maxsize=None)
+def state_events(states):
+  '''Events for list of states (events are immutable and can be reused).'''
+  events = [yaml.SequenceStartEvent(None, None, True, flow_style=False)]
+  for g_n, g_r, g_v in states:
+    events.append(yaml.MappingStartEvent(None, None, True, flow_style=True))
+    for k, v in (('g_n', g_n), ('g_r', g_r), ('g_v', g_v), ('prior_weight', 1)):
+      events += [scalar(k), scalar(v)]
+    events.append(yaml.MappingEndEvent())
+  events.append(yaml.SequenceEndEvent())
+
+  return events
+
+def mutation_events(mutations):
+  '''
+  Generate YAML events for mutations document.
+
+  Parameters:
+    mutations : iterable of (id, ref_counts, var_counts, states)
+  '''
+  keys = [scalar(k) for k in ('id', 'ref_counts', 'states', 'var_counts')]
+  yield yaml.StreamStartEvent()
+  yield yaml.DocumentStartEvent(explicit=False)
+  yield yaml.MappingStartEvent(None, None, True, flow_style=False)
+  yield scalar('mutations')
+  yield yaml.SequenceStartEvent(None, None, True, flow_style=False)
+  for id_mut, rc_ref, rc_var, states in mutations:
+    yield yaml.MappingStartEvent(None, None, True, flow_style=False)
+    yield keys[0]
+    yield scalar(id_mut)
+    yield keys[1]
+    yield scalar(rc_ref)
+    yield keys[2]
+    yield from state_events(states)
+    yield keys[3]
+    yield scalar(rc_var)
+    yield yaml.MappingEndEvent()
+  yield yaml.SequenceEndEvent()
+  yield yaml.MappingEndEvent()
+  yield yaml.DocumentEndEvent(explicit=False)
+  yield yaml.StreamEndEvent()
+
+def write_mutations(fh, mutations):
+  '''Write mutations (see mutation_events()) as YAML to open file handle.'''
+  yaml.emit(mutation_events(mutations), fh, Dumper=Dumper)
+
+def read_tsv(fn, prior='total_copy_number'):
+  '''Read PyClone input TSV, yield (id, ref_counts, var_counts, states).'''
+  with open(fn, 'rt') as f:
+    hdr = f.readline().rstrip('\n').split('\t')
+    idx = [hdr.index(x) for x in COLS]
+    get_states = PRIORS[prior]
+    for line in f:
+      row = line.rstrip('\n').split('\t')
+      if len(row) < len(hdr):
+        continue
+      id_mut, rc_ref, rc_var, cn_nrm, cn_min, cn_maj = [row[i] for i in idx]
+      states = get_states(int(cn_nrm), int(cn_min) + int(cn_maj))
+      yield id_mut, int(rc_ref), int(rc_var), states
+
+def build_file(task):
+  '''Convert one TSV file (task: input file, output file, prior).'''
+  fn_in, fn_out, prior = task
+  with open(fn_out, 'wt') as fh:
+    write_mutations(fh, read_tsv(fn_in, prior))
+
+  return fn_out
+
+def main(args):
+  tasks = []
+  for fn in args.tsv:
+    dir_out = args.outdir if args.outdir else os.path.dirname(fn)
+    fn_out = os.path.join(dir_out, os.path.splitext(os.path.basename(fn))[0] + '.yaml')
+    tasks.append((fn, fn_out, args.prior))
+  if args.threads > 1 and len(tasks) > 1:
+    with Pool(min(args.threads, len(tasks))) as pool:
+      for fn_out in pool.imap_unordered(build_file, tasks):
+        print('[INFO] Written: {}'.format(fn_out))
+  else:
+    for task in tasks:
+      print('[INFO] Written: {}'.format(build_file(task)))
+
+if __name__ == '__main__':
+  args = parse_args()
+  main(args)
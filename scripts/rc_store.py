@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Binary store of read counts and copy numbers (variants x samples).
+#
+# The store is a directory with:
+#   samples.txt   : sample ids (one per line; column order of matrices)
+#   variants.tsv  : variant index (CHROM, POS, ID, REF, ALT; ALT is the major
+#                   ALT allele, see allele_counts.py)
+#   rc_tot.npy    : total read count (DP; MISSING if absent in sample)
+#   rc_alt.npy    : major ALT allele read count (AD; 0 if absent)
+#   <CN>.npy      : copy number FORMAT fields found in the VCF (CNI, CNIA, ...;
+#                   dtype from header Type: int64 with MISSING or float64 with
+#                   NaN if absent)
+#   meta.txt      : build parameters (region, filter predicates, fields and
+#                   their dtypes); an existing store is only reused if they
+#                   match, only the listed fields are part of the store
+#
+# Matrices are written once (chunk by chunk, constant memory) and are
+# memory-mapped when the store is opened; only the requested fields are
+# mapped.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+from __future__ import division, print_function
+import os, sys
+import argparse
+import contextlib
+from functools import partial
+import shutil
+import tempfile
+import numpy as np
+import vcf_columnar
+from vcf_columnar import MISSING
+import allele_counts
+
+# read count matrices
+RC_FIELDS = ['rc_tot', 'rc_alt']
+# copy number FORMAT fields (stored if present in VCF header)
+CN_FIELDS = ['CNI', 'CNIA', 'CNIB', 'CN1', 'CN2']
+# variant index columns
+VAR_COLS = ['CHROM', 'POS', 'ID', 'REF', 'ALT']
+FN_SAMPLES = 'samples.txt'
+FN_META = 'meta.txt'
+FN_VARIANTS = 'variants.tsv' # written last, marks store as complete
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Create binary read count/copy number store from VCF.')
+  parser.add_argument('vcf', help='Multi-sample VCF file with somatic mutations and read counts. (required FORMAT fields: "AD", "DP")')
+  parser.add_argument('store', help='Output directory.')
+  parser.add_argument('--region', help='Only store records in region (CHROM[:BEG[-END]]).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of worker processes (requires bgzipped and indexed VCF; default: 1).')
+
+  args = parser.parse_args()
+  return args
+
+def store_chunk(chunk, cn_fields):
+  '''Matrices and variant index lines of a chunk (worker process).'''
+  mc = allele_counts.count_major_allele(chunk)
+  res = {'rc_tot': mc['depth'], 'rc_alt': mc['alt']}
+  for field in cn_fields:
+    res[field] = chunk[field]
+  res['lines'] = ['{}\t{}\t{}\t{}\t{}\n'.format(*x) for x in zip(chunk['CHROM'], chunk['POS'].tolist(), chunk['ID'], chunk['REF'], mc['allele'])]
+
+  return res
+
+def store_meta(hdr, region=None, filt=None):
+  '''Build parameters of store (lines of meta file).'''
+  cn_fields = [f for f in CN_FIELDS if f in hdr['formats']]
+  lines = ['region\t{}'.format(region or '')]
+  if filt:
+    for kind in ['site', 'include', 'mask', 'require']:
+      for p in getattr(filt, kind):
+        lines.append('{}\t{}'.format(kind, ' '.join(str(x) for x in p)))
+  lines.append('fields\t{}'.format(','.join(RC_FIELDS + cn_fields)))
+  lines.append('dtypes\t{}'.format(','.join(np.dtype(field_dtype(hdr, f)).name for f in RC_FIELDS + cn_fields)))
+
+  return [x + '\n' for x in lines]
+
+def field_dtype(hdr, field):
+  '''Data type of matrix (float64 for FORMAT fields of Type Float, else int64).'''
+  if field in CN_FIELDS and vcf_columnar.field_spec(hdr, field)[1] == 'Float':
+    return np.float64
+
+  return np.int64
+
+def is_missing(mat):
+  '''Missing values of matrix (MISSING for integer, NaN for float matrices).'''
+  mat = np.asarray(mat)
+  if mat.dtype.kind == 'f':
+    return np.isnan(mat)
+
+  return mat == MISSING
+
+def stored_fields(dirname):
+  '''Fields of store (from meta file).'''
+  with open(os.path.join(dirname, FN_META)) as f:
+    for line in f:
+      key, sep, val = line.rstrip('\n').partition('\t')
+      if key == 'fields':
+        return val.split(',') if val else []
+
+  return []
+
+def build_store(fn_vcf, dirname, chunk_size=vcf_columnar.CHUNK_SIZE, region=None, threads=1, filt=None):
+  '''Parse VCF (region and records passing filter only, if given) and write store to directory.'''
+  hdr = vcf_columnar.read_header(fn_vcf)
+  samples = hdr['samples']
+  cn_fields = [f for f in CN_FIELDS if f in hdr['formats']]
+  n_sites = vcf_columnar.count_sites(fn_vcf, region, threads, filt)
+
+  if not os.path.isdir(dirname):
+    os.makedirs(dirname)
+  # remove completion marker while (re)writing
+  fn_var = os.path.join(dirname, FN_VARIANTS)
+  if os.path.exists(fn_var):
+    os.remove(fn_var)
+  # remove matrices of fields from earlier builds
+  fields = RC_FIELDS + cn_fields
+  for fn in os.listdir(dirname):
+    if fn.endswith('.npy') and fn[:-4] not in fields:
+      os.remove(os.path.join(dirname, fn))
+  with open(os.path.join(dirname, FN_SAMPLES), 'wt') as f:
+    f.write(''.join(x + '\n' for x in samples))
+  mats = {}
+  for field in fields:
+    fn = os.path.join(dirname, field + '.npy')
+    mats[field] = np.lib.format.open_memmap(fn, mode='w+', dtype=field_dtype(hdr, field), shape=(n_sites, len(samples)))
+
+  fn_tmp = fn_var + '.tmp'
+  func = partial(store_chunk, cn_fields=cn_fields)
+  with open(fn_tmp, 'wt') as f_var:
+    f_var.write('\t'.join(VAR_COLS) + '\n')
+    i = 0
+    for res in vcf_columnar.map_chunks(fn_vcf, func, ['AD', 'DP'] + cn_fields, samples, chunk_size, region, threads, filt=filt):
+      j = i + len(res['lines'])
+      for field in mats:
+        mats[field][i:j] = res[field]
+      f_var.write(''.join(res['lines']))
+      i = j
+  for m in mats.values():
+    m.flush()
+  with open(os.path.join(dirname, FN_META), 'wt') as f:
+    f.write(''.join(store_meta(hdr, region, filt)))
+  os.rename(fn_tmp, fn_var)
+
+def is_current(dirname, fn_vcf, region=None, filt=None):
+  '''Check if store is complete, newer than VCF and built with the same parameters.'''
+  fn_var = os.path.join(dirname, FN_VARIANTS)
+  fn_meta = os.path.join(dirname, FN_META)
+  if not (os.path.exists(fn_var) and os.path.exists(fn_meta)):
+    return False
+  if os.path.getmtime(fn_var) < os.path.getmtime(fn_vcf):
+    return False
+  with open(fn_meta) as f:
+    meta = f.readlines()
+  if meta != store_meta(vcf_columnar.read_header(fn_vcf), region, filt):
+    print('[INFO] Rebuilding store (parameters differ): {}'.format(dirname), file=sys.stderr)
+    return False
+
+  return True
+
+def open_store(dirname, fields=None):
+  '''
+  Open store; matrices are memory-mapped (read-only).
+
+  Parameters:
+    dirname : store directory
+    fields  : matrices to map (default: all fields listed in meta file)
+
+  Output:
+    dict with entries
+      samples             : list of sample ids
+      CHROM, ID, REF, ALT : list of str (variants)
+      POS                 : int64 array (variants)
+      <field>             : variants x samples matrix (see is_missing())
+                            (copy number fields not in VCF are all MISSING)
+  '''
+  st = {c: [] for c in VAR_COLS}
+  with open(os.path.join(dirname, FN_SAMPLES)) as f:
+    st['samples'] = [line.rstrip('\n') for line in f]
+  with open(os.path.join(dirname, FN_VARIANTS)) as f:
+    hdr = f.readline()
+    for line in f:
+      for c, x in zip(VAR_COLS, line.rstrip('\n').split('\t')):
+        st[c].append(x)
+  st['POS'] = np.array(st['POS'], dtype=np.int64)
+  in_store = stored_fields(dirname)
+  if fields is None:
+    fields = in_store
+  shape = (len(st['CHROM']), len(st['samples']))
+  for field in fields:
+    fn = os.path.join(dirname, field + '.npy')
+    if field not in in_store and field in CN_FIELDS: # not in VCF
+      st[field] = np.broadcast_to(np.int64(MISSING), shape)
+    else:
+      st[field] = np.load(fn, mmap_mode='r')
+
+  return st
+
+@contextlib.contextmanager
+def load(path, store=None, fields=None, region=None, threads=1, filt=None):
+  '''
+  Open store for input file.
+
+  Parameters:
+    path   : VCF file or store directory
+    store  : store directory to create/reuse for VCF input
+             (default: temporary directory, removed on exit)
+    fields : matrices to map (default: all)
+    region, threads, filt : passed to build_store() (VCF input)
+  '''
+  tmpdir = None
+  if os.path.isdir(path):
+    store = path
+  else:
+    if store is None:
+      tmpdir = tempfile.mkdtemp(prefix='rc_store.')
+      store = tmpdir
+    if not is_current(store, path, region, filt):
+      build_store(path, store, region=region, threads=threads, filt=filt)
+  try:
+    yield open_store(store, fields)
+  finally:
+    if tmpdir is not None:
+      shutil.rmtree(tmpdir)
+
+def num_variants(st):
+  '''Number of variants in store.'''
+  return len(st['CHROM'])
+
+def iter_blocks(st, fields, block_size=vcf_columnar.CHUNK_SIZE):
+  '''Iterate over consecutive blocks of variants (index columns + requested fields).'''
+  n = num_variants(st)
+  for i in range(0, n, block_size):
+    j = min(i + block_size, n)
+    blk = {c: st[c][i:j] for c in VAR_COLS}
+    for field in fields:
+      blk[field] = np.asarray(st[field][i:j])
+    yield blk
+
+def mean_depth(st, block_size=vcf_columnar.CHUNK_SIZE):
+  '''Rounded mean total read count per sample (absent variants are ignored).'''
+  sum_dp = np.zeros(len(st['samples']), dtype=np.int64)
+  num_loc = np.zeros(len(st['samples']), dtype=np.int64)
+  for blk in iter_blocks(st, ['rc_tot'], block_size):
+    present = blk['rc_tot'] != MISSING
+    sum_dp += np.where(present, blk['rc_tot'], 0).sum(axis=0)
+    num_loc += present.sum(axis=0)
+
+  return [round(d / n) if n > 0 else 0 for d, n in zip(sum_dp.tolist(), num_loc.tolist())]
+
+def main(args):
+  build_store(args.vcf, args.store, region=args.region, threads=args.threads)
+
+if __name__ == '__main__':
+  args = parse_args()
+  main(args)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Load long-format SNV read count CSV into variant x sample matrices.
+#
+# INPUT:
+#   CSV format: chrom,pos,id_sample,ref,alt,rc_tot,rc_alt[,...]
+#
+# Variant and sample labels are integer-coded with np.unique() and read
+# counts are pivoted into dense matrices with a single fancy-indexing
+# assignment. Variants are sorted by id (CHROM_POS; string order), samples by
+# id, which is the order the snvs2*.py converters write their outputs in.
+# The genomic order of variants (chromosomes in order of appearance, then
+# position) is precomputed for converters that keep it.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import numpy as np
+
+def read_csv(fh):
+  '''
+  Parse contents of CSV file with the following column specification:
+    chrom,pos,id_sample,ref,alt,rc_tot,rc_alt
+  Output:
+    dict with entries
+      ids     : variant ids (CHROM_POS), sorted
+      order   : variant indices in genomic order (chromosome in order of
+                appearance, numeric position)
+      chrom   : chromosome of variants
+      pos     : position of variants (str)
+      samples : sample ids, sorted
+      rc_tot  : total read count (variants x samples; 0 if missing)
+      rc_alt  : ALT read count (variants x samples; 0 if missing)
+      present : variant listed for sample (variants x samples)
+  '''
+  # skip header line
+  hdr = fh.readline()
+  rows = [line.rstrip('\n').split(',', 7)[:7] for line in fh if line.strip()]
+  if len(rows) > 0:
+    chrom, pos, smp, ref, alt, rc_tot, rc_alt = [np.array(x) for x in zip(*rows)]
+  else:
+    chrom, pos, smp, ref, alt, rc_tot, rc_alt = [np.array([], dtype=str)] * 7
+  id_var = np.char.add(np.char.add(chrom, '_'), pos)
+
+  ids, idx_first, idx_var = np.unique(id_var, return_index=True, return_inverse=True)
+  samples, idx_smp = np.unique(smp, return_inverse=True)
+  # rank chromosomes by first appearance
+  contigs, idx_contig_first, idx_contig = np.unique(chrom[idx_first], return_index=True, return_inverse=True)
+  contig_rank = np.argsort(np.argsort(idx_first[idx_contig_first]))
+  order = np.lexsort((pos[idx_first].astype(np.int64), contig_rank[idx_contig.ravel()]))
+  n_var, n_smp = len(ids), len(samples)
+  cell = idx_var.ravel() * n_smp + idx_smp.ravel()
+  counts = np.bincount(cell, minlength=n_var*n_smp)
+  if (counts > 1).any():
+    k = int(np.argmax(counts))
+    raise AssertionError('Variant "{}" found more than once for sample "{}"'.format(ids[k // n_smp], samples[k % n_smp]))
+
+  snv = {
+    'ids'    : ids.tolist(),
+    'order'  : order.tolist(),
+    'chrom'  : chrom[idx_first].tolist(),
+    'pos'    : pos[idx_first].tolist(),
+    'samples': samples.tolist(),
+    'rc_tot' : np.zeros(n_var*n_smp, dtype=np.int64),
+    'rc_alt' : np.zeros(n_var*n_smp, dtype=np.int64),
+    'present': counts.astype(bool).reshape(n_var, n_smp),
+  }
+  snv['rc_tot'][cell] = rc_tot.astype(np.int64)
+  snv['rc_alt'][cell] = rc_alt.astype(np.int64)
+  snv['rc_tot'] = snv['rc_tot'].reshape(n_var, n_smp)
+  snv['rc_alt'] = snv['rc_alt'].reshape(n_var, n_smp)
+
+  return snv
+
+def select_samples(snv, normal=None):
+  '''Sample ids and matrix column indices excluding the normal sample.'''
+  cols = [i for i, x in enumerate(snv['samples']) if x != normal]
+
+  return [snv['samples'][i] for i in cols], np.array(cols, dtype=np.int64)
+
+def assert_complete(snv, cols):
+  '''Make sure every variant is listed for each of the selected samples.'''
+  missing = ~snv['present'][:, cols]
+  if missing.any():
+    k, i = [x[0] for x in np.nonzero(missing)]
+    raise KeyError('Variant "{}" missing for sample "{}"'.format(snv['ids'][k], snv['samples'][cols[i]]))
+
+def join_rows(mat, sep=','):
+  '''Format rows of integer matrix as separated strings.'''
+  return [sep.join(row) for row in mat.astype(str).tolist()]
@@ -12,12 +12,13 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-09-13
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import division, print_function
 import os, sys
 import argparse
+import snv_matrix
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Create Canopy input files from SNV file.')
@@ -28,59 +29,19 @@ def parse_args():
   args = parser.parse_args()
   return args
 
-def parse_csv(fh):
-  '''
-  Parse contents of CSV file with the following column specification:
-    chrom,pos,id_sample,ref,alt,rc_tot,rc_alt
-  Output:
-    dict {id_var: {id_sample: (rc_tot, rc_alt)}}
-  '''
-  samples = set()
-  var_smp_rc = {}
-  # skip header line
-  hdr = fh.readline()
-  # parse variant data
-  for line in fh:
-    cols = line.strip().split(',')
-    chrom, pos, smp, ref, alt, rc_tot, rc_alt = cols[:7]
-    samples.update((smp,))
-    id_var = '{}_{}'.format(chrom, pos)
-    if id_var not in var_smp_rc:
-      var_smp_rc[id_var] = {}
-    assert smp not in var_smp_rc[id_var], 'Variant "{}" found more than once for sample "{}"'.format(id_var, smp)
-    var_smp_rc[id_var][smp] = (rc_tot, rc_alt)
-
-  return var_smp_rc, samples
-
 def main(args):
-  var_smp_rc, set_samples = parse_csv(args.csv)
-  samples = [x for x in sorted(set_samples) if x != args.normal]
+  snv = snv_matrix.read_csv(args.csv)
+  samples, cols = snv_matrix.select_samples(snv, args.normal)
 
   # output header
   hdr = ['id_var'] + samples # first column contains row ids (R style)
-  # set up output files
-  fn_alt = os.path.join(args.outdir, 'rc_alt.csv')
-  f_alt = open(fn_alt, 'wt')
-  f_alt.write(','.join(hdr) + '\n')
-  fn_tot = os.path.join(args.outdir, 'rc_tot.csv')
-  f_tot = open(fn_tot, 'wt')
-  f_tot.write(','.join(hdr) + '\n')
-
-  for id_var in sorted(var_smp_rc.keys()):
-    out_dat_alt = [id_var]
-    out_dat_tot = [id_var]
-    for id_smp in samples:
-      smp_rc = var_smp_rc[id_var]
-      tot, alt = (0, 0)
-      if id_smp in smp_rc:
-        tot, alt = smp_rc[id_smp]
-      out_dat_alt += [str(alt)]
-      out_dat_tot += [str(tot)]
-    f_alt.write(','.join(out_dat_alt) + '\n')
-    f_tot.write(','.join(out_dat_tot) + '\n')
+  # write read count matrices (missing read counts are 0)
+  for field in ['rc_alt', 'rc_tot']:
+    rows = snv_matrix.join_rows(snv[field][:, cols])
+    with open(os.path.join(args.outdir, field + '.csv'), 'wt') as f:
+      f.write(','.join(hdr) + '\n')
+      f.write(''.join('{},{}\n'.format(id_var, row) for id_var, row in zip(snv['ids'], rows)))
 
-  f_alt.close()
-  f_tot.close()
 
 if __name__ == '__main__':
   args = parse_args()
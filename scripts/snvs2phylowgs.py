@@ -11,12 +11,13 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-11-18
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import division, print_function
 import os, sys
 import argparse
+import snv_matrix
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Create Canopy input files from SNV file.')
@@ -26,57 +27,20 @@ def parse_args():
   args = parser.parse_args()
   return args
 
-def parse_csv(fh):
-  '''
-  Parse contents of CSV file with the following column specification:
-    chrom,pos,id_sample,ref,alt,rc_tot,rc_alt
-  Output:
-    dict {id_var: {id_sample: (rc_tot, rc_alt)}}
-  '''
-  samples = set()
-  var_smp_rc = {}
-  # skip header line
-  hdr = fh.readline()
-  # parse variant data
-  for line in fh:
-    cols = line.strip().split(',')
-    chrom, pos, smp, ref, alt, rc_tot, rc_alt = cols[:7]
-    samples.update((smp,))
-    id_var = '{}_{}'.format(chrom, pos)
-    if id_var not in var_smp_rc:
-      var_smp_rc[id_var] = {}
-    assert smp not in var_smp_rc[id_var], 'Variant "{}" found more than once for sample "{}"'.format(id_var, smp)
-    var_smp_rc[id_var][smp] = (rc_tot, rc_alt)
-
-  return var_smp_rc, samples
-
 def main(args):
-  var_smp_rc, set_samples = parse_csv(args.csv)
-  samples = [x for x in sorted(set_samples) if x != args.normal]
+  snv = snv_matrix.read_csv(args.csv)
+  samples, cols = snv_matrix.select_samples(snv, args.normal)
+  snv_matrix.assert_complete(snv, cols)
 
   # output header
   hdr = "id gene a d mu_r mu_v".split()
   print('\t'.join(hdr))
 
   # write output vars
-  idx_var = 0
-  for id_var in sorted(var_smp_rc.keys()):
-    id_mut = 's{}'.format(idx_var)
-    smp_rc = var_smp_rc[id_var]
-    lst_alt = []
-    lst_tot = []
-    for s in samples:
-      t, a = smp_rc[s]
-      lst_alt.append(a)
-      lst_tot.append(t)
-    alt = ','.join(lst_alt)
-    tot = ','.join(lst_tot)
-    # import pdb; pdb.set_trace()
-    #alt = ','.join([str(a) if a else '0' for s in samples for t,a in smp_rc[s]])
-    #tot = ','.join([str(t) if t else '0' for s in samples for t,a in smp_rc[s]])
-    out_data = [id_mut, id_var, alt, tot, '0.999', '0.499']
-    print('\t'.join(out_data))
-    idx_var += 1
+  alt = snv_matrix.join_rows(snv['rc_alt'][:, cols])
+  tot = snv_matrix.join_rows(snv['rc_tot'][:, cols])
+  lines = ['s{}\t{}\t{}\t{}\t0.999\t0.499\n'.format(k, id_var, alt[k], tot[k]) for k, id_var in enumerate(snv['ids'])]
+  sys.stdout.write(''.join(lines))
 
 
 if __name__ == '__main__':
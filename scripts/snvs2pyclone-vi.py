@@ -6,13 +6,13 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-08-20
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
 import os, sys
 import argparse
-import vcf
+import snv_matrix
 
 # output header
 hdr = "mutation_id sample_id ref_counts alt_counts normal_cn major_cn minor_cn".split()
@@ -26,23 +26,27 @@ def parse_args():
   return args
 
 def main(args):
+  snv = snv_matrix.read_csv(args.csv)
+  samples, cols = snv_matrix.select_samples(snv, args.normal)
+  rc_alt = snv['rc_alt'][:, cols].tolist()
+  rc_ref = (snv['rc_tot'][:, cols] - snv['rc_alt'][:, cols]).tolist()
+  present = snv['present'][:, cols].tolist()
+  cn_nrm = "2"
+  cn_maj = "1"
+  cn_min = "1"
+
   # print output header
   print('\t'.join(hdr))
+  # write variant data (one row per variant and sample; genomic order)
+  lines = []
+  for k in snv['order']:
+    id_var = snv['ids'][k]
+    for i, smp in enumerate(samples):
+      if present[k][i]:
+        out = [id_var, smp, str(rc_ref[k][i]), str(rc_alt[k][i]), cn_nrm, cn_maj, cn_min]
+        lines.append('\t'.join(out) + '\n')
+  sys.stdout.write(''.join(lines))
 
-  # skip input header
-  hdr_in = args.csv.readline()
-  # parse variant data
-  for line in args.csv:
-    cols = line.strip().split(',')
-    chrom, pos, smp, ref, alt, rc_tot, rc_alt = cols[:7]
-    cn_nrm = "2"
-    cn_maj = "1"
-    cn_min = "1"
-    if smp != args.normal:
-      id_var = '{}_{}'.format(chrom, pos)
-      rc_ref = str(int(rc_tot) - int(rc_alt))
-      out = [id_var, smp, rc_ref, rc_alt, cn_nrm, cn_maj, cn_min]
-      print('\t'.join(out))
 
 if __name__ == '__main__':
   args = parse_args()
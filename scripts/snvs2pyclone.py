@@ -6,17 +6,19 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-11-30
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
 import os, sys
 import argparse
-import vcf
-import math
+import numpy as np
+import snv_matrix
 
 # output header
 hdr = "mutation_id ref_counts var_counts normal_cn minor_cn major_cn".split()
+# number of variants formatted at a time
+BLOCK_SIZE = 10000
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Create PyClone input files from VCF.')
@@ -27,67 +29,35 @@ def parse_args():
   args = parser.parse_args()
   return args
 
-def parse_csv(fh):
-  '''
-  Parse contents of CSV file with the following column specification:
-    chrom,pos,id_sample,ref,alt,rc_tot,rc_alt
-  Output:
-    dict {id_var: {id_sample: (rc_tot, rc_alt)}}
-  '''
-  samples = set()
-  var_smp_rc = {}
-  # skip header line
-  hdr = fh.readline()
-  # parse variant data
-  for line in fh:
-    cols = line.strip().split(',')
-    chrom, pos, smp, ref, alt, rc_tot, rc_alt = cols[:7]
-    samples.update((smp,))
-    id_var = '{}_{}'.format(chrom, pos)
-    if id_var not in var_smp_rc:
-      var_smp_rc[id_var] = {}
-    assert smp not in var_smp_rc[id_var], 'Variant "{}" found more than once for sample "{}"'.format(id_var, smp)
-    var_smp_rc[id_var][smp] = (rc_tot, rc_alt)
-
-  return var_smp_rc, samples
-
 def main(args):
   # read variant data
-  var_smp_rc, set_samples = parse_csv(args.csv)
-  samples = [x for x in sorted(set_samples) if x != args.normal]
+  snv = snv_matrix.read_csv(args.csv)
+  samples, cols = snv_matrix.select_samples(snv, args.normal)
+
+  # missing read counts are 0
+  rc_alt = snv['rc_alt'][:, cols]
+  rc_ref = snv['rc_tot'][:, cols] - rc_alt
+  cn_nrm = 2
+  # assume heterozygous variant unless only REF or only ALT reads are observed
+  is_hom = (rc_ref == 0) | (rc_alt == 0)
+  cn_min = np.where(is_hom, 0, 1)
+  cn_maj = np.where(is_hom, 2, 1)
+
+  # write output files (ignore normal sample) in one pass over blocks of variants
+  fhs = [open(os.path.join(args.outdir, id_smp + '.tsv'), 'wt') for id_smp in samples]
+  for fh in fhs:
+    fh.write('\t'.join(hdr) + '\n')
+  for j in range(0, len(snv['ids']), BLOCK_SIZE):
+    k = j + BLOCK_SIZE
+    ids = snv['ids'][j:k]
+    vals = [x[j:k].T.tolist() for x in (rc_ref, rc_alt, cn_min, cn_maj)]
+    for i, fh in enumerate(fhs):
+      lines = ['{}\t{}\t{}\t{}\t{}\t{}\n'.format(id_var, r, a, cn_nrm, c1, c2)
+        for id_var, r, a, c1, c2 in zip(ids, vals[0][i], vals[1][i], vals[2][i], vals[3][i])]
+      fh.write(''.join(lines))
+  for fh in fhs:
+    fh.close()
 
-  # write output files (ignore normal sample)
-  for i in range(len(samples)):
-    id_smp = samples[i]
-    fn_out = os.path.join(args.outdir, id_smp + '.tsv')
-    with open(fn_out, 'wt') as fh_out:
-      fh_out.write('\t'.join(hdr) + '\n')
-      for id_var in sorted(var_smp_rc.keys()):
-      #for var_data in lst_vars:
-        smp_rc = var_smp_rc[id_var]
-        rc_tot, rc_alt = (0, 0)
-        if id_smp in smp_rc:
-          str_tot, str_alt = smp_rc[id_smp]
-          rc_tot = int(str_tot)
-          rc_alt = int(str_alt)
-        rc_ref = rc_tot - rc_alt
-        cn_nrm = 2
-        cn_min = 1
-        cn_maj = 1
-        if rc_ref == 0 or rc_alt == 0:
-          cn_min = 0
-          cn_maj = 2
-        #cn_tot = 2
-        # heuristic to split total CN in minor and major by VAF
-        #vaf = (rc_alt / (rc_alt + rc_ref)) if (rc_alt + rc_ref) > 0 else 0.0
-        #cn_min = math.ceil(vaf*cn_tot)
-        #if rc_ref > 0: # cn_min should be lower than cn_tot if there are REF reads
-        #  cn_min = min(cn_min, cn_tot-1)
-        #cn_maj = cn_tot - cn_min 
-        if True: #rc_alt > 0:
-          out = [str(x) for x in [id_var, rc_ref, rc_alt, cn_nrm, cn_min, cn_maj]]
-          assert len(out) == len(hdr), 'Number of data fields does not match header.'
-          fh_out.write('\t'.join(out) + '\n')
 
 if __name__ == '__main__':
   args = parse_args()
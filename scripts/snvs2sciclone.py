@@ -6,14 +6,14 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-11-20
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
 import os, sys
 import argparse
-import vcf
-import math
+import numpy as np
+import snv_matrix
 
 # output header
 hdr = "chr pos refCount varCount VAF".split()
@@ -27,56 +27,27 @@ def parse_args():
   args = parser.parse_args()
   return args
 
-def parse_csv(fh):
-  '''
-  Parse contents of CSV file with the following column specification:
-    chrom,pos,id_sample,ref,alt,rc_tot,rc_alt
-  Output:
-    dict {id_var: {id_sample: (rc_tot, rc_alt)}}
-  '''
-  samples = set()
-  var_smp_rc = {}
-  # skip header line
-  hdr = fh.readline()
-  # parse variant data
-  for line in fh:
-    cols = line.strip().split(',')
-    chrom, pos, smp, ref, alt, rc_tot, rc_alt = cols[:7]
-    samples.update((smp,))
-    id_var = '{}_{}'.format(chrom, pos)
-    if id_var not in var_smp_rc:
-      var_smp_rc[id_var] = {}
-    assert smp not in var_smp_rc[id_var], 'Variant "{}" found more than once for sample "{}"'.format(id_var, smp)
-    var_smp_rc[id_var][smp] = (rc_tot, rc_alt)
-
-  return var_smp_rc, samples
-
 def main(args):
   # read variant data
-  var_smp_rc, set_samples = parse_csv(args.csv)
-  samples = [x for x in sorted(set_samples) if x != args.normal]
+  snv = snv_matrix.read_csv(args.csv)
+  samples, cols = snv_matrix.select_samples(snv, args.normal)
+
+  # missing read counts are 0
+  rc_tot = snv['rc_tot'][:, cols]
+  rc_alt = snv['rc_alt'][:, cols]
+  rc_ref = rc_tot - rc_alt
+  with np.errstate(divide='ignore', invalid='ignore'):
+    vaf = np.where(rc_tot > 0, rc_alt / rc_tot, 0.0)
 
   # write output files (ignore normal sample)
-  for i in range(len(samples)):
-    id_smp = samples[i]
+  for i, id_smp in enumerate(samples):
     fn_out = os.path.join(args.outdir, id_smp + '.vaf.csv')
     with open(fn_out, 'wt') as fh_out:
       fh_out.write(','.join(hdr) + '\n')
-      for id_var in sorted(var_smp_rc.keys()):
-        chrom, pos = id_var.split('_')
-        smp_rc = var_smp_rc[id_var]
-        rc_tot, rc_alt = (0, 0)
-        if id_smp in smp_rc:
-          str_tot, str_alt = smp_rc[id_smp]
-          rc_tot = int(str_tot)
-          rc_alt = int(str_alt)
-        rc_ref = rc_tot - rc_alt
-        # heuristic to split total CN in minor and major by VAF
-        vaf = (rc_alt / (rc_alt + rc_ref)) if (rc_alt + rc_ref) > 0 else 0.0
-        str_vaf = '{:.4f}'.format(vaf)
-        out = [str(x) for x in [chrom, pos, rc_ref, rc_alt, str_vaf]]
-        assert len(out) == len(hdr), 'Number of data fields does not match header.'
-        fh_out.write(','.join(out) + '\n')
+      lines = ['{},{},{},{},{:.4f}\n'.format(*x) for x in zip(snv['chrom'], snv['pos'],
+        rc_ref[:, i].tolist(), rc_alt[:, i].tolist(), vaf[:, i].tolist())]
+      fh_out.write(''.join(lines))
+
 
 if __name__ == '__main__':
   args = parse_args()
@@ -1,8 +1,13 @@
 from __future__ import print_function
+import os
 import numpy
+from scipy import special
 from scipy.stats import beta
 from scipy.stats import norm
 
+# memo of HPD intervals (uniform prior): {(n, N, pct): (mode, lower, upper)}
+HPDR_CACHE = {}
+
 def binomial_hpdr(n, N, pct, a=1, b=1, n_pbins=1e3):
     """
     Function computes the posterior mode along with the upper and lower bounds of the
@@ -39,7 +44,7 @@ def binomial_hpdr(n, N, pct, a=1, b=1, n_pbins=1e3):
     if min_p > 1:
         min_p = 1.
     # make the range of success probabilities
-    p_range = numpy.linspace(min_p, max_p, n_pbins+1)
+    p_range = numpy.linspace(min_p, max_p, int(n_pbins)+1)
     # construct the probability mass function over the given range
     if mode > 0.5:
         sf = rv.sf(p_range)
@@ -56,6 +61,96 @@ def binomial_hpdr(n, N, pct, a=1, b=1, n_pbins=1e3):
 
     return (mode, lower, upper)
 
+def binomial_hpdr_batch(n, N, pct, a=1, b=1, n_pbins=1e3, batch_size=4096):
+    """
+    Vectorized version of binomial_hpdr() for arrays of (n, N) pairs.
+
+    The posterior CDFs of a batch of pairs are evaluated at once with
+    betainc() on a (pairs x bins) grid; results are identical to calling
+    binomial_hpdr() for each pair.
+
+    Returns
+    -------
+    A tuple of arrays (mode, lower, upper)
+    """
+    n = numpy.asarray(n, dtype=numpy.float64).ravel()
+    N = numpy.asarray(N, dtype=numpy.float64).ravel()
+    n_pbins = int(n_pbins)
+    mode = numpy.empty(len(n)); lower = numpy.empty(len(n)); upper = numpy.empty(len(n))
+    n_sigma = numpy.ceil(norm.ppf( (1+pct)/2. ))+1
+    steps = numpy.arange(n_pbins+1, dtype=numpy.float64)
+    for i in range(0, len(n), batch_size):
+        j = min(i + batch_size, len(n))
+        pa = n[i:j] + a
+        pb = N[i:j] - n[i:j] + b
+        # mode and standard deviation of the posterior (as scipy.stats.beta)
+        pab = pa + pb
+        # NOTE: scalar pow() (as in binomial_hpdr()); array **0.5 uses sqrt(),
+        #       which may differ in the last bit
+        stdev = numpy.array([x**0.5 for x in (pa*pb / (pab**2 * (pab + 1))).tolist()])
+        m = (n[i:j]+a-1.)/(N[i:j]+a+b-2.)
+        max_p = numpy.minimum(m + n_sigma * stdev, 1.)
+        min_p = numpy.minimum(m - n_sigma * stdev, 1.)
+        # same grid as numpy.linspace()
+        p_range = steps[None, :] * ((max_p - min_p) / n_pbins)[:, None] + min_p[:, None]
+        p_range[:, -1] = max_p
+        # probability mass per bin (survival function for modes > 0.5)
+        x = numpy.clip(p_range, 0., 1.)
+        hi = m > 0.5
+        pmf = numpy.empty((j-i, n_pbins))
+        cdf = special.betainc(pa[~hi, None], pb[~hi, None], x[~hi])
+        pmf[~hi] = cdf[:, 1:] - cdf[:, :-1]
+        sf = special.betaincc(pa[hi, None], pb[hi, None], x[hi])
+        pmf[hi] = sf[:, :-1] - sf[:, 1:]
+        # bins with highest mass until pct is covered
+        sorted_idxs = numpy.argsort(pmf, axis=1)[:, ::-1]
+        cumsum = numpy.cumsum(numpy.sort(pmf, axis=1)[:, ::-1], axis=1)
+        k = numpy.argmin(numpy.abs(cumsum - pct), axis=1)
+        in_hpd = numpy.arange(n_pbins)[None, :] <= k[:, None]
+        idx_max = numpy.where(in_hpd, sorted_idxs, -1).max(axis=1)
+        idx_min = numpy.where(in_hpd, sorted_idxs, n_pbins).min(axis=1)
+        rows = numpy.arange(j-i)
+        mode[i:j] = m
+        lower[i:j] = p_range[rows, idx_min]
+        upper[i:j] = p_range[rows, idx_max+1]
+
+    return (mode, lower, upper)
+
+def cached_hpdr(n, N, pct, cache=HPDR_CACHE):
+    """
+    HPD intervals for arrays of (n, N) pairs (uniform prior), memoized on
+    (n, N, pct). Only pairs missing from the cache are computed (batched).
+
+    Returns
+    -------
+    A tuple of arrays (mode, lower, upper) with the shape of n
+    """
+    n = numpy.asarray(n, dtype=numpy.int64)
+    N = numpy.asarray(N, dtype=numpy.int64)
+    pairs, inv = numpy.unique(numpy.stack([n.ravel(), N.ravel()], axis=1), axis=0, return_inverse=True)
+    keys = [(x, y, pct) for x, y in pairs.tolist()]
+    todo = [i for i, key in enumerate(keys) if key not in cache]
+    if len(todo) > 0:
+        res = binomial_hpdr_batch(pairs[todo, 0], pairs[todo, 1], pct)
+        for i, mode, lower, upper in zip(todo, *[x.tolist() for x in res]):
+            cache[keys[i]] = (mode, lower, upper)
+    vals = numpy.array([cache[key] for key in keys]).reshape(-1, 3)[inv.ravel()]
+
+    return tuple(vals[:, c].reshape(n.shape) for c in range(3))
+
+def load_table(fn, cache=HPDR_CACHE):
+    """Load HPD intervals from lookup table (.npy) into cache (if file exists)."""
+    if not os.path.exists(fn):
+        return
+    for n, N, pct, mode, lower, upper in numpy.load(fn).tolist():
+        cache[(int(n), int(N), pct)] = (mode, lower, upper)
+
+def save_table(fn, cache=HPDR_CACHE):
+    """Save cached HPD intervals as lookup table (.npy)."""
+    tbl = numpy.array([key + val for key, val in cache.items()], dtype=numpy.float64).reshape(-1, 6)
+    with open(fn, 'wb') as f:
+        numpy.save(f, tbl)
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) != 4:
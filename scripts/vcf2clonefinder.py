@@ -3,16 +3,22 @@
 # coding: utf-8
 #------------------------------------------------------------------------------
 # Convert infos from multi-sample VCF file to CloneFinder input file.
+#
+# For samples which do not carry the mutation, the REF count is reported as
+# the mean depth of that sample. The mean depth is calculated in a first pass
+# over the VCF, variants are then streamed in a second pass (constant memory).
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-11-09
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
 import os, sys
 import argparse
-import vcf
+import numpy as np
+import vcf_columnar
+import allele_counts
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Create CloneFinder input file from VCF.')
@@ -21,99 +27,58 @@ def parse_args():
   #parser.add_argument('--bed', type=argparse.FileType(), help='BED file with allele-specific copy number.')
   parser.add_argument('--normal', help='Normal sample id. (default: assume VAF=0.0 for Normal)')
   parser.add_argument('--nofilt', action='store_true', help='Disable filtering; otherwise only "PASS" variants are output (default: off).')
+  parser.add_argument('--region', help='Only convert records in region (CHROM[:BEG[-END]]).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of worker processes to parse VCF (requires bgzipped and indexed VCF; default: 1).')
 
   args = parser.parse_args()
   return args
 
-def parse_vcf_record(rec, lbl_samples):
-  '''
-  Parse a multi-sample VCF record.
-  Determine major ALT allele and calculate VAF for each sample.
-  
-  OUTPUT: 
-    list with the following elements:
-      CHROM_POS REF ALT (S1:ref, S1:alt) [(S2:ref, S2:alt) [...]]
-    empty list if no consensus var.
+def format_header(samples):
+  '''Header line.'''
+  hdr = "#SNVID Wild Mut".split()
+  for id_sample in samples:
+    hdr += ['{}:ref'.format(id_sample), '{}:alt'.format(id_sample)]
+
+  return '\t'.join(hdr) + '\n'
+
+def format_lines(var, smp_mean_dp):
   '''
-  out = []
-  # reorder samples
-  idx_smp = [rec._sample_indexes[x] for x in lbl_samples]
-  samples = [rec.samples[i] for i in idx_smp if i < len(rec.samples)]
-  # determine major ALT allele
-  base_cnt = {str(b): 0 for b in rec.ALT}
-  #for call in samples:
-  for i in idx_smp:
-    if i >= len(rec.samples):
-      continue
-    rc = getattr(rec.samples[i].data, 'AD') if hasattr(rec.samples[i].data, 'AD') else None
-    if rc is None:
-      continue
-    for i in range(len(rec.ALT)):
-      base_cnt[str(rec.ALT[i])] += int(rc[i+1] or 0)
-  major_allele = max(base_cnt, key=base_cnt.get)
+  Format a chunk of variants (see allele_counts.variant_chunk()).
 
-  # get major allele count for each sample
-  idx_maj = rec.ALT.index(major_allele)
-  rc = [None] * len(idx_smp)
-  dp = [None] * len(idx_smp)
-  for i in idx_smp:
-    if i < len(rec.samples):
-      cdata = rec.samples[i].data
-      ad = getattr(cdata, 'AD') if hasattr(cdata, 'AD') else None
-      if ad:
-        rc[i] = ad[idx_maj+1]
-      dp[i] = getattr(cdata, 'DP')
-      
-  # compile REF/ALT counts
-  alt = [  x if x else 0 for   x in rc]
-  ref = [d-a if d else 0 for a,d in zip(alt, dp)]
+  OUTPUT:
+    list of lines with the following columns for each record:
+      CHROM_POS REF ALT S1:ref S1:alt [S2:ref S2:alt [...]]
+    (if locus is absent, mean sample depth is used as REF count)
+  '''
+  ref, alt = var['ref'], var['alt']
+  ref = np.where(ref + alt == 0, np.asarray(smp_mean_dp, dtype=np.int64), ref).tolist()
+  alt = alt.tolist()
+  lines = []
+  for k, id_var in enumerate(allele_counts.variant_ids(var)):
+    rc = '\t'.join('{}\t{}'.format(r, a) for r, a in zip(ref[k], alt[k]))
+    lines.append('{}\t{}\t{}\t{}\n'.format(id_var, var['REF'][k], var['allele'][k], rc))
 
-  desc = rec.ID if rec.ID else '.'
-  id_var = '{}_{}'.format(rec.CHROM, str(rec.POS)) 
-  out = [id_var, rec.REF, major_allele] + [(r, a) for r,a in zip(ref, alt)]
-  return out
+  return lines
 
 def main(args):
 
   # get samples from input VCF
-  rdr = vcf.Reader(filename=args.vcf.name)
-  samples = rdr.samples
+  samples = vcf_columnar.read_header(args.vcf.name)['samples']
   # make sure normal sample is first in list
   if args.normal:
     assert args.normal in samples
     samples = [args.normal] + [x for x in samples if x != args.normal]
 
-  # parse variants
-  var_data = []
-  smp_dp   = [0] * len(samples) # cumulative depth for each sample
-  smp_nloc = [0] * len(samples) # number of loci for each sample
-  for rec in rdr:
-    vdat = parse_vcf_record(rec, samples)
-    var_data.append(vdat)
-    for i in range(len(samples)):
-      dp = sum(vdat[3+i])
-      if dp > 0:
-        smp_dp[i] += dp
-        smp_nloc[i] += 1
-  # calculate mean depth for each sample
-  smp_mean_dp = [round(dp/n) if n>0 else 0 for dp,n in zip(smp_dp, smp_nloc)]
+  # 1st pass: mean depth of each sample (only DP is parsed)
+  smp_mean_dp = vcf_columnar.mean_depth(args.vcf.name, samples, min_depth=1, region=args.region, threads=args.threads)
 
   # write header
   fh_out = args.out
-  hdr = "#SNVID Wild Mut".split()
-  for id_sample in samples:
-    hdr += ['{}:ref'.format(id_sample), '{}:alt'.format(id_sample)]
-  fh_out.write('\t'.join(hdr) + '\n')
+  fh_out.write(format_header(samples))
 
-  # write variants
-  for vdat in var_data:
-    line = '\t'.join(vdat[:3])
-    for i in range(len(samples)):
-      ref, alt = vdat[3+i]
-      if ref + alt == 0: # if locus is absent use mean sample depth as REF count
-        ref = smp_mean_dp[i]
-      line += '\t{}\t{}'.format(ref, alt)
-    fh_out.write(line + '\n')
+  # 2nd pass: parse and write variants chunk by chunk
+  for chunk in vcf_columnar.iter_chunks(args.vcf.name, ['AD', 'DP'], samples, region=args.region, threads=args.threads):
+    fh_out.write(''.join(format_lines(allele_counts.variant_chunk(chunk), smp_mean_dp)))
 
 if __name__ == '__main__':
   args = parse_args()
@@ -6,14 +6,16 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-04-21
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
 import os, sys
 import argparse
 #import csv
-import vcf
+import numpy as np
+import vcf_columnar
+import allele_counts
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Create PyClone YAML input file from VCF and copy-number BED.')
@@ -22,67 +24,46 @@ def parse_args():
   #parser.add_argument('--bed', type=argparse.FileType(), help='BED file with allele-specific copy number.')
   parser.add_argument('--normal', help='Normal sample id. (default: assume VAF=0.0 for Normal)')
   parser.add_argument('--nofilt', action='store_true', help='Disable filtering; otherwise only "PASS" variants are output (default: off).')
+  parser.add_argument('--region', help='Only convert records in region (CHROM[:BEG[-END]]).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of worker processes to parse VCF (requires bgzipped and indexed VCF; default: 1).')
 
   args = parser.parse_args()
   return args
 
-def parse_vcf_record(rec, lbl_samples, add_normal):
-  '''
-  Parse a multi-sample VCF record.
-  Determine major ALT allele and calculate VAF for each sample.
-  
-  OUTPUT: 
-    list with the following columns:
-      #chr position description Normal
-    empty list if no consensus var.
+def format_header(samples, add_normal):
+  '''Header line.'''
+  hdr = "#chr position description Normal".split()
+  if add_normal:
+    hdr += samples
+  else:
+    hdr += samples[1:]
+
+  return '\t'.join(hdr) + '\n'
+
+def format_lines(var, add_normal):
   '''
-  out = []
-  # reorder samples
-  idx_smp = [rec._sample_indexes[x] for x in lbl_samples]
-  samples = [rec.samples[i] for i in idx_smp if i < len(rec.samples)]
-  # determine major ALT allele
-  base_cnt = {str(b): 0 for b in rec.ALT}
-  #for call in samples:
-  for i in idx_smp:
-    if i >= len(rec.samples):
-      continue
-    rc = getattr(rec.samples[i].data, 'AD') if hasattr(rec.samples[i].data, 'AD') else None
-    if rc is None:
-      continue
-    for i in range(len(rec.ALT)):
-      base_cnt[str(rec.ALT[i])] += int(rc[i+1] or 0)
-  major_allele = max(base_cnt, key=base_cnt.get)
+  Format a chunk of variants (see allele_counts.variant_chunk()).
 
-  # get major allele count for each sample
-  idx_maj = rec.ALT.index(major_allele)
-  rc = [None] * len(idx_smp)
-  dp = [None] * len(idx_smp)
-  for i in idx_smp:
-    if i < len(rec.samples):
-      cdata = rec.samples[i].data
-      ad = getattr(cdata, 'AD') if hasattr(cdata, 'AD') else None
-      if ad:
-        rc[i] = ad[idx_maj+1]
-      dp[i] = getattr(cdata, 'DP')
-      
-  #rc = [getattr(c.data, 'AD')[idx_maj+1] if getattr(c.data, 'AD') else None for c in samples]
-  # get depth for each sample
-  #dp = [getattr(c.data, 'DP') for c in samples]
-  # calculate VAFs
-  vaf = [float(a)/float(d) if (a and d) else 0.0 for a, d in zip(rc, dp)]
+  OUTPUT:
+    list of lines with the following columns for each record:
+      #chr position description Normal [S1 [...]]
+  '''
+  vaf = var['vaf']
   if add_normal:
-    vaf = [0.0] + vaf
+    vaf = np.hstack([np.zeros((vaf.shape[0], 1)), vaf])
+  vaf = vaf.tolist()
 
-  desc = rec.ID if rec.ID else '.' 
-  #desc = '{}/{}'.format(rec.REF, major_allele)
-  out = [rec.CHROM, str(rec.POS), desc] + ['{:.4f}'.format(x) for x in vaf]
-  return out
+  lines = []
+  for k, pos in enumerate(var['POS']):
+    vals = [var['CHROM'][k], str(pos), var['ID'][k]] + ['{:.4f}'.format(x) for x in vaf[k]]
+    lines.append('\t'.join(vals) + '\n')
+
+  return lines
 
 def main(args):
 
   # get samples from input VCF
-  rdr = vcf.Reader(filename=args.vcf.name)
-  samples = rdr.samples
+  samples = vcf_columnar.read_header(args.vcf.name)['samples']
   do_add_normal = (args.normal is None)
   assert do_add_normal or args.normal in samples
   # make sure normal sample is first in list
@@ -91,18 +72,11 @@ def main(args):
 
   # construct header
   fh_out = args.out
-  hdr = "#chr position description Normal".split()
-  if do_add_normal:
-    hdr += samples
-  else:
-    hdr += samples[1:]
-  fh_out.write('\t'.join(hdr) + '\n')
+  fh_out.write(format_header(samples, do_add_normal))
 
   # parse variants
-  for rec in rdr:
-    var_data = parse_vcf_record(rec, samples, do_add_normal)
-    if True: #len(var_line) == len(hdr):
-      fh_out.write('\t'.join(var_data) + '\n')
+  for chunk in vcf_columnar.iter_chunks(args.vcf.name, ['AD', 'DP'], samples, region=args.region, threads=args.threads):
+    fh_out.write(''.join(format_lines(allele_counts.variant_chunk(chunk), do_add_normal)))
 
 if __name__ == '__main__':
   args = parse_args()
@@ -6,71 +6,58 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-08-24
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
 import os, sys
 import argparse
 #import csv
-import vcf
+import numpy as np
+import vcf_columnar
+import allele_counts
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Create PyClone YAML input file from VCF and copy-number BED.')
   parser.add_argument('--vcf', required=True, type=argparse.FileType(), help='Multi-sample VCF file with somatic mutations and read counts. (required FORMAT fields: "AD", "DP"')
   parser.add_argument('--out', required=True, type=argparse.FileType('wt'), help='Output TSV file.')
   parser.add_argument('--normal', help='Normal sample id. (default: assume VAF=0.0 for Normal)')
+  parser.add_argument('--region', help='Only convert records in region (CHROM[:BEG[-END]]).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of worker processes to parse VCF (requires bgzipped and indexed VCF; default: 1).')
 
   args = parser.parse_args()
   return args
 
-def parse_vcf_record(rec, lbl_samples, add_normal):
+def format_header():
+  '''Header line.'''
+  return '\t'.join("id gene a d mu_r mu_v".split()) + '\n'
+
+def format_lines(var, smp_mean_dp, idx_var=0):
   '''
-  Parse a multi-sample VCF record.
-  Determine major ALT allele and calculate VAF for each sample.
-  
-  OUTPUT: 
-    list with the following columns:
-      #chr position (alt_count1, tot_count1), ...
-    empty list if no consensus var.
+  Format a chunk of variants (see allele_counts.variant_chunk()).
+  Tumor samples only (first sample: Normal).
+
+  OUTPUT:
+    list of lines with the following columns for each record:
+      id gene a d mu_r mu_v
+    (if locus is absent, mean sample depth is used as total count;
+    variant ids are numbered from idx_var)
   '''
-  out = []
-  # reorder samples
-  idx_smp = [rec._sample_indexes[x] for x in lbl_samples]
-  samples = [rec.samples[i] for i in idx_smp if i < len(rec.samples)]
-  # determine major ALT allele
-  base_cnt = {str(b): 0 for b in rec.ALT}
-  #for call in samples:
-  for i in idx_smp:
-    if i >= len(rec.samples):
-      continue
-    rc = getattr(rec.samples[i].data, 'AD') if hasattr(rec.samples[i].data, 'AD') else None
-    if rc is None:
-      continue
-    for i in range(len(rec.ALT)):
-      base_cnt[str(rec.ALT[i])] += int(rc[i+1] or 0)
-  major_allele = max(base_cnt, key=base_cnt.get)
+  alt = var['alt'][:, 1:].tolist()
+  depth = var['depth'][:, 1:]
+  tot = np.where(depth > 0, depth, np.asarray(smp_mean_dp[1:], dtype=np.int64)).tolist()
+
+  lines = []
+  for k, id_gene in enumerate(allele_counts.variant_ids(var)):
+    out_data = ['s{}'.format(idx_var + k), id_gene, ','.join(map(str, alt[k])), ','.join(map(str, tot[k])), '0.999', '0.499']
+    lines.append('\t'.join(out_data) + '\n')
 
-  # get major allele count for each sample
-  idx_maj = rec.ALT.index(major_allele)
-  rc = [None] * len(idx_smp)
-  dp = [None] * len(idx_smp)
-  for i in idx_smp:
-    if i < len(rec.samples):
-      cdata = rec.samples[i].data
-      ad = getattr(cdata, 'AD') if hasattr(cdata, 'AD') else None
-      if ad:
-        rc[i] = ad[idx_maj+1]
-      dp[i] = getattr(cdata, 'DP')
-      
-  out = [rec.CHROM, str(rec.POS)] + [(rc[i], dp[i]) for i in idx_smp]
-  return out
+  return lines
 
 def main(args):
 
   # get samples from input VCF
-  rdr = vcf.Reader(filename=args.vcf.name)
-  samples = rdr.samples
+  samples = vcf_columnar.read_header(args.vcf.name)['samples']
   do_add_normal = (args.normal is None)
   assert do_add_normal or args.normal in samples
   # make sure normal sample is first in list
@@ -78,37 +65,20 @@ def main(args):
     samples = [args.normal] + [x for x in samples if x != args.normal]
 
   # parse variants
-  var_data = []
-  smp_dp   = [0] * len(samples) # store cumulative depth per sample
-  smp_nvar = [0] * len(samples) # store number of variants per sample
-  for rec in rdr:
-    vdat = parse_vcf_record(rec, samples, do_add_normal)
-    var_data.append(vdat)
-    for i in range(len(samples)):
-      dp = vdat[2+i][1]
-      if not dp is None:
-        smp_dp[i] += dp
-        smp_nvar[i] += 1
+  variants = [allele_counts.variant_chunk(chunk) for chunk in
+    vcf_columnar.iter_chunks(args.vcf.name, ['AD', 'DP'], samples, region=args.region, threads=args.threads)]
   # calculate mean depth per sample
-  smp_mean_dp = [round(dp/nvar) if nvar>0 else 0 for dp, nvar in zip(smp_dp, smp_nvar)]
+  smp_mean_dp = allele_counts.mean_depth(variants, len(samples))
 
   # construct header
   fh_out = args.out
-  hdr = "id gene a d mu_r mu_v".split()
-  fh_out.write('\t'.join(hdr) + '\n')
+  fh_out.write(format_header())
 
   # write output vars
   idx_var = 0
-  for vdat in var_data:
-    if True: #len(var_line) == len(hdr):
-      id_mut = 's{}'.format(idx_var)
-      id_gene = '{}_{}'.format(vdat[0], vdat[1])
-      alt = ','.join([str(a) if a else '0' for a, d in vdat[2:]][1:])
-      tot = ','.join([str(a_d[1]) if a_d[1] else str(smp_mean_dp[i]) for i,a_d in enumerate(vdat[2:])][1:])
-      out_data = [id_mut, id_gene, alt, tot, '0.999', '0.499']
-      fh_out.write('\t'.join(out_data) + '\n')
-      idx_var += 1
-  
+  for var in variants:
+    fh_out.write(''.join(format_lines(var, smp_mean_dp, idx_var)))
+    idx_var += len(var['POS'])
 
 if __name__ == '__main__':
   args = parse_args()
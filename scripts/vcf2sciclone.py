@@ -6,80 +6,76 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-08-22
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import division, print_function
 import os, sys
 import argparse
-import vcf
+import numpy as np
+import vcf_columnar
+from vcf_columnar import MISSING
+import allele_counts
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Create SciClone CSV input files from VCF.')
   parser.add_argument('--vcf', required=True, type=argparse.FileType(), help='Multi-sample VCF file with somatic mutations and read counts. (required FORMAT fields: "AD", "DP"')
   parser.add_argument('--outdir', required=True, help='Output directory.')
   parser.add_argument('--normal', help='Normal sample id. (default: assume VAF=0.0 for Normal)')
+  parser.add_argument('--region', help='Only convert records in region (CHROM[:BEG[-END]]).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of worker processes to parse VCF (requires bgzipped and indexed VCF; default: 1).')
 
   args = parser.parse_args()
   return args
 
-def parse_vcf_record(rec, lbl_samples, add_normal):
+def add_fake_normal(var):
   '''
-  Parse a multi-sample VCF record.
-  Determine major ALT allele and calculate VAF for each sample.
-  
-  OUTPUT: 
-    list with the following columns:
-      #chr position description Normal
-    empty list if no consensus var.
+  Prepend a Normal sample without reads (VAF=0.0) to a chunk of variants
+  (see allele_counts.variant_chunk()).
   '''
-  out = []
-  # reorder samples
-  idx_smp = [rec._sample_indexes[x] for x in lbl_samples]
-  samples = [rec.samples[i] for i in idx_smp if i < len(rec.samples)]
-  # determine major ALT allele
-  base_cnt = {str(b): 0 for b in rec.ALT}
-  #for call in samples:
-  for i in idx_smp:
-    if i >= len(rec.samples):
-      continue
-    rc = getattr(rec.samples[i].data, 'AD') if hasattr(rec.samples[i].data, 'AD') else None
-    if rc is None:
-      continue
-    for i in range(len(rec.ALT)):
-      base_cnt[str(rec.ALT[i])] += int(rc[i+1] or 0)
-  major_allele = max(base_cnt, key=base_cnt.get)
-
-  # get major allele count for each sample
-  idx_maj = rec.ALT.index(major_allele)
-  rc = [None] * len(idx_smp)
-  dp = [None] * len(idx_smp)
-  for i in idx_smp:
-    if i < len(rec.samples):
-      cdata = rec.samples[i].data
-      ad = getattr(cdata, 'AD') if hasattr(cdata, 'AD') else None
-      if ad:
-        rc[i] = ad[idx_maj+1]
-      dp[i] = getattr(cdata, 'DP')
-      
-  #rc = [getattr(c.data, 'AD')[idx_maj+1] if getattr(c.data, 'AD') else None for c in samples]
-  # get depth for each sample
-  #dp = [getattr(c.data, 'DP') for c in samples]
-  # calculate VAFs
-  vaf = [float(a)/float(d) if (a and d) else 0.0 for a, d in zip(rc, dp)]
-  if add_normal:
-    vaf = [0.0] + vaf
-
-  desc = rec.ID if rec.ID else '.' 
-  #desc = '{}/{}'.format(rec.REF, major_allele)
-  out = [rec.CHROM, str(rec.POS), desc] + [(rc[i], dp[i], x) for i, x in enumerate(vaf)]
-  return out
+  var = dict(var)
+  n = len(var['POS'])
+  var['alt'] = np.hstack([np.zeros((n, 1), dtype=var['alt'].dtype), var['alt']])
+  var['depth'] = np.hstack([np.full((n, 1), MISSING, dtype=var['depth'].dtype), var['depth']])
+  var['vaf'] = np.hstack([np.zeros((n, 1)), var['vaf']])
+
+  return var
+
+def mean_tumor_depth(variants, n_samples):
+  '''Rounded mean read depth over all tumor samples (first sample: Normal).'''
+  sum_dp, num_loc = allele_counts.depth_sums(variants)
+
+  return round(sum_dp[1:n_samples].sum() / num_loc[1:n_samples].sum())
+
+def format_header():
+  '''Header line.'''
+  return ','.join("chr pos refCount varCount VAF".split()) + '\n'
+
+def format_lines(var, mean_dp, n_samples):
+  '''
+  Format a chunk of variants (see allele_counts.variant_chunk()).
+
+  OUTPUT:
+    list of lines for each tumor sample with the following columns:
+      chr pos refCount varCount VAF
+    (if variant is not present in a sample, mean depth is used as total count)
+  '''
+  # if variant is not present in a sample, fill in mean depth
+  present = var['depth'] != MISSING
+  tot = np.where(present, var['depth'], mean_dp)
+  alt = np.where(present, var['alt'], 0)
+  ref = (tot - alt).tolist()
+  alt = alt.tolist()
+  vaf = (var['vaf'] * 100).tolist()
+  pos = [str(x) for x in var['POS']]
+
+  return [['{},{},{},{},{:.4f}\n'.format(var['CHROM'][k], pos[k], ref[k][i], alt[k][i], vaf[k][i]) for k in range(len(pos))]
+    for i in range(1, n_samples)]
 
 def main(args):
 
   # get samples from input VCF
-  rdr = vcf.Reader(filename=args.vcf.name)
-  samples = rdr.samples
+  samples = vcf_columnar.read_header(args.vcf.name)['samples']
   do_add_normal = (args.normal is None)
   assert do_add_normal or args.normal in samples
   # make sure normal sample is first in list
@@ -87,36 +83,25 @@ def main(args):
     samples = [args.normal] + [x for x in samples if x != args.normal]
 
   # parse variants
-  num_loc = 0
-  sum_depth = 0
-  sample_data = {x: [] for x in samples[1:]}
-  for rec in rdr:
-    var_data = parse_vcf_record(rec, samples, do_add_normal)
-    chrom = var_data[0]
-    pos = var_data[1]
-    for i in range(1, len(samples)):
-      alt, tot, vaf = var_data[3+i]
-      if not tot is None:
-        num_loc += 1
-        sum_depth += tot
-      var_dat = (chrom, pos, alt, tot, vaf)
-      sample_data[samples[i]].append(var_dat)
-  mean_depth = round(sum_depth / num_loc)  
-
-  # output header
-  hdr = "chr pos refCount varCount VAF".split()
+  variants = []
+  for chunk in vcf_columnar.iter_chunks(args.vcf.name, ['AD', 'DP'], samples, region=args.region, threads=args.threads):
+    var = allele_counts.variant_chunk(chunk)
+    if do_add_normal:
+      var = add_fake_normal(var)
+    variants.append(var)
+  mean_depth = mean_tumor_depth(variants, len(samples))
+
   # write one output file for each sample
-  for id_smp in sorted(sample_data.keys()):
+  fhs = {}
+  for id_smp in sorted(samples[1:]):
     fn_out = os.path.join(args.outdir, '{}.vaf.csv'.format(id_smp))
-    with open(fn_out, 'wt') as f:
-      f.write(','.join(hdr) + '\n')
-      for var_dat in sample_data[id_smp]:
-        chrom, pos, alt, tot, vaf = var_dat
-        if tot is None: # if variant is not present in this sample, fill in mean depth
-          tot = mean_depth
-          alt = 0
-        out_dat = (chrom, pos, str(tot-alt), str(alt), '{:.4f}'.format(vaf*100))
-        f.write(','.join(out_dat) + '\n')
+    fhs[id_smp] = open(fn_out, 'wt')
+    fhs[id_smp].write(format_header())
+  for var in variants:
+    for id_smp, lines in zip(samples[1:], format_lines(var, mean_depth, len(samples))):
+      fhs[id_smp].write(''.join(lines))
+  for fh in fhs.values():
+    fh.close()
 
 if __name__ == '__main__':
   args = parse_args()
@@ -6,13 +6,15 @@
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-08-16
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
 import os, sys
 import argparse
-import vcf
+import numpy as np
+import vcf_columnar
+import allele_counts
 import spruce_convert
 
 out_hdr = '#id_sample lbl_sample id_mut lbl_mut vaf_lb vaf_mean vaf_ub x y mu'
@@ -22,95 +24,92 @@ def parse_args():
   parser.add_argument('--vcf', required=True, type=argparse.FileType(), help='Multi-sample VCF file with somatic mutations and read counts. (required FORMAT fields: "AD", "DP"')
   parser.add_argument('--out', required=True, type=argparse.FileType('wt'), help='Output TSV file.')
   parser.add_argument('--normal', help='Normal sample id. (Will be ignored if present)')
+  parser.add_argument('--hpd-table', help='Lookup table of HPD intervals (.npy; created/extended if missing entries).')
+  parser.add_argument('--region', help='Only convert records in region (CHROM[:BEG[-END]]).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of worker processes to parse VCF (requires bgzipped and indexed VCF; default: 1).')
 
   args = parser.parse_args()
   return args
 
-def parse_vcf_record(rec, lbl_samples):
+def is_mutated(var):
+  '''Sites with ALT reads in at least one tumor sample (Normal sample first; see allele_counts.variant_chunk()).'''
+  return var['alt'][:, 1:].sum(axis=1) > 0
+
+def format_header(samples, n_mut):
+  '''Header lines (samples: Normal sample first).'''
+  hdr  = '{} # number of samples\n'.format(len(samples)-1)
+  hdr += '{} # number of SNVs\n'.format(n_mut)
+  hdr += '\t'.join(out_hdr.split()) + '\n'
+
+  return hdr
+
+def format_lines(ids, samples, hpd, idx_mut=0):
   '''
-  Parse a multi-sample VCF record.
-  Determine major ALT allele and calculate VAF for each sample.
-  
-  OUTPUT: 
-    list with the following elements:
-      CHROM_POS REF ALT (S1:ref, S1:alt) [(S2:ref, S2:alt) [...]]
-    empty list if no consensus var.
+  Output lines for mutations.
+
+  Parameters:
+    ids     : mutation labels (CHROM_POS)
+    samples : sample ids (Normal sample first)
+    hpd     : HPD intervals (mutations x tumor samples x (mode, lower, upper))
+    idx_mut : index of first mutation
   '''
-  out = []
-  # reorder samples
-  idx_smp = [rec._sample_indexes[x] for x in lbl_samples]
-  samples = [rec.samples[i] for i in idx_smp if i < len(rec.samples)]
-  # determine major ALT allele
-  base_cnt = {str(b): 0 for b in rec.ALT}
-  #for call in samples:
-  for i in idx_smp:
-    if i >= len(rec.samples):
-      continue
-    rc = getattr(rec.samples[i].data, 'AD') if hasattr(rec.samples[i].data, 'AD') else None
-    if rc is None:
-      continue
-    for i in range(len(rec.ALT)):
-      base_cnt[str(rec.ALT[i])] += int(rc[i+1] or 0)
-  major_allele = max(base_cnt, key=base_cnt.get)
-
-  # get major allele count for each sample
-  idx_maj = rec.ALT.index(major_allele)
-  rc = [None] * len(idx_smp)
-  dp = [None] * len(idx_smp)
-  for i in idx_smp:
-    if i < len(rec.samples):
-      cdata = rec.samples[i].data
-      ad = getattr(cdata, 'AD') if hasattr(cdata, 'AD') else None
-      if ad:
-        rc[i] = ad[idx_maj+1]
-      dp[i] = getattr(cdata, 'DP')
-
-  # compile REF/ALT counts
-  alt = [  x if x else 0 for   x in rc]
-  ref = [d-a if d else 0 for a,d in zip(alt, dp)]
-
-  id_var = '{}_{}'.format(rec.CHROM, str(rec.POS))
-  out = [id_var] + [(r, a) for r,a in zip(ref, alt)]
-  return out
+  lines = []
+  for i, id_mut in enumerate(ids, idx_mut):
+    for j in range(len(samples)-1):
+      mode, lb, ub = hpd[i-idx_mut][j]
+      out  = '{}\t{}'.format(j, samples[j+1])
+      out += '\t{}\t{}'.format(i, id_mut)
+      out += '\t{:.4f}\t{:.4f}\t{:.4f}'.format(lb, mode, ub)
+      # CN1, CN2, prev
+      out += '\t{}\t{}\t{}'.format(1, 1, 1)
+      lines.append(out + '\n')
+
+  return lines
+
+def hpd_intervals(alt, tot, fn_table=None, pct=0.999):
+  '''
+  HPD intervals (mode, lower, upper) of VAF for read counts (sites x samples;
+  0 where there are no reads). Intervals are looked up in/added to table.
+  '''
+  if fn_table:
+    spruce_convert.load_table(fn_table)
+  n_cached = len(spruce_convert.HPDR_CACHE)
+  has_rc = tot > 0
+  res = np.zeros(alt.shape + (3,))
+  for c, x in enumerate(spruce_convert.cached_hpdr(alt[has_rc], tot[has_rc], pct)):
+    res[has_rc, c] = x
+  if fn_table and len(spruce_convert.HPDR_CACHE) > n_cached:
+    spruce_convert.save_table(fn_table)
+
+  return res.tolist()
 
 def main(args):
   # get samples from input VCF
-  rdr = vcf.Reader(filename=args.vcf.name)
-  samples = rdr.samples
+  samples = vcf_columnar.read_header(args.vcf.name)['samples']
   assert args.normal in samples
   # make sure normal sample is first in list
   if args.normal:
     samples = [args.normal] + [x for x in samples if x != args.normal]
 
   # parse variants
-  mut_rc = [] # [id_mut, (ref_RN, alt_RN), (ref_R1, alt_R1), ...]
-  for rec in rdr:
-    rc_data = parse_vcf_record(rec, samples)
+  ids, rc_alt, rc_tot = [], [], []
+  for chunk in vcf_columnar.iter_chunks(args.vcf.name, ['AD', 'DP'], samples, region=args.region, threads=args.threads):
+    var = allele_counts.variant_chunk(chunk)
     # make sure that mutation is present in at least one sample
-    rc_alt = sum([a for r,a in rc_data[2:]])
-    if rc_alt > 0:
-      mut_rc.append(rc_data)
+    mut = is_mutated(var)
+    ids += [x for x, m in zip(allele_counts.variant_ids(var), mut.tolist()) if m]
+    rc_alt.append(var['alt'][mut, 1:])
+    rc_tot.append(var['alt'][mut, 1:] + var['ref'][mut, 1:])
 
-  # construct header
   fh_out = args.out
-  hdr  = '{} # number of samples\n'.format(len(samples)-1)
-  hdr += '{} # number of SNVs\n'.format(len(mut_rc))
-  hdr += '\t'.join(out_hdr.split()) + '\n'
-  fh_out.write(hdr)
-  # write variants
-  for i, mut in enumerate(mut_rc):
-    for j in range(len(samples)-1):
-      rc_ref, rc_alt = mut[j+2]
-      # calculate limits of confidence interval (highest posterior density region)
-      mode = 0; lb = 0; ub = 0
-      if rc_alt+rc_ref > 0:
-        mode, lb, ub = spruce_convert.binomial_hpdr(rc_alt, rc_alt+rc_ref, 0.999)
-      out  = '{}\t{}'.format(j, samples[j+1])
-      out += '\t{}\t{}'.format(i, mut[0])
-      out += '\t{:.4f}\t{:.4f}\t{:.4f}'.format(lb, mode, ub)
-      # CN1, CN2, prev
-      out += '\t{}\t{}\t{}'.format(1, 1, 1)
-      fh_out.write(out + '\n')
+  fh_out.write(format_header(samples, len(ids)))
+  # calculate limits of confidence interval (highest posterior density region)
+  # for all mutations and samples at once
+  shape = (0, len(samples)-1)
+  alt = np.concatenate(rc_alt) if rc_alt else np.zeros(shape, dtype=np.int64)
+  tot = np.concatenate(rc_tot) if rc_tot else np.zeros(shape, dtype=np.int64)
+  hpd = hpd_intervals(alt, tot, args.hpd_table)
+  fh_out.write(''.join(format_lines(ids, samples, hpd)))
 
 if __name__ == '__main__':
   args = parse_args()
@@ -3,17 +3,22 @@
 # coding: utf-8
 #------------------------------------------------------------------------------
 # Convert VCF to PyClone/MuClone YAML input.
+#
+# Only "PASS" records are parsed (filter is evaluated on the raw FILTER
+# column, see vcf_filter.py). Mutations are streamed to the output as YAML
+# events (see pyclone_yaml.py).
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-04-11
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
 import os, sys
 import argparse
-import vcf
-import yaml
+import pyclone_yaml
+import vcf_columnar
+import vcf_filter
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Create PyClone YAML input file from VCF and copy-number BED.')
@@ -28,58 +33,65 @@ def parse_args():
   return args
 
 
-def get_sample_idx(lbl_sample, vcf_reader):
+def get_sample_idx(lbl_sample, hdr):
   '''Determine index of sample by label.'''
   idx_sample = 0
   if lbl_sample:
-    if lbl_sample not in vcf_reader.samples:
-      print('[WARN] sample {} not present in VCF file. Attempting to guess tumor sample from header.'.format(sample))
+    if lbl_sample not in hdr['samples']:
+      print('[WARN] sample {} not present in VCF file. Attempting to guess tumor sample from header.'.format(lbl_sample))
       lbl_sample = None
   # attempt to determine tumor sample from VCF header
-  if not lbl_sample and 'tumor_sample' in vcf_reader.metadata:
-    lbl_sample = vcf_reader.metadata['tumor_sample'][0]
-  if lbl_sample in vcf_reader.samples:
-    idx_sample = vcf_reader.samples.index(lbl_sample)
+  tumor = [x.split('=', 1)[1] for x in hdr['meta'] if x.startswith('##tumor_sample=')]
+  if not lbl_sample and len(tumor) > 0:
+    lbl_sample = tumor[0]
+  if lbl_sample in hdr['samples']:
+    idx_sample = hdr['samples'].index(lbl_sample)
   
   return idx_sample
   
+def info_counts(info, n_alt):
+  '''Read counts (DP, AC per ALT allele) from raw INFO column.'''
+  fields = dict(x.partition('=')[::2] for x in info.split(';'))
+  ac = [int(x) for x in fields['AC'].split(',')]
 
-def main(fh_output, fh_vcf, fh_bed, use_info, sample=None, nofilt=False):
-  '''Extract filter-passing biallelic SNVs from VCF file.'''
-  muts = []
-  rdr = vcf.Reader(filename=fh_vcf.name)
+  return [(int(fields['DP']), ac[i]) for i in range(n_alt)]
+
+# genotype states (g_n, g_r, g_v) assigned to each mutation
+#STATES = (('AA', 'AA', 'AB'), ('AA', 'AA', 'BB'))
+STATES = (('AA', 'AA', 'AB'),)
+
+def iter_mutations(fh_vcf, use_info, sample=None, nofilt=False):
+  '''Extract filter-passing biallelic SNVs from VCF file, yield (id, ref_counts, var_counts, states).'''
+  hdr = vcf_columnar.read_header(fh_vcf.name)
+  # PASS filter is applied to raw lines (rejected records are not parsed)
+  filt = vcf_filter.RecordFilter(include=[] if nofilt else ['FILTER=PASS'])
   
   if use_info:
     print('[INFO] exporting read counts from "INFO" field.')
+    samples = []
   else:
-    idx_sample = get_sample_idx(sample, rdr)
-    print('[INFO] exporting read counts for sample "{}".'.format(rdr.samples[idx_sample]))  
-  import pdb; pdb.set_trace()
-  for rec in rdr:
-    # check filtering criteria
-    if not nofilt and rec.FILTER and len(rec.FILTER) > 0:
-      continue
-    for idx_alt in range(len(rec.ALT)):
-      # make sure variant is SNV
-      if rec.ALT[idx_alt].type != 'SNV':
-        continue
+    idx_sample = get_sample_idx(sample, hdr)
+    samples = hdr['samples'][idx_sample:idx_sample+1]
+    print('[INFO] exporting read counts for sample "{}".'.format(samples[0]))  
+  fields = [] if use_info else ['AD']
+  for chunk in vcf_columnar.iter_chunks(fh_vcf.name, fields, samples, filt=filt):
+    for k in range(vcf_columnar.num_sites(chunk)):
+      alts = chunk['ALT'][k]
       # use INFO field or sample FORMAT fields
       if use_info:
-        rc_ref = rec.INFO['DP']
-        rc_alt = rec.INFO['AC'][idx_alt]
+        counts = info_counts(chunk['INFO'][k], len(alts))
       else:
-        call = rec.samples[idx_sample]
-        rc_ref = call.data.AD[0]
-        rc_alt = call.data.AD[idx_alt]
-      muts.append({
-        'id': '%s:%d_%d' % (rec.CHROM, rec.POS, idx_alt),
-        'ref_counts': rc_ref,
-        'var_counts': rc_alt,
-        #'states': [{'g_n':'AA', 'g_r':'AA', 'g_v':x, 'prior_weight':1} for x in ['AB', 'BB']]
-        'states': [{'g_n':'AA', 'g_r':'AA', 'g_v':x, 'prior_weight':1} for x in ['AB']]
-      })
-  data_out = {'mutations': muts}
-  fh_output.write(yaml.dump(data_out))
+        ad = chunk['AD'][k, 0].tolist()
+        counts = [(ad[0], ad[i+1]) for i in range(len(alts))]
+      for idx_alt in range(len(alts)):
+        # make sure variant is SNV
+        if len(chunk['REF'][k]) != 1 or len(alts[idx_alt]) != 1 or alts[idx_alt] in '.*':
+          continue
+        rc_ref, rc_alt = counts[idx_alt]
+        yield '%s:%d_%d' % (chunk['CHROM'][k], chunk['POS'][k], idx_alt), int(rc_ref), int(rc_alt), STATES
+
+def main(fh_output, fh_vcf, fh_bed, use_info, sample=None, nofilt=False):
+  pyclone_yaml.write_mutations(fh_output, iter_mutations(fh_vcf, use_info, sample, nofilt))
 
 if __name__ == '__main__':
   args = parse_args()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Annotate VCF records with copy number from segments or positions.
+#
+# Replaces "bedtools intersect | cut | bgzip; tabix; bcftools annotate":
+# the annotation file is loaded into per-contig arrays of segment starts and
+# ends (sorted by start), each chunk of VCF records is assigned to segments
+# with np.searchsorted and the values are appended as FORMAT fields while
+# the VCF is copied.
+#
+# Annotation files:
+#   - tab-delimited file with columns given as for "bcftools annotate -c",
+#     e.g. "CHROM,FROM,TO,FMT/CN1,FMT/CN2" or "CHROM,POS,FMT/CNI" ("-":
+#     skip column). Each FMT/<key> takes one column per VCF sample.
+#     Coordinates are 1-based inclusive, or 0-based half-open for ".bed"
+#     files (as in bcftools).
+#   - Sequenza "_segments.txt" (--seqz): A and B are written as FMT/CNIA
+#     and FMT/CNIB for all samples (coordinates 1-based inclusive).
+#
+# Segments are expected not to overlap. Records outside of any segment get
+# missing values ("."). Existing values of the annotated keys are replaced.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import argparse
+import gzip
+import itertools
+import numpy as np
+import bgzf
+import vcf_columnar
+import vcf_index
+import vcf_writer
+
+# FORMAT definitions of CN fields (used unless given with --header)
+FMT_DEFS = {
+  'CN1' : '##FORMAT=<ID=CN1,Number=1,Type=Float,Description="True copy number of maternal allele.">',
+  'CN2' : '##FORMAT=<ID=CN2,Number=1,Type=Float,Description="True copy number of paternal allele.">',
+  'CNI' : '##FORMAT=<ID=CNI,Number=1,Type=Integer,Description="Inferred copy number.">',
+  'CNIA': '##FORMAT=<ID=CNIA,Number=1,Type=Integer,Description="Inferred copy number for allele A.">',
+  'CNIB': '##FORMAT=<ID=CNIB,Number=1,Type=Integer,Description="Inferred copy number for allele B.">',
+}
+# Sequenza segments columns -> FORMAT keys
+SEQZ_FIELDS = [('A', 'CNIA'), ('B', 'CNIB')]
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Annotate VCF records with copy number from segments (BED, tab-delimited or Sequenza segments).')
+  parser.add_argument('vcf', help='Input VCF file.')
+  parser.add_argument('annot', help='Annotation file (BED/tab-delimited, optionally gzipped; Sequenza "_segments.txt" with --seqz).')
+  parser.add_argument('--columns', help='Columns of annotation file (as for "bcftools annotate -c", e.g. "CHROM,FROM,TO,FMT/CN1,FMT/CN2").')
+  parser.add_argument('--seqz', action='store_true', help='Annotation file is Sequenza "_segments.txt" (annotate FMT/CNIA, FMT/CNIB).')
+  parser.add_argument('--header', help='File with header lines for annotated FORMAT fields (default: built-in definitions).')
+  parser.add_argument('--out', help='Output VCF file (bgzipped and indexed if ending in ".gz"; default: stdout).')
+  parser.add_argument('--index', choices=['csi', 'tbi'], default='csi', help='Index format for bgzipped output (default: csi).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of threads for (de)compression (default: 1).')
+
+  args = parser.parse_args()
+  if not args.seqz and not args.columns:
+    parser.error('--columns is required (unless --seqz is set).')
+  return args
+
+class Segments(object):
+  '''
+  Per-contig sorted segments with annotation values.
+
+  Attributes:
+    keys    : FORMAT keys
+    col_idx : for each key, value column for each sample
+    contigs : {contig: (starts, ends, values)} (1-based inclusive
+              coordinates; values: segments x value columns, str)
+  '''
+  def __init__(self, keys, col_idx, rows):
+    self.keys = keys
+    self.col_idx = col_idx
+    self.contigs = {}
+    for contig, grp in itertools.groupby(sorted(rows, key=lambda r: r[0]), key=lambda r: r[0]):
+      grp = list(grp)
+      starts = np.array([r[1] for r in grp], dtype=np.int64)
+      ends = np.array([r[2] for r in grp], dtype=np.int64)
+      values = np.array([r[3] for r in grp], dtype=object).reshape(len(grp), -1)
+      order = np.argsort(starts, kind='stable')
+      self.contigs[contig] = (starts[order], ends[order], values[order])
+
+  def lookup(self, contig, pos):
+    '''Index of segment containing each position (-1: none).'''
+    if contig not in self.contigs:
+      return np.full(len(pos), -1, dtype=np.int64)
+    starts, ends, values = self.contigs[contig]
+    idx = np.searchsorted(starts, pos, side='right') - 1
+    hit = (idx >= 0) & (pos <= ends[np.maximum(idx, 0)])
+
+    return np.where(hit, idx, -1)
+
+  def values(self, contig, pos):
+    '''
+    Annotation values for positions on contig.
+
+    Output:
+      for each key, values for each site and sample (str; "." if missing)
+    '''
+    idx = self.lookup(contig, pos)
+    n_cols = max([max(c) for c in self.col_idx] or [-1]) + 1
+    if contig in self.contigs:
+      vals = self.contigs[contig][2][np.maximum(idx, 0)]
+      vals[idx < 0] = '.'
+    else:
+      vals = np.full((len(pos), n_cols), '.', dtype=object)
+
+    return [vals[:, cols].tolist() for cols in self.col_idx]
+
+def open_text(fn):
+  with open(fn, 'rb') as f:
+    magic = f.read(2)
+
+  return gzip.open(fn, 'rt') if magic == b'\x1f\x8b' else open(fn, 'rt')
+
+def is_bed(fn):
+  '''BED files have 0-based coordinates (cf. bcftools).'''
+  return fn.endswith('.bed') or fn.endswith('.bed.gz')
+
+def load_table(fn, columns, n_samples):
+  '''
+  Load tab-delimited annotation file.
+
+  Parameters:
+    fn        : annotation file
+    columns   : column spec (CHROM, POS, FROM, TO, FMT/<key>, -)
+    n_samples : number of VCF samples (columns per FMT key)
+  '''
+  i_chrom = i_beg = i_end = None
+  keys, col_idx, fmt_cols = [], [], []
+  i = 0
+  for c in columns.split(','):
+    if c == 'CHROM':
+      i_chrom = i
+    elif c in ('POS', 'FROM', 'BEG'):
+      i_beg = i
+    elif c in ('TO', 'END'):
+      i_end = i
+    elif c.startswith('FMT/') or c.startswith('FORMAT/'):
+      keys.append(c.split('/', 1)[1])
+      col_idx.append(list(range(len(fmt_cols), len(fmt_cols) + n_samples)))
+      fmt_cols += list(range(i, i + n_samples))
+      i += n_samples
+      continue
+    elif c != '-':
+      raise ValueError('Unsupported annotation column: {}'.format(c))
+    i += 1
+  if i_chrom is None or i_beg is None:
+    raise ValueError('Columns must include CHROM and POS or FROM: {}'.format(columns))
+  if i_end is None:
+    i_end = i_beg
+  offset = 1 if is_bed(fn) else 0
+
+  rows = []
+  with open_text(fn) as f:
+    for line in f:
+      if line.startswith('#') or line.startswith('track') or len(line.strip()) == 0:
+        continue
+      cols = line.rstrip('\n').split('\t')
+      if len(cols) < i:
+        raise ValueError('Expected {} columns in annotation file: {}'.format(i, line[:80]))
+      rows.append((cols[i_chrom], int(cols[i_beg]) + offset, int(cols[i_end]), [cols[k] for k in fmt_cols]))
+
+  return Segments(keys, col_idx, rows)
+
+def load_sequenza(fn, n_samples):
+  '''Load Sequenza segments file (A, B -> CNIA, CNIB for all samples).'''
+  rows = []
+  with open_text(fn) as f:
+    hdr = [x.strip('"') for x in f.readline().rstrip('\n').split('\t')]
+    idx = [hdr.index(x) for x in ['chromosome', 'start.pos', 'end.pos'] + [c for c, k in SEQZ_FIELDS]]
+    for line in f:
+      cols = [x.strip('"') for x in line.rstrip('\n').split('\t')]
+      if len(cols) < len(hdr):
+        continue
+      chrom, beg, end = [cols[i] for i in idx[:3]]
+      vals = ['.' if cols[i] == 'NA' else cols[i] for i in idx[3:]]
+      rows.append((chrom, int(float(beg)), int(float(end)), vals))
+  keys = [k for c, k in SEQZ_FIELDS]
+  col_idx = [[i] * n_samples for i in range(len(keys))]
+
+  return Segments(keys, col_idx, rows)
+
+def header_lines(hdr, keys, fn_header=None):
+  '''VCF header with FORMAT definitions of keys (after last existing one).'''
+  defs = dict(FMT_DEFS)
+  if fn_header:
+    with open(fn_header, 'rt') as f:
+      for line in f:
+        if line.startswith('##FORMAT=<ID='):
+          defs[line[13:].split(',', 1)[0]] = line.rstrip('\n')
+  meta = list(hdr['meta'])
+  idx = max([i+1 for i, line in enumerate(meta) if line.startswith('##FORMAT=')] or [len(meta)])
+  meta[idx:idx] = [defs.get(k, '##FORMAT=<ID={},Number=1,Type=String,Description="Copy number annotation">'.format(k))
+    for k in keys if k not in hdr['formats']]
+
+  return meta + ['#' + '\t'.join(hdr['columns'])]
+
+def annotate_lines(lines, segs, replace=False):
+  '''
+  Add annotation values to a list of raw records (sorted by contig).
+  Values of keys already present in the records are overwritten if replace
+  is set (otherwise values are appended).
+  '''
+  set_format = vcf_writer.update_format if replace else vcf_writer.append_format
+  out = []
+  for contig, grp in itertools.groupby(lines, key=vcf_index.chrom_of):
+    grp = list(grp)
+    pos = np.array([vcf_index.pos_of(x) for x in grp], dtype=np.int64)
+    out += set_format(grp, segs.keys, segs.values(contig, pos))
+
+  return out
+
+def main(args):
+  hdr = vcf_columnar.read_header(args.vcf)
+  n_samples = len(hdr['samples'])
+  if args.seqz:
+    segs = load_sequenza(args.annot, n_samples)
+  else:
+    segs = load_table(args.annot, args.columns, n_samples)
+
+  fh_out = vcf_writer.Writer(bgzf.open_out(args.out, args.threads, args.index) if args.out else sys.stdout)
+  fh_out.write_header(header_lines(hdr, segs.keys, args.header))
+  # keys defined in input VCF may be present in records
+  replace = any(k in hdr['formats'] for k in segs.keys)
+  with vcf_columnar.open_vcf(args.vcf, args.threads) as fh:
+    lines = (line for line in fh if not line.startswith('#'))
+    while True:
+      chunk = list(itertools.islice(lines, vcf_columnar.CHUNK_SIZE))
+      if len(chunk) == 0:
+        break
+      fh_out.write_lines(annotate_lines(chunk, segs, replace))
+  fh_out.close()
+
+if __name__ == '__main__':
+  args = parse_args()
+  main(args)
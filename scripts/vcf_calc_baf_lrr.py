@@ -4,137 +4,139 @@
 #------------------------------------------------------------------------------
 # Calculate BAF and LRR from a paired normal-tumor VCF.
 #
-# Trim ALT alleles to keep allele with max AD (random choice to break ties). 
+# BAF is calculated for the ALT allele with max AD (random choice to break
+# ties). BAF and LRR are appended to the FORMAT fields of the input records.
+#
+# Chromosomes are processed independently (LRR is relative to the mean DP of
+# the normal sample on the chromosome). If the VCF is bgzipped and indexed
+# (.csi/.tbi), chromosomes are read via the index in parallel. Output to
+# ".gz" files is bgzipped and indexed in-process.
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-05-17
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 import os, sys
 import argparse
-import math
-import random
-import vcf
+import itertools
+from multiprocessing import Pool
+import numpy as np
+import allele_counts
+import bgzf
+import vcf_columnar
+import vcf_index
+import vcf_writer
+from vcf_columnar import MISSING
+
+# additional FORMAT fields
+FMT_BAF = '##FORMAT=<ID=BAF,Number=1,Type=Float,Description="B-allele frequency">'
+FMT_LRR = '##FORMAT=<ID=LRR,Number=1,Type=Float,Description="Log response ratio (log2 of ratio (DP/(chrom-wise mean DP_normal))">'
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Calculate BAF and LRR from a paired normal-tumor VCF.')
-  parser.add_argument('vcf', type=argparse.FileType(), help='Multi-sample VCF file with somatic mutations and read counts. (required FORMAT fields: "AD", "DP"')
+  parser.add_argument('vcf', help='Multi-sample VCF file with somatic mutations and read counts. (required FORMAT fields: "AD", "DP"')
   parser.add_argument('normal', help='Normal sample id.')
+  parser.add_argument('--seed', type=int, help='Random seed to break ties between ALT alleles.')
+  parser.add_argument('--out', help='Output VCF file (bgzipped and indexed if ending in ".gz"; default: stdout).')
+  parser.add_argument('--index', choices=['csi', 'tbi'], default='csi', help='Index format for bgzipped output (default: csi).')
+  parser.add_argument('--region', help='Only process records in region (CHROM[:BEG[-END]]).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of chromosomes to process in parallel (requires bgzipped and indexed VCF; default: 1).')
 
   args = parser.parse_args()
   return args
 
-def calc_baf(rec):
+def header_lines(hdr):
+  '''VCF header with additional FORMAT fields (after last existing one).'''
+  meta = list(hdr['meta'])
+  idx = max([i+1 for i, line in enumerate(meta) if line.startswith('##FORMAT=')] or [len(meta)])
+  meta[idx:idx] = [FMT_BAF, FMT_LRR]
+
+  return meta + ['#' + '\t'.join(hdr['columns'])]
+
+def calc_baf_lrr(chunk, mean_dp, rng):
   '''
-  Calculate B-allele frequency (BAF) from multi-sample VCF record.
-  
+  Calculate B-allele frequency (BAF) and log response ratio (LRR) for a
+  chunk of multi-sample VCF records.
+
   In case of multiple ALT alleles, pick allele with the highest AD overall.
   Break ties in AD by randomly choosing an allele.
 
   Returns:
-    - list with BAF for each sample
+    (BAF, LRR) formatted for output (sites x samples; "." if missing)
   '''
+  mc = allele_counts.count_major_allele(chunk, rng)
+  # BAF: AD(ALT)/DP
+  vaf = mc['vaf']
+  with np.errstate(invalid='ignore'):
+    baf = vcf_writer.format_values(vaf, '{:0.4f}', ~(vaf > 0))
+  # LRR: log2(DP/mean_dp)
+  dp = chunk['DP']
+  with np.errstate(divide='ignore', invalid='ignore'):
+    lrr = np.where(dp > 0, np.log2(dp / mean_dp), 0.0)
+  lrr = vcf_writer.format_values(lrr, '{:0.4f}', (dp == MISSING) | np.isnan(lrr))
 
-  # sum up AD values for each ALT allele
-  sum_ad = [0] * len(rec.ALT)
-  for call in rec.samples:
-    for i in range(len(rec.ALT)):
-      if call.data.AD and call.data.AD[i+1]:
-        sum_ad[i] += call.data.AD[i+1]
-  # determine major ALT allele
-  max_ad = max(sum_ad)
-  i_max = [i for i,v in enumerate(sum_ad) if v == max_ad]
-  i_maj = i_max[0] if len(i_max)==1 else random.choice(i_max)
-  # calculate BAF of major allele for all samples
-  baf = [float(c.data.AD[i_maj+1])/c.data.DP if (c.data.AD and c.data.AD[i_maj+1]) else None for c in rec.samples]
-  
-  return baf
-  
-def parse_record(rec, idx_normal, mean_dp):
-  '''
-  Parse multi-sample VCF record.
-  
-  Apply the following filters:
-    - Normal sample DP must not be Null
-  Do these modifications:
-    - keep only ALT allele with highest AD
-    - set BAF to AD(ALT)/DP
-    - set LRR to log2(DP/mean_dp)
-  '''
-  # create new CallData class (NamedTuple)
-  old_keys = list(rec.samples[idx_normal].data._fields)
-  cd = vcf.parser.make_calldata_tuple(old_keys + ['BAF', 'LRR'])
-  # update VCF record
-  rec.FORMAT += ':BAF:LRR'
-  baf = calc_baf(rec)
-  for i in range(len(rec.samples)):
-    # calculate LRR from DP
-    lrr = None
-    if not rec.samples[i].data.DP is None:
-      rr = float(rec.samples[i].data.DP) / mean_dp
-      lrr = math.log2(rr) if rr > 0 else 0.0
-    s_lrr = '{:0.4f}'.format(lrr) if (not lrr is None) else None
-    s_baf = '{:0.4f}'.format(baf[i]) if baf[i] else None
-    old_vals = list(rec.samples[i].data._asdict().values())
-    data = cd(*(old_vals + [s_baf, s_lrr]))
-    rec.samples[i].data = data
-
-  return rec
+  return baf, lrr
 
-def main(args):
+def annotate_chunk(chunk, mean_dp, rng):
+  '''Append BAF and LRR to FORMAT fields of raw records.'''
+  baf, lrr = calc_baf_lrr(chunk, mean_dp, rng)
+
+  return vcf_writer.append_format(chunk['LINE'], ['BAF', 'LRR'], [baf, lrr])
+
+def annotate_contig(lines, hdr, idx_normal, rng):
   '''
-  Parse multi-sample VCF file, per chromosome do 2 passes:
+  Process records of one chromosome in 2 passes:
     1. calculate mean read depth of normal sample
     2. calculate BAF and LRR for major ALT allele
+
+  Returns:
+    annotated records (str)
   '''
-  rdr = vcf.Reader(filename=args.vcf.name)
-  idx_normal = rdr.samples.index(args.normal) # ValueError if not present
+  # 1st pass
+  chunks = list(vcf_columnar.iter_lines(lines, ['AD', 'DP'], hdr, raw=True))
+  if len(chunks) == 0:
+    return ''
+  dp_nrm = np.concatenate([c['DP'][:, idx_normal] for c in chunks])
+  dp_nrm = dp_nrm[dp_nrm > 0]
+  mean_dp = dp_nrm.mean() if len(dp_nrm) > 0 else np.nan
+  # 2nd pass
+  out = []
+  for chunk in chunks:
+    out += annotate_chunk(chunk, mean_dp, rng)
+
+  return ''.join(out)
+
+def process_contig(task):
+  '''Read and annotate one chromosome shard of the VCF (worker process).'''
+  fn, shard, idx_normal, seed = task
+  hdr = vcf_columnar.read_header(fn)
+  rng = np.random.default_rng(seed)
 
+  return annotate_contig(vcf_index.read_shard(fn, shard), hdr, idx_normal, rng)
+
+def main(args):
+  hdr = vcf_columnar.read_header(args.vcf)
+  idx_normal = hdr['samples'].index(args.normal) # ValueError if not present
+  seeds = np.random.SeedSequence(args.seed)
+
+  fh_out = vcf_writer.Writer(bgzf.open_out(args.out, args.threads, args.index) if args.out else sys.stdout)
   # extend VCF header with additional FORMAT fields
-  hdr = rdr
-  hdr.formats['BAF'] = vcf.parser._Format('BAF', 1, 'Float', 'B-allele frequency')
-  hdr.formats['LRR'] = vcf.parser._Format('LRR', 1, 'Float', 'Log response ratio (log2 of ratio (DP/(chrom-wise mean DP_normal))') 
+  fh_out.write_header(header_lines(hdr))
 
-  wtr = vcf.Writer(sys.stdout, hdr)
-  # 1st pass
-  recs = []
-  chrom = ""
-  sum_dp = 0
-  num_rec = 0
-  mean_dp = 0.0
-  for rec in rdr:
-    if rec.CHROM == chrom:
-      recs.append(rec)
-      if rec.samples[idx_normal].data.DP:
-        sum_dp += rec.samples[idx_normal].data.DP
-        num_rec += 1
-    else: # passed end of chromosome
-      if len(recs) > 0:
-        mean_dp = float(sum_dp) / num_rec
-        # 2nd pass
-        for r in recs:
-          rec_out = parse_record(r, idx_normal, mean_dp)
-          if rec_out:
-            wtr.write_record(rec_out)
-      # prepare for processing next chrom's variants
-      recs = [rec]
-      chrom = rec.CHROM
-      if rec.samples[idx_normal].data.DP:
-        sum_dp = rec.samples[idx_normal].data.DP
-        num_rec = 1
-      else:
-        sum_dp = 0
-        num_rec = 0
-
-  # process records of last chromosome
-  if len(recs) > 0:
-    mean_dp = float(sum_dp) / num_rec
-    # 2nd pass
-    for r in recs:
-      rec_out = parse_record(r, idx_normal, mean_dp)
-      if rec_out:
-        wtr.write_record(rec_out)
+  shards = vcf_index.get_shards(args.vcf, args.region, by_contig=True)
+  if args.threads > 1 and len(shards) > 1:
+    # process chromosomes in parallel (output in file order)
+    tasks = [(args.vcf, sh, idx_normal, s) for sh, s in zip(shards, seeds.spawn(len(shards)))]
+    with Pool(args.threads) as pool:
+      for out in pool.imap(process_contig, tasks):
+        fh_out.write(out)
+  else:
+    for shard in shards:
+      for chrom, lines in itertools.groupby(vcf_index.read_shard(args.vcf, shard), key=vcf_index.chrom_of):
+        rng = np.random.default_rng(seeds.spawn(1)[0])
+        fh_out.write(annotate_contig(lines, hdr, idx_normal, rng))
+  fh_out.close()
 
 if __name__ == '__main__':
   args = parse_args()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Columnar VCF reader.
+#
+# Parses only the requested FORMAT fields of a (multi-sample) VCF straight
+# into NumPy arrays, a chunk of sites at a time. No per-record objects are
+# created (cf. vcf.Reader), the remaining columns are kept as raw strings.
+#
+# Chunks are dicts with the following entries:
+#   CHROM, ID, REF, QUAL, FILTER, INFO : list of str (one per site)
+#   POS     : int64 array (sites)
+#   ALT     : list of lists of str (one per site)
+#   LINE    : raw data lines without newline (only if requested)
+#   <field> : FORMAT field values for selected samples
+#             - sites x samples            (Number=1)
+#             - sites x samples x values   (Number=R,A,G,.; e.g. AD)
+#
+# Missing values are encoded as MISSING (-1) for Integer fields and as NaN
+# for Float fields.
+#
+# Reading can be restricted to a region and spread over a process pool: the
+# (bgzipped, indexed) VCF is split into shards (see vcf_index.py), which are
+# parsed in parallel and yielded in file order. Records can be filtered on
+# their raw columns before any FORMAT field is parsed (see vcf_filter.py).
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import gzip
+import re
+from functools import partial
+from multiprocessing import Pool
+import numpy as np
+import bgzf
+import vcf_index
+
+# number of sites per chunk
+CHUNK_SIZE = 10000
+# encoding of missing Integer values
+MISSING = -1
+# number of shards per worker process (load balancing)
+SHARDS_PER_THREAD = 4
+# fixed VCF columns
+COLS = ['CHROM', 'POS', 'ID', 'REF', 'ALT', 'QUAL', 'FILTER', 'INFO', 'FORMAT']
+# definitions of commonly used FORMAT fields (used if missing from header)
+DEFAULT_FORMATS = {
+  'AD': ('R', 'Integer'),
+  'DP': ('1', 'Integer'),
+}
+
+regex_meta = re.compile(r'^##(INFO|FORMAT)=<ID=([^,]+),Number=([^,]+),Type=([^,]+)')
+
+def open_vcf(fn, threads=1):
+  '''Open (gzipped) VCF file for reading text (bgzipped: threaded decompression).'''
+  if threads > 1 and bgzf.is_bgzf(fn):
+    return bgzf.Reader(fn, threads)
+  with open(fn, 'rb') as f:
+    magic = f.read(2)
+  if magic == b'\x1f\x8b':
+    return gzip.open(fn, 'rt')
+
+  return open(fn, 'rt')
+
+def parse_header(fh):
+  '''
+  Read VCF header lines from an open file handle.
+
+  Output:
+    dict with entries
+      meta    : list of meta-information lines ("##...")
+      columns : list of column labels ("#CHROM" line)
+      samples : list of sample ids
+      infos   : {id: (Number, Type)}
+      formats : {id: (Number, Type)}
+  '''
+  hdr = {'meta': [], 'columns': [], 'samples': [], 'infos': {}, 'formats': {}}
+  for line in fh:
+    line = line.rstrip('\n')
+    if line.startswith('##'):
+      hdr['meta'].append(line)
+      m = regex_meta.match(line)
+      if m:
+        key = 'infos' if m.group(1) == 'INFO' else 'formats'
+        hdr[key][m.group(2)] = (m.group(3), m.group(4))
+    elif line.startswith('#'):
+      hdr['columns'] = line[1:].split('\t')
+      hdr['samples'] = hdr['columns'][9:]
+      break
+
+  return hdr
+
+def read_header(fn):
+  '''Read header of VCF file (see parse_header()).'''
+  with open_vcf(fn) as fh:
+    hdr = parse_header(fh)
+
+  return hdr
+
+def field_spec(hdr, field):
+  '''Determine (Number, Type) of a FORMAT field.'''
+  if field in hdr['formats']:
+    return hdr['formats'][field]
+
+  return DEFAULT_FORMATS.get(field, ('1', 'Integer'))
+
+def to_array(vals, typ):
+  '''Convert list of strings to numeric array encoding missing values.'''
+  arr = np.array(vals, dtype=object)
+  arr[(arr == '.') | (arr == '') | (arr == None)] = 'nan'
+  arr = arr.astype(np.float64)
+  if typ == 'Integer':
+    arr = np.where(np.isnan(arr), MISSING, arr).astype(np.int64)
+
+  return arr
+
+def to_array_multi(cells, typ, shape):
+  '''Convert list of comma-separated value strings to array (cells x values).'''
+  tokens = [c.split(',') for c in cells]
+  lens = np.array([len(t) for t in tokens], dtype=np.int64)
+  width = max(int(lens.max()) if len(lens) else 1, 1)
+  flat = to_array([x for t in tokens for x in t], typ)
+  arr = np.full((len(cells), width), MISSING if typ == 'Integer' else np.nan, dtype=flat.dtype)
+  idx_cell = np.repeat(np.arange(len(cells)), lens)
+  idx_val = np.arange(len(flat)) - np.repeat(np.cumsum(lens) - lens, lens)
+  arr[idx_cell, idx_val] = flat
+
+  return arr.reshape(shape + (width,))
+
+def build_chunk(sites, cells, fields, specs, n_samples, lines=None):
+  '''Assemble parsed raw values of a chunk of sites into arrays.'''
+  n_sites = len(sites)
+  chunk = {c: [s[i] for s in sites] for i, c in enumerate(COLS[:8])}
+  chunk['POS'] = np.array(chunk['POS'], dtype=np.int64)
+  chunk['ALT'] = [x.split(',') if x != '.' else [] for x in chunk['ALT']]
+  for k, f in enumerate(fields):
+    num, typ = specs[k]
+    if num == '1':
+      chunk[f] = to_array(cells[k], typ).reshape(n_sites, n_samples)
+    else:
+      chunk[f] = to_array_multi(cells[k], typ, (n_sites, n_samples))
+  if lines is not None:
+    chunk['LINE'] = lines
+
+  return chunk
+
+def iter_lines(fh, fields, hdr, samples=None, chunk_size=CHUNK_SIZE, raw=False, filt=None):
+  '''
+  Parse VCF data lines from an open file handle (or any iterable of lines)
+  into chunks. If raw is set, the unparsed lines are kept in the chunk.
+  If a filter is given (see vcf_filter.RecordFilter), it is applied to the
+  raw lines before any FORMAT field is parsed.
+  '''
+  samples = samples if samples is not None else hdr['samples']
+  col_smp = [9 + hdr['samples'].index(s) for s in samples]
+  specs = [field_spec(hdr, f) for f in fields]
+  fmt_idx = {} # cache field indices per FORMAT string
+
+  sites = []
+  cells = [[] for f in fields]
+  lines = [] if raw else None
+  for line in fh:
+    if line.startswith('#'):
+      continue
+    if filt:
+      res = filt.apply(line)
+      if res is None:
+        continue
+      cols, changed = res
+      line = '\t'.join(cols) if changed else line.rstrip('\n')
+    else:
+      line = line.rstrip('\n')
+      cols = line.split('\t')
+    if raw:
+      lines.append(line)
+    fmt = cols[8] if len(cols) > 8 else ''
+    if fmt not in fmt_idx:
+      keys = fmt.split(':')
+      fmt_idx[fmt] = [keys.index(f) if f in keys else -1 for f in fields]
+    idx = fmt_idx[fmt]
+    sites.append(cols[:8])
+    for c in col_smp:
+      vals = cols[c].split(':') if c < len(cols) else []
+      for k in range(len(fields)):
+        i = idx[k]
+        cells[k].append(vals[i] if 0 <= i < len(vals) else '.')
+    if len(sites) >= chunk_size:
+      yield build_chunk(sites, cells, fields, specs, len(samples), lines)
+      sites = []
+      cells = [[] for f in fields]
+      lines = [] if raw else None
+  if len(sites) > 0:
+    yield build_chunk(sites, cells, fields, specs, len(samples), lines)
+
+def iter_shard(fn, hdr, shard, fields, samples=None, chunk_size=CHUNK_SIZE, raw=False, func=None, filt=None):
+  '''Parse records of a shard into chunks (optionally transformed by func).'''
+  for chunk in iter_lines(vcf_index.read_shard(fn, shard), fields, hdr, samples, chunk_size, raw, filt):
+    yield func(chunk) if func else chunk
+
+def process_shard(task):
+  '''Parse records of a shard (worker process).'''
+  return list(iter_shard(*task))
+
+def map_chunks(fn, func=None, fields=('AD', 'DP'), samples=None, chunk_size=CHUNK_SIZE,
+  region=None, threads=1, raw=False, by_contig=False, filt=None):
+  '''
+  Apply function to chunks of VCF file in a process pool.
+
+  Parameters:
+    fn        : VCF file name (parallel if bgzipped and indexed)
+    func      : function applied to each chunk (must be picklable;
+                default: return chunk)
+    region    : restrict to region (CHROM[:BEG[-END]])
+    threads   : number of worker processes
+    by_contig : do not split contigs into several shards
+    filt      : record filter (see vcf_filter.RecordFilter)
+    (see iter_chunks() for remaining parameters)
+
+  Yields:
+    results of func for each chunk, in file order
+  '''
+  hdr = read_header(fn)
+  shards = vcf_index.get_shards(fn, region, threads * SHARDS_PER_THREAD, by_contig)
+  tasks = [(fn, hdr, shard, list(fields), samples, chunk_size, raw, func, filt) for shard in shards]
+  if threads > 1 and len(tasks) > 1:
+    with Pool(threads) as pool:
+      for res in pool.imap(process_shard, tasks):
+        for x in res:
+          yield x
+  else:
+    for task in tasks:
+      for x in iter_shard(*task):
+        yield x
+
+def iter_chunks(fn, fields=('AD', 'DP'), samples=None, chunk_size=CHUNK_SIZE, region=None, threads=1, filt=None):
+  '''
+  Read VCF file in chunks of sites.
+
+  Parameters:
+    fn         : VCF file name (plain text or gzipped)
+    fields     : FORMAT fields to parse
+    samples    : sample ids (defines order of sample axis; default: all)
+    chunk_size : max number of sites per chunk
+    region     : restrict to region (CHROM[:BEG[-END]])
+    threads    : number of worker processes (bgzipped and indexed VCF)
+    filt       : record filter (see vcf_filter.RecordFilter)
+  '''
+  if region is not None or threads > 1:
+    for chunk in map_chunks(fn, None, fields, samples, chunk_size, region, threads, filt=filt):
+      yield chunk
+    return
+
+  with open_vcf(fn) as fh:
+    hdr = parse_header(fh)
+    for chunk in iter_lines(fh, list(fields), hdr, samples, chunk_size, filt=filt):
+      yield chunk
+
+def depth_sums(chunk, min_depth=0):
+  '''Sum of DP and number of sites with DP >= min_depth per sample.'''
+  dp = chunk['DP']
+  is_loc = (dp != MISSING) & (dp >= min_depth)
+
+  return np.where(is_loc, dp, 0).sum(axis=0), is_loc.sum(axis=0)
+
+def mean_depth(fn, samples=None, min_depth=0, chunk_size=CHUNK_SIZE, region=None, threads=1, filt=None):
+  '''
+  Calculate mean read depth (DP) for each sample in one cheap pass over the
+  VCF (only DP is parsed, nothing is kept in memory). Per-shard sums are
+  combined if the VCF is processed in parallel.
+
+  Sites with missing DP or DP < min_depth do not count towards the mean.
+
+  Output:
+    list of rounded mean depths (0 for samples without any counted site)
+  '''
+  if samples is None:
+    samples = read_header(fn)['samples']
+  sum_dp = np.zeros(len(samples), dtype=np.int64)
+  num_loc = np.zeros(len(samples), dtype=np.int64)
+  func = partial(depth_sums, min_depth=min_depth)
+  for s, n in map_chunks(fn, func, ['DP'], samples, chunk_size, region, threads, filt=filt):
+    sum_dp += s
+    num_loc += n
+
+  return [round(d / n) if n > 0 else 0 for d, n in zip(sum_dp.tolist(), num_loc.tolist())]
+
+def count_sites(fn, region=None, threads=1, filt=None):
+  '''Count data lines of VCF file (passing filter, if given).'''
+  return sum(map_chunks(fn, num_sites, [], None, CHUNK_SIZE, region, threads, filt=filt))
+
+def num_sites(chunk):
+  '''Number of sites in chunk.'''
+  return len(chunk['CHROM'])
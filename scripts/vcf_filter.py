@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Filter VCF records on raw FILTER/INFO/FORMAT columns.
+#
+# Predicates have the form
+#   FILTER=<id>               : FILTER contains id ("PASS" also matches ".")
+#   INFO/<key>                : INFO flag/key present
+#   INFO/<key><op><value>     : compare INFO value
+#   FMT/<key><op><value>      : compare FORMAT value of a sample
+# with <op> one of =, !=, <, <=, >, >= and <value> a number, a string or "."
+# (missing). A missing value only satisfies "=." and "!=" comparisons with
+# values other than ".". Comparisons with multi-valued fields (e.g. AD) hold
+# if they hold for any of the values.
+#
+# Site predicates (FILTER, INFO) are evaluated on the first 8 columns before
+# the sample columns are split. FORMAT predicates are used in 3 ways:
+#   include : site is kept if all samples satisfy the predicate (samples
+#             with missing values are ignored)
+#   mask    : samples which don't satisfy the predicate have all their
+#             FORMAT values reset to "."
+#   require : site is kept if at least one (unmasked) sample satisfies the
+#             predicate
+#
+# Examples:
+#   bcftools view -e 'FMT/CNI!=2 & FMT/CNI!="."'  ->  --include 'FMT/CNI=2'
+#   vcf_filt_cn2_relaxed.awk  ->  --mask 'FMT/CNI=2' --require 'FMT/DP>0'
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import argparse
+import operator
+import re
+from collections import namedtuple
+import bgzf
+import vcf_columnar
+import vcf_writer
+
+# column : FILTER, INFO or FMT
+# key    : INFO/FORMAT key (FILTER: None)
+# op     : comparison operator (None: presence of INFO key)
+# value  : value to compare with (str; float if numeric)
+Predicate = namedtuple('Predicate', 'column key op value')
+
+OPS = {
+  '=' : operator.eq,
+  '!=': operator.ne,
+  '<' : operator.lt,
+  '<=': operator.le,
+  '>' : operator.gt,
+  '>=': operator.ge,
+}
+
+regex_pred = re.compile(r'^(FILTER|INFO/[^!=<>]+|FMT/[^!=<>]+|FORMAT/[^!=<>]+)(?:(!=|<=|>=|=|<|>)(.*))?$')
+
+def parse_args():
+  parser = argparse.ArgumentParser(description='Filter VCF records by FILTER/INFO/FORMAT predicates.')
+  parser.add_argument('vcf', help='Input VCF file.')
+  parser.add_argument('--include', action='append', default=[], help='Keep sites satisfying predicate (FMT: all samples; repeatable).')
+  parser.add_argument('--mask', action='append', default=[], help='Reset FORMAT values of samples not satisfying FMT predicate (repeatable).')
+  parser.add_argument('--require', action='append', default=[], help='Keep sites where at least one unmasked sample satisfies FMT predicate (repeatable).')
+  parser.add_argument('--out', default='-', help='Output VCF file (bgzipped and indexed if ending in ".gz"; default: stdout).')
+  parser.add_argument('--threads', type=int, default=1, help='Number of threads for (de)compression (default: 1).')
+
+  args = parser.parse_args()
+  return args
+
+def parse_value(x):
+  '''Convert value to float if numeric.'''
+  try:
+    return float(x)
+  except ValueError:
+    return x
+
+def parse_predicate(expr):
+  '''Parse predicate expression into Predicate tuple.'''
+  m = regex_pred.match(expr.strip())
+  if m is None:
+    raise ValueError('Invalid filter expression: {}'.format(expr))
+  col, op, value = m.groups()
+  key = None
+  if col != 'FILTER':
+    col, key = col.split('/', 1)
+    col = 'FMT' if col == 'FORMAT' else col
+  if op is None and col != 'INFO':
+    raise ValueError('Missing comparison: {}'.format(expr))
+  value = value.strip('"\'') if value is not None else None
+  if col != 'FILTER' and value not in (None, '.'):
+    value = parse_value(value)
+
+  return Predicate(col, key, op, value)
+
+def compare(x, pred):
+  '''Evaluate comparison of predicate for raw value x (str).'''
+  if x == '.' or x == '':
+    return pred.value == '.' if pred.op == '=' else (pred.op == '!=' and pred.value != '.')
+  if pred.value == '.':
+    return pred.op == '!='
+  for v in x.split(','):
+    if v == '.':
+      continue
+    if isinstance(pred.value, float):
+      try:
+        v = float(v)
+      except ValueError:
+        continue
+    if OPS[pred.op](v, pred.value):
+      return True
+
+  return False
+
+def info_value(info, key):
+  '''Raw value of INFO key (None if absent, "" for flags).'''
+  for x in info.split(';'):
+    k, sep, v = x.partition('=')
+    if k == key:
+      return v
+  return None
+
+def site_ok(cols, pred):
+  '''Evaluate FILTER or INFO predicate on (first 8) VCF columns.'''
+  if pred.column == 'FILTER':
+    filters = cols[6].split(';')
+    if pred.value == 'PASS' and cols[6] == '.':
+      return pred.op == '='
+    return (pred.value in filters) == (pred.op == '=')
+  v = info_value(cols[7], pred.key)
+  if pred.op is None:
+    return v is not None
+
+  return compare('.' if v is None else v, pred)
+
+class RecordFilter(object):
+  '''
+  Filter for raw VCF data lines (see module description).
+
+  Parameters:
+    include, mask, require : lists of predicate expressions
+  '''
+  def __init__(self, include=(), mask=(), require=()):
+    preds = [parse_predicate(x) for x in include]
+    self.site = [p for p in preds if p.column != 'FMT']
+    self.include = [p for p in preds if p.column == 'FMT']
+    self.mask = [parse_predicate(x) for x in mask]
+    self.require = [parse_predicate(x) for x in require]
+    for p in self.mask + self.require:
+      if p.column != 'FMT':
+        raise ValueError('Only FORMAT predicates can be used to mask/require: {}'.format(p))
+    self.fmt_preds = self.include + self.mask + self.require
+    self.fmt_idx = {} # cache field indices per FORMAT string
+
+  def __bool__(self):
+    return len(self.site) + len(self.fmt_preds) > 0
+
+  def keep_site(self, head):
+    '''Evaluate site predicates on first 8 columns.'''
+    for p in self.site:
+      if not site_ok(head, p):
+        return False
+    return True
+
+  def apply(self, line):
+    '''
+    Apply filter to raw data line.
+
+    Output:
+      None if the record is rejected, otherwise (cols, changed): split
+      columns (masked samples reset) and whether any sample was masked.
+    '''
+    if self.site and not self.keep_site(line.split('\t', 8)):
+      return None
+    cols = line.rstrip('\n').split('\t')
+    if not self.fmt_preds:
+      return cols, False
+    fmt = cols[8] if len(cols) > 8 else ''
+    if fmt not in self.fmt_idx:
+      keys = fmt.split(':')
+      self.fmt_idx[fmt] = [keys.index(p.key) if p.key in keys else -1 for p in self.fmt_preds]
+    idx = self.fmt_idx[fmt]
+    n_inc, n_mask = len(self.include), len(self.mask)
+    n_keys = fmt.count(':') + 1
+    changed = False
+    found = len(self.require) == 0
+    for c in range(9, len(cols)):
+      vals = cols[c].split(':')
+      xs = [vals[i] if 0 <= i < len(vals) else '.' for i in idx]
+      for k in range(n_inc):
+        if xs[k] != '.' and not compare(xs[k], self.fmt_preds[k]):
+          return None
+      if any(not compare(xs[k], self.fmt_preds[k]) for k in range(n_inc, n_inc + n_mask)):
+        cols[c] = ':'.join(['.'] * n_keys)
+        changed = True
+        continue
+      if not found:
+        found = all(compare(xs[k], self.fmt_preds[k]) for k in range(n_inc + n_mask, len(self.fmt_preds)))
+    if not found:
+      return None
+
+    return cols, changed
+
+def main(args):
+  filt = RecordFilter(args.include, args.mask, args.require)
+  fh_out = vcf_writer.Writer(bgzf.open_out(args.out, args.threads, 'csi') if args.out != '-' else sys.stdout)
+  with vcf_columnar.open_vcf(args.vcf, args.threads) as fh:
+    for line in fh:
+      if line.startswith('#'):
+        fh_out.write(line)
+        continue
+      res = filt.apply(line)
+      if res is None:
+        continue
+      cols, changed = res
+      # unchanged records are passed through
+      fh_out.write('\t'.join(cols) + '\n' if changed else line)
+  fh_out.close()
+
+if __name__ == '__main__':
+  args = parse_args()
+  main(args)
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Minimal reader for tabix (.tbi) and CSI (.csi) indices of bgzipped VCFs.
+#
+# Only what is needed to split a VCF into independent shards is read: the
+# contig names, the virtual file offsets of the first and last record of
+# each contig and the record offsets of the index bins. Records of a shard
+# are then read by seeking to its virtual offset (see bgzf.py).
+#
+# Shards are whole contigs, or contigs split into chunks of about equal
+# compressed size at record offsets found in the index. A region (CHROM,
+# CHROM:BEG or CHROM:BEG-END; 1-based, inclusive) restricts the shards to
+# records with POS inside the region.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+import gzip
+import struct
+from collections import namedtuple
+import bgzf
+
+# pseudo-bin holding per-contig offsets (tabix)
+TBI_PSEUDO_BIN = 37450
+
+# name : contig name
+# beg  : virtual offset of first record
+# end  : virtual offset past last record
+# bins : {bin: (loffset, [(beg, end), ...])} (loffset only set for CSI)
+# ioff : linear index (tabix only; virtual offsets of 16kb windows)
+# min_shift, depth : binning scheme
+Contig = namedtuple('Contig', 'name beg end bins ioff min_shift depth')
+
+# contig : contig name (None: whole file)
+# beg    : virtual offset of first record (0: start of file)
+# end    : virtual offset past last record (None: end of file)
+# start, stop : range of POS (1-based, inclusive; None: unbounded)
+Shard = namedtuple('Shard', 'contig beg end start stop')
+
+def find_index(fn_vcf):
+  '''Return file name of index (.csi or .tbi) for VCF or None if not found.'''
+  for ext in ['.csi', '.tbi']:
+    if os.path.exists(fn_vcf + ext):
+      return fn_vcf + ext
+
+  return None
+
+def parse_names(data, off):
+  '''Parse tabix-style header (format, col_seq, ..., l_nm, names).'''
+  fmt, col_seq, col_beg, col_end, meta, skip, l_nm = struct.unpack_from('<7i', data, off)
+  off += 28
+  names = [x.decode() for x in data[off:off+l_nm].split(b'\0')[:-1]]
+
+  return names, off + l_nm
+
+def contig_span(bins, pseudo_bin):
+  '''Virtual offsets of first and last record from index bins.'''
+  if pseudo_bin in bins:
+    beg, end = bins[pseudo_bin][1][0]
+    return beg, end
+  chunks = [c for b, (loff, lst) in bins.items() for c in lst]
+
+  return min(c[0] for c in chunks), max(c[1] for c in chunks)
+
+def read_tbi(data):
+  '''Parse decompressed tabix index.'''
+  n_ref = struct.unpack_from('<i', data, 4)[0]
+  names, off = parse_names(data, 8)
+  contigs = []
+  for i in range(n_ref):
+    n_bin = struct.unpack_from('<i', data, off)[0]
+    off += 4
+    bins = {}
+    for j in range(n_bin):
+      b, n_chunk = struct.unpack_from('<Ii', data, off)
+      off += 8
+      chunks = struct.unpack_from('<{}Q'.format(2*n_chunk), data, off)
+      off += 16 * n_chunk
+      bins[b] = (None, list(zip(chunks[0::2], chunks[1::2])))
+    n_intv = struct.unpack_from('<i', data, off)[0]
+    off += 4
+    ioff = list(struct.unpack_from('<{}Q'.format(n_intv), data, off))
+    off += 8 * n_intv
+    if n_bin > 0:
+      beg, end = contig_span(bins, TBI_PSEUDO_BIN)
+      contigs.append(Contig(names[i], beg, end, bins, ioff, 14, 5))
+
+  return contigs
+
+def read_csi(data):
+  '''Parse decompressed CSI index.'''
+  min_shift, depth, l_aux = struct.unpack_from('<3i', data, 4)
+  names = []
+  if l_aux >= 28:
+    names, _ = parse_names(data, 16)
+  off = 16 + l_aux
+  n_ref = struct.unpack_from('<i', data, off)[0]
+  off += 4
+  pseudo_bin = ((1 << ((depth + 1) * 3)) - 1) // 7 + 1
+  contigs = []
+  for i in range(n_ref):
+    n_bin = struct.unpack_from('<i', data, off)[0]
+    off += 4
+    bins = {}
+    for j in range(n_bin):
+      b, loffset, n_chunk = struct.unpack_from('<IQi', data, off)
+      off += 16
+      chunks = struct.unpack_from('<{}Q'.format(2*n_chunk), data, off)
+      off += 16 * n_chunk
+      bins[b] = (loffset, list(zip(chunks[0::2], chunks[1::2])))
+    if n_bin > 0:
+      beg, end = contig_span(bins, pseudo_bin)
+      name = names[i] if i < len(names) else str(i)
+      contigs.append(Contig(name, beg, end, bins, None, min_shift, depth))
+
+  return contigs
+
+def read_index(fn_idx):
+  '''
+  Read tabix or CSI index.
+
+  Output:
+    list of Contig tuples (contigs with records only), in file order
+  '''
+  with open(fn_idx, 'rb') as f:
+    data = gzip.decompress(f.read())
+  magic = data[:4]
+  if magic == b'TBI\x01':
+    contigs = read_tbi(data)
+  elif magic == b'CSI\x01':
+    contigs = read_csi(data)
+  else:
+    raise ValueError('Unknown index format: {}'.format(fn_idx))
+
+  return sorted(contigs, key=lambda c: c.beg)
+
+def parse_region(region):
+  '''Parse region string "CHROM[:BEG[-END]]" into (contig, start, stop).'''
+  if region is None:
+    return None
+  contig, sep, rng = region.rpartition(':')
+  if not sep or not rng.replace(',', '').replace('-', '').isdigit():
+    return (region, None, None)
+  beg, sep, end = rng.replace(',', '').partition('-')
+  start = int(beg) if beg else None
+  stop = int(end) if end else None
+
+  return (contig, start, stop)
+
+def reg2bins(beg, end, min_shift, depth):
+  '''Bins overlapping 0-based half-open interval [beg, end).'''
+  bins = []
+  end -= 1
+  s = min_shift + depth * 3
+  t = 0
+  for l in range(depth + 1):
+    bins.extend(range(t + (beg >> s), t + (end >> s) + 1))
+    s -= 3
+    t += 1 << (l * 3)
+
+  return bins
+
+def record_offsets(c):
+  '''Sorted virtual offsets of record starts found in index for contig.'''
+  offs = set(x[0] for b, (loff, chunks) in c.bins.items() for x in chunks)
+  offs.update(c.ioff or [])
+
+  return sorted(x for x in offs if c.beg <= x < c.end)
+
+def region_offset(c, start):
+  '''Virtual offset to start reading from for records at or after POS start.'''
+  if start is None or start <= 1:
+    return c.beg
+  beg = start - 1
+  if c.ioff: # tabix linear index
+    i = beg >> c.min_shift
+    return max(c.beg, c.ioff[i]) if i < len(c.ioff) else c.beg
+  bins = reg2bins(beg, 1 << (c.min_shift + c.depth * 3), c.min_shift, c.depth)
+  offs = [x[0] for b in bins if b in c.bins for x in c.bins[b][1]]
+
+  return max(c.beg, min(offs)) if offs else c.beg
+
+def split_contig(c, n):
+  '''Split contig into (up to) n shards of about equal compressed size.'''
+  if n <= 1:
+    return [(c.beg, c.end)]
+  offs = record_offsets(c)
+  size = (c.end >> 16) - (c.beg >> 16)
+  cuts = []
+  for k in range(1, n):
+    target = (c.beg >> 16) + size * k // n
+    # first record offset at or after target block
+    i = next((i for i, x in enumerate(offs) if (x >> 16) >= target), None)
+    if i is not None and offs[i] > c.beg and (len(cuts) == 0 or offs[i] > cuts[-1]):
+      cuts.append(offs[i])
+  bounds = [c.beg] + cuts + [c.end]
+
+  return list(zip(bounds[:-1], bounds[1:]))
+
+def get_shards(fn_vcf, region=None, n_shards=1, by_contig=False):
+  '''
+  Split VCF into shards for parallel processing.
+
+  Parameters:
+    fn_vcf    : bgzipped VCF file (plain or unindexed VCF: single shard)
+    region    : restrict to region (CHROM[:BEG[-END]])
+    n_shards  : number of shards to aim for (contigs are split if there are
+                fewer contigs than shards and by_contig is not set)
+    by_contig : never split contigs
+
+  Output:
+    list of Shard tuples (in file order)
+  '''
+  reg = parse_region(region)
+  fn_idx = find_index(fn_vcf)
+  if fn_idx is None or not bgzf.is_bgzf(fn_vcf):
+    return [Shard(*((reg[0], 0, None) + reg[1:] if reg else (None, 0, None, None, None)))]
+
+  contigs = read_index(fn_idx)
+  if reg:
+    contigs = [c for c in contigs if c.name == reg[0]]
+    if len(contigs) == 0:
+      return []
+    c = contigs[0]
+    beg = region_offset(c, reg[1])
+    contigs = [c._replace(beg=beg)] if beg < c.end else []
+  # distribute shards by compressed size of contigs
+  total = sum((c.end >> 16) - (c.beg >> 16) + 1 for c in contigs)
+  shards = []
+  for c in contigs:
+    n = 1
+    if not by_contig and len(contigs) < n_shards:
+      n = max(1, round(n_shards * ((c.end >> 16) - (c.beg >> 16) + 1) / total))
+    for beg, end in split_contig(c, n):
+      shards.append(Shard(c.name, beg, end, reg[1] if reg else None, reg[2] if reg else None))
+
+  return shards
+
+def chrom_of(line):
+  '''CHROM column of VCF data line.'''
+  return line[:line.find('\t')]
+
+def pos_of(line):
+  '''POS column of VCF data line.'''
+  i = line.find('\t') + 1
+  return int(line[i:line.find('\t', i)])
+
+def read_shard(fn_vcf, shard):
+  '''Iterate over data lines of VCF belonging to shard.'''
+  if shard.end is None: # sequential read (no index)
+    with open(fn_vcf, 'rb') as f:
+      magic = f.read(2)
+    # gzip magic number (plain gzip or BGZF)
+    fh = gzip.open(fn_vcf, 'rt') if magic == b'\x1f\x8b' else open(fn_vcf, 'rt')
+    lines = (line for line in fh if not line.startswith('#'))
+  else:
+    fh = None
+    lines = (line for voff, line in bgzf.iter_lines(fn_vcf, shard.beg, shard.end))
+  try:
+    for line in lines:
+      if shard.contig is not None and chrom_of(line) != shard.contig:
+        if shard.end is not None:
+          break
+        continue
+      if shard.start is not None or shard.stop is not None:
+        pos = pos_of(line)
+        if shard.start is not None and pos < shard.start:
+          continue
+        if shard.stop is not None and pos > shard.stop:
+          if shard.end is not None:
+            break
+          continue
+      yield line
+  finally:
+    if fh is not None:
+      fh.close()
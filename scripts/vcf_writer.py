@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# vim: syntax=python tabstop=2 shiftwidth=2 expandtab
+# coding: utf-8
+#------------------------------------------------------------------------------
+# Buffered VCF writer.
+#
+# Records are written as text in large blocks:
+#   - raw lines are passed through unchanged
+#   - FORMAT values can be appended to raw lines: the site columns are
+#     copied as one slice, only the FORMAT and sample columns are rebuilt
+#   - records can be assembled from site columns and FORMAT values
+# Sample strings are built from a template ("{}:{}:...") per set of FORMAT
+# keys instead of joining values field by field.
+#------------------------------------------------------------------------------
+# author   : Harald Detering
+# email    : harald.detering@gmail.com
+# modified : 2026-10-19
+#------------------------------------------------------------------------------
+import os, sys
+from functools import lru_cache
+
+# number of characters to collect before writing
+BUFFER_SIZE = 1 << 22
+
+@lru_cache(maxsize=None)
+def sample_template(n_keys, extend=False):
+  '''Template for sample column with n_keys values (extend: after existing values).'''
+  return ('{}:' if extend else '') + ':'.join(['{}'] * n_keys)
+
+def format_values(arr, spec='{}', missing=None):
+  '''
+  Format matrix (sites x samples) as strings.
+
+  Parameters:
+    arr     : numeric array
+    spec    : format spec for values (e.g. "{:0.4f}")
+    missing : boolean array, values to output as "." (optional)
+  '''
+  fmt = spec.format
+  if missing is None:
+    return [[fmt(x) for x in row] for row in arr.tolist()]
+
+  return [['.' if m else fmt(x) for x, m in zip(row, row_m)] for row, row_m in zip(arr.tolist(), missing.tolist())]
+
+def split_site(line):
+  '''Split raw line into site columns (incl. trailing tab) and FORMAT + sample columns.'''
+  idx = -1
+  for i in range(8):
+    idx = line.index('\t', idx + 1)
+
+  return line[:idx+1], line[idx+1:].rstrip('\n').split('\t')
+
+def append_format(lines, keys, values):
+  '''
+  Append FORMAT fields to raw VCF lines.
+
+  Parameters:
+    lines  : raw data lines (with or without newline)
+    keys   : FORMAT keys to append
+    values : formatted values for each key (sites x samples; str)
+
+  Output:
+    list of lines (with newline); missing trailing values of samples are
+    filled in with "." before appending
+  '''
+  suffix = ':' + ':'.join(keys)
+  tmpl = sample_template(len(keys), True).format
+  out = []
+  for k, line in enumerate(lines):
+    head, cols = split_site(line)
+    n_fmt = cols[0].count(':') + 1
+    calls = [cols[0] + suffix]
+    vals = [v[k] for v in values]
+    for i in range(1, len(cols)):
+      pad = ':.' * (n_fmt - cols[i].count(':') - 1)
+      calls.append(tmpl(cols[i] + pad, *[v[i-1] for v in vals]))
+    out.append(head + '\t'.join(calls) + '\n')
+
+  return out
+
+def update_format(lines, keys, values):
+  '''
+  Set FORMAT fields of raw VCF lines (existing keys are overwritten, others
+  are appended; see append_format() for parameters).
+  '''
+  out = []
+  for k, line in enumerate(lines):
+    head, cols = split_site(line)
+    fmt = cols[0].split(':')
+    idx = []
+    for key in keys:
+      if key not in fmt:
+        fmt.append(key)
+      idx.append(fmt.index(key))
+    calls = [':'.join(fmt)]
+    vals = [v[k] for v in values]
+    for i in range(1, len(cols)):
+      call = cols[i].split(':')
+      call += ['.'] * (len(fmt) - len(call))
+      for j, v in zip(idx, vals):
+        call[j] = v[i-1]
+      calls.append(':'.join(call))
+    out.append(head + '\t'.join(calls) + '\n')
+
+  return out
+
+class Writer(object):
+  '''
+  Buffered VCF writer on top of an open text file handle (plain file,
+  stdout or bgzf.Writer).
+  '''
+  def __init__(self, fh, buffer_size=BUFFER_SIZE):
+    self.fh = fh
+    self.buffer_size = buffer_size
+    self.buf = []
+    self.size = 0
+    self.n_samples = 0
+
+  def write(self, text):
+    '''Write text (complete lines).'''
+    self.buf.append(text)
+    self.size += len(text)
+    if self.size >= self.buffer_size:
+      self.flush()
+
+  def write_header(self, lines):
+    '''Write header lines (without newline; last one is the "#CHROM" line).'''
+    self.n_samples = max(len(lines[-1].split('\t')) - 9, 0)
+    self.write(''.join(line + '\n' for line in lines))
+
+  def write_lines(self, lines):
+    '''Pass raw lines (with newline) through unchanged.'''
+    self.write(''.join(lines))
+
+  def write_appended(self, lines, keys, values):
+    '''Write raw lines with appended FORMAT fields (see append_format()).'''
+    self.write(''.join(append_format(lines, keys, values)))
+
+  def write_records(self, sites, keys, values):
+    '''
+    Write records from site columns and FORMAT values.
+
+    Parameters:
+      sites  : 8 site columns for each record (str)
+      keys   : FORMAT keys (no FORMAT values if empty)
+      values : for each record, values for each key (keys x samples; str)
+    '''
+    if len(keys) == 0:
+      tail = '\t.' * (self.n_samples + 1) + '\n'
+      self.write(''.join('\t'.join(site) + tail for site in sites))
+      return
+    fmt = '\t' + ':'.join(keys)
+    tmpl = sample_template(len(keys)).format
+    lines = []
+    for site, vals in zip(sites, values):
+      calls = [tmpl(*x) for x in zip(*vals)]
+      lines.append('\t'.join(site) + fmt + '\t' + '\t'.join(calls) + '\n')
+    self.write(''.join(lines))
+
+  def flush(self):
+    self.fh.write(''.join(self.buf))
+    self.buf = []
+    self.size = 0
+
+  def close(self):
+    '''Flush buffer and close file handle (unless stdout).'''
+    self.flush()
+    if self.fh is not sys.stdout:
+      self.fh.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
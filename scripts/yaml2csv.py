@@ -3,7 +3,7 @@
 # coding: utf-8
 #------------------------------------------------------------------------------
 # Convert YAML file to CSV format.
-# 
+#
 # Expected YAML structure:
 #   - { key1: value1_1, key2: value2_1, ...}
 #   - { key1: value1_2, key2: value2_2, ...}
@@ -12,30 +12,151 @@
 #   key1,key2,...
 #   value1_1,value2_1,...
 #   value1_2,value2_2,...
+#
+# The YAML file is parsed as a stream of events (libyaml parser if
+# available), each row is written as soon as its list element is complete.
+# Columns are the keys of all records (in order of appearance): keys which
+# first appear after the first N records are appended as new columns (rows
+# are buffered in a temporary file until the final header is known). With
+# --no-widen, such keys are dropped and rows are written directly.
 #------------------------------------------------------------------------------
 # author   : Harald Detering
 # email    : harald.detering@gmail.com
-# modified : 2020-08-22
+# modified : 2026-10-19
 #------------------------------------------------------------------------------
 
 from __future__ import print_function
+import sys
 import argparse
-import pandas as pd
+import csv
+import tempfile
 import yaml
-import yamlordereddictloader
+
+# use libyaml parser if available
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+# number of records to infer columns from
+INFER_ROWS = 100
+
+resolver = yaml.resolver.Resolver()
+constructor = yaml.constructor.SafeConstructor()
 
 def parse_args():
   parser = argparse.ArgumentParser(description='Convert YAML file to CSV format.')
   parser.add_argument('yaml', type=argparse.FileType(), help='YAML input file.')
+  parser.add_argument('--infer-rows', type=int, default=INFER_ROWS, help='Number of records to infer columns from (default: {}).'.format(INFER_ROWS))
+  parser.add_argument('--no-widen', dest='widen', action='store_false', help='Drop keys first seen after the inferred records (default: add columns for them).')
 
   args = parser.parse_args()
   return args
 
+def scalar_value(ev):
+  '''Construct Python value for scalar event (as the safe loader would).'''
+  tag = ev.tag
+  if tag is None or tag == '!':
+    tag = resolver.resolve(yaml.ScalarNode, ev.value, ev.implicit)
+  node = yaml.ScalarNode(tag, ev.value, style=ev.style)
+  func = constructor.yaml_constructors.get(tag)
+  try:
+    return func(constructor, node) if func is not None else ev.value
+  except (ValueError, yaml.constructor.ConstructorError):
+    return ev.value
+
+def read_value(events, ev):
+  '''Read value starting with event ev (nested collections are built as list/dict).'''
+  if isinstance(ev, yaml.ScalarEvent):
+    return scalar_value(ev)
+  if isinstance(ev, yaml.AliasEvent):
+    raise ValueError('Aliases are not supported (line {})'.format(ev.start_mark.line + 1))
+  if isinstance(ev, yaml.SequenceStartEvent):
+    lst = []
+    for ev in events:
+      if isinstance(ev, yaml.SequenceEndEvent):
+        return lst
+      lst.append(read_value(events, ev))
+  if isinstance(ev, yaml.MappingStartEvent):
+    return dict(iter_items(events))
+  raise ValueError('Unexpected YAML event: {}'.format(ev))
+
+def iter_items(events):
+  '''Yield (key, value) pairs of mapping until mapping end.'''
+  for ev in events:
+    if isinstance(ev, yaml.MappingEndEvent):
+      return
+    key = read_value(events, ev)
+    yield key, read_value(events, next(events))
+
+def iter_records(fh):
+  '''Yield records (list of (key, value) pairs) of top-level list in YAML file.'''
+  events = yaml.parse(fh, Loader=Loader)
+  for ev in events:
+    if isinstance(ev, (yaml.StreamStartEvent, yaml.DocumentStartEvent, yaml.DocumentEndEvent, yaml.StreamEndEvent)):
+      continue
+    if not isinstance(ev, yaml.SequenceStartEvent):
+      raise ValueError('Expected list of records (line {})'.format(ev.start_mark.line + 1))
+    for ev in events:
+      if isinstance(ev, yaml.SequenceEndEvent):
+        break
+      if not isinstance(ev, yaml.MappingStartEvent):
+        raise ValueError('Expected record (line {})'.format(ev.start_mark.line + 1))
+      yield list(iter_items(events))
+
+def fmt_value(x):
+  '''Format value for CSV output (null: empty).'''
+  return '' if x is None else str(x)
+
 def main(args):
-  lst_yml = yaml.load(args.yaml, Loader=yamlordereddictloader.Loader)
-  df = pd.DataFrame(lst_yml)
-  #print(df.head())
-  print(df.to_csv(index=False, columns=list(df.columns)))
+  records = iter_records(args.yaml)
+  # infer columns from first records
+  head = []
+  for rec in records:
+    head.append(rec)
+    if len(head) >= args.infer_rows:
+      break
+  cols = list(dict.fromkeys(k for rec in head for k, v in rec))
+  idx = {k: i for i, k in enumerate(cols)}
+  # rows go to a temporary file if columns may be added
+  fh_out = tempfile.TemporaryFile('w+t') if args.widen else sys.stdout
+  writer = csv.writer(fh_out, lineterminator='\n')
+  if not args.widen:
+    writer.writerow(cols)
+  # number of rows written for each number of columns
+  segments = [[0, len(cols)]]
+  dropped = set()
+
+  def write_row(rec):
+    row = [''] * len(cols)
+    for k, v in rec:
+      if k not in idx:
+        if args.widen:
+          idx[k] = len(cols)
+          cols.append(k)
+          row.append('')
+          segments.append([0, len(cols)])
+        else:
+          if k not in dropped:
+            print('[WARN] Dropping column "{}" not found in first {} records (--no-widen is set).'.format(k, args.infer_rows), file=sys.stderr)
+            dropped.add(k)
+          continue
+      row[idx[k]] = fmt_value(v)
+    writer.writerow(row)
+    segments[-1][0] += 1
+
+  for rec in head:
+    write_row(rec)
+  for rec in records:
+    write_row(rec)
+
+  if args.widen:
+    # write final header, then rows padded to final number of columns
+    writer = csv.writer(sys.stdout, lineterminator='\n')
+    writer.writerow(cols)
+    fh_out.seek(0)
+    reader = csv.reader(fh_out)
+    for n_rows, n_cols in segments:
+      pad = [''] * (len(cols) - n_cols)
+      for i in range(n_rows):
+        writer.writerow(next(reader) + pad)
+    fh_out.close()
 
 if __name__ == '__main__':
   args = parse_args()